@@ -0,0 +1,275 @@
+# Bit-accurate 1090ES DF17 airborne-position frames, encoded and decoded in batches.
+#
+# A frame is 112 bits (14 bytes): DF(5) CA(3) | ICAO(24) | ME(56) | PI(24). For airborne position
+# the ME field is TC(5) SS(2) SAF(1) ALT(12) T(1) F(1) LAT-CPR(17) LON-CPR(17), and PI is the CRC-24
+# parity over the first 88 bits. Every function works on NumPy arrays of many frames at once:
+# frames are uint8 arrays of shape (n, 14).
+import zlib
+
+import numpy as np
+
+FRAME_BYTES = 14
+DF_EXTENDED_SQUITTER = 17
+CAPABILITY = 5  # Airborne
+TC_AIRBORNE_POSITION = 11  # Baro altitude, NUCp 7
+CRC24_GENERATOR = 0xFFF409  # x^24 + ... polynomial without the leading term
+CPR_BITS = 17
+CPR_SCALE = float(1 << CPR_BITS)
+NZ = 15  # Latitude zones between the equator and a pole
+FEET_PER_METER = 1 / 0.3048
+
+
+def _build_crc_table():
+    table = np.zeros(256, dtype=np.uint32)
+    for byte in range(256):
+        crc = byte << 16
+        for _ in range(8):
+            crc <<= 1
+            if crc & 0x1000000:
+                crc ^= CRC24_GENERATOR
+        table[byte] = crc & 0xFFFFFF
+    return table
+
+
+CRC_TABLE = _build_crc_table()
+
+
+def crc24(data):
+    """
+    Table-driven CRC-24 over the rows of a uint8 array, one byte column per step.
+    :param data: uint8 array of shape (n, k).
+    :return: uint32 array of n checksums.
+    """
+    data = np.asarray(data, dtype=np.uint8)
+    crc = np.zeros(len(data), dtype=np.uint32)
+    for column in range(data.shape[1]):
+        crc = ((crc << 8) & 0xFFFFFF) ^ CRC_TABLE[((crc >> 16) ^ data[:, column]) & 0xFF]
+    return crc
+
+
+def parity_field(frames):
+    """The 24-bit PI field stored in the last three bytes of each frame."""
+    frames = frames.astype(np.uint32)
+    return (frames[:, 11] << 16) | (frames[:, 12] << 8) | frames[:, 13]
+
+
+def syndrome(frames):
+    """CRC of the data bits XOR the transmitted parity: zero for an intact DF17 frame."""
+    return crc24(frames[:, :11]) ^ parity_field(frames)
+
+
+def parity_ok(frames):
+    """Boolean mask of frames whose CRC-24 parity checks."""
+    return syndrome(frames) == 0
+
+
+def cpr_nl(lat):
+    """Number of longitude zones at each latitude (the NL function of DO-260B)."""
+    lat = np.abs(np.asarray(lat, dtype=np.float64))
+    a = 1 - np.cos(np.pi / (2 * NZ))
+    with np.errstate(divide='ignore', invalid='ignore'):
+        arg = 1 - a / np.cos(np.radians(lat)) ** 2
+        nl = np.floor(2 * np.pi / np.arccos(np.clip(arg, -1, 1)))
+    nl = np.where(lat < 1e-9, 59, nl)
+    nl = np.where(lat >= 87, np.where(lat > 87, 1, 2), nl)
+    return nl.astype(np.int64)
+
+
+def cpr_encode(lat, lon, odd):
+    """
+    Airborne CPR encoding.
+    :param odd: 0 for even frames, 1 for odd frames (array or scalar).
+    :return: (yz, xz) 17-bit encoded latitude and longitude.
+    """
+    lat = np.asarray(lat, dtype=np.float64)
+    lon = np.asarray(lon, dtype=np.float64)
+    odd = np.broadcast_to(np.asarray(odd, dtype=np.int64), lat.shape)
+    dlat = 360.0 / (4 * NZ - odd)
+    yz = np.floor(CPR_SCALE * np.mod(lat, dlat) / dlat + 0.5)
+    rlat = dlat * (yz / CPR_SCALE + np.floor(lat / dlat))
+    dlon = 360.0 / np.maximum(cpr_nl(rlat) - odd, 1)
+    xz = np.floor(CPR_SCALE * np.mod(lon, dlon) / dlon + 0.5)
+    mask = (1 << CPR_BITS) - 1
+    return yz.astype(np.int64) & mask, xz.astype(np.int64) & mask
+
+
+def cpr_decode_local(yz, xz, odd, ref_lat, ref_lon):
+    """
+    Locally unambiguous CPR decoding against a reference position (e.g. the receiving GCS),
+    valid for emitters within about 180 NM of the reference.
+    """
+    yz = np.asarray(yz, dtype=np.float64) / CPR_SCALE
+    xz = np.asarray(xz, dtype=np.float64) / CPR_SCALE
+    odd = np.asarray(odd, dtype=np.int64)
+    dlat = 360.0 / (4 * NZ - odd)
+    j = np.floor(ref_lat / dlat) + np.floor(0.5 + np.mod(ref_lat, dlat) / dlat - yz)
+    lat = dlat * (j + yz)
+    dlon = 360.0 / np.maximum(cpr_nl(lat) - odd, 1)
+    m = np.floor(ref_lon / dlon) + np.floor(0.5 + np.mod(ref_lon, dlon) / dlon - xz)
+    lon = dlon * (m + xz)
+    return lat, lon
+
+
+def encode_altitude(alt_m):
+    """12-bit altitude field with Q=1 (25 ft steps from -1000 ft)."""
+    n = np.clip(np.round((np.asarray(alt_m, dtype=np.float64) * FEET_PER_METER + 1000) / 25), 0, 2047)
+    n = n.astype(np.int64)
+    return ((n >> 4) << 5) | (1 << 4) | (n & 0xF)
+
+
+def decode_altitude(alt_field):
+    """Altitude in metres from the 12-bit field (Q=1 encoding only)."""
+    alt_field = np.asarray(alt_field, dtype=np.int64)
+    n = ((alt_field >> 5) << 4) | (alt_field & 0xF)
+    return (n * 25 - 1000) / FEET_PER_METER
+
+
+def encode_airborne_position(icao, lat, lon, alt_m, odd=0):
+    """
+    Pack airborne-position reports into DF17 frames.
+    :param icao: 24-bit ICAO addresses.
+    :param lat: Latitudes in degrees.
+    :param lon: Longitudes in degrees.
+    :param alt_m: Barometric altitudes in metres.
+    :param odd: CPR format flag per frame (0 even, 1 odd).
+    :return: uint8 array of shape (n, 14).
+    """
+    icao = np.atleast_1d(np.asarray(icao, dtype=np.int64))
+    lat = np.atleast_1d(np.asarray(lat, dtype=np.float64))
+    odd = np.broadcast_to(np.asarray(odd, dtype=np.int64), lat.shape)
+    yz, xz = cpr_encode(lat, lon, odd)
+
+    me = (np.int64(TC_AIRBORNE_POSITION) << 51) | (encode_altitude(alt_m) << 36) \
+        | (odd << 34) | (yz << 17) | xz
+
+    frames = np.empty((len(lat), FRAME_BYTES), dtype=np.uint8)
+    frames[:, 0] = (DF_EXTENDED_SQUITTER << 3) | CAPABILITY
+    frames[:, 1] = (icao >> 16) & 0xFF
+    frames[:, 2] = (icao >> 8) & 0xFF
+    frames[:, 3] = icao & 0xFF
+    for k in range(7):
+        frames[:, 4 + k] = (me >> (8 * (6 - k))) & 0xFF
+    parity = crc24(frames[:, :11])
+    frames[:, 11] = (parity >> 16) & 0xFF
+    frames[:, 12] = (parity >> 8) & 0xFF
+    frames[:, 13] = parity & 0xFF
+    return frames
+
+
+def decode_airborne_position(frames, ref_lat, ref_lon):
+    """
+    Unpack DF17 airborne-position frames.
+    :param ref_lat: Reference latitude for local CPR decoding.
+    :param ref_lon: Reference longitude for local CPR decoding.
+    :return: Dictionary of arrays: df, icao, tc, alt_m, odd, latitude, longitude, crc_ok.
+    """
+    frames = np.asarray(frames, dtype=np.uint8)
+    wide = frames.astype(np.int64)
+    icao = (wide[:, 1] << 16) | (wide[:, 2] << 8) | wide[:, 3]
+    me = np.zeros(len(frames), dtype=np.int64)
+    for k in range(7):
+        me = (me << 8) | wide[:, 4 + k]
+    odd = (me >> 34) & 1
+    lat, lon = cpr_decode_local((me >> 17) & 0x1FFFF, me & 0x1FFFF, odd, ref_lat, ref_lon)
+    return {
+        'df': wide[:, 0] >> 3,
+        'icao': icao,
+        'tc': (me >> 51) & 0x1F,
+        'alt_m': decode_altitude((me >> 36) & 0xFFF),
+        'odd': odd,
+        'latitude': lat,
+        'longitude': lon,
+        'crc_ok': parity_ok(frames),
+    }
+
+
+def icao_from_id(drone_id):
+    """Numeric drone ids map to themselves; other ids (e.g. spoofed names) to a 24-bit hash."""
+    drone_id = str(drone_id)
+    if drone_id.isdigit() and int(drone_id) < (1 << 24):
+        return int(drone_id)
+    return zlib.crc32(drone_id.encode('utf-8')) & 0xFFFFFF
+
+
+class FrameCodec:
+    """
+    Converts between the simulator's message dictionaries and DF17 frames, remembering
+    the drone id behind every ICAO address it has encoded.
+    """
+    def __init__(self, ref_lat, ref_lon):
+        """
+        :param ref_lat: Receiver latitude used for local CPR decoding.
+        :param ref_lon: Receiver longitude used for local CPR decoding.
+        """
+        self.ref_lat = ref_lat
+        self.ref_lon = ref_lon
+        self.ids = {}
+        self._odd = 0
+
+    def encode_messages(self, messages):
+        """Encode a list of message dicts; successive calls alternate even/odd CPR formats."""
+        icao = []
+        for message in messages:
+            address = icao_from_id(message['drone_id'])
+            self.ids[address] = message['drone_id']
+            icao.append(address)
+        frames = encode_airborne_position(
+            icao,
+            [m['latitude'] for m in messages],
+            [m['longitude'] for m in messages],
+            [m['altitude'] for m in messages],
+            odd=self._odd,
+        )
+        self._odd ^= 1
+        return frames
+
+    def decode_messages(self, frames, timestamps=None):
+        """Decode frames back into message dicts (with a 'crc_ok' flag)."""
+        fields = decode_airborne_position(frames, self.ref_lat, self.ref_lon)
+        messages = []
+        for i, address in enumerate(fields['icao'].tolist()):
+            messages.append({
+                'drone_id': self.ids.get(address, f"{address:06X}"),
+                'latitude': float(fields['latitude'][i]),
+                'longitude': float(fields['longitude'][i]),
+                'altitude': float(fields['alt_m'][i]),
+                'timestamp': timestamps[i] if timestamps is not None else None,
+                'crc_ok': bool(fields['crc_ok'][i]),
+            })
+        return messages
+
+
+def _build_single_bit_syndromes():
+    # CRC-24 is linear, so the syndrome of a frame with one flipped bit depends only on its position
+    errors = np.zeros((FRAME_BYTES * 8, FRAME_BYTES), dtype=np.uint8)
+    for bit in range(FRAME_BYTES * 8):
+        errors[bit, bit // 8] = 0x80 >> (bit % 8)
+    syndromes = syndrome(errors)
+    order = np.argsort(syndromes)
+    return syndromes[order], order
+
+
+SINGLE_BIT_SYNDROMES, SINGLE_BIT_POSITIONS = _build_single_bit_syndromes()
+
+FRAME_OK = 0
+FRAME_CORRECTED = 1
+FRAME_REJECTED = 2
+
+
+def correct_single_bit_errors(frames):
+    """
+    Check parity on a batch and repair frames whose syndrome matches a single flipped bit.
+    :return: (frames, status) where status is FRAME_OK, FRAME_CORRECTED or FRAME_REJECTED per frame.
+    """
+    frames = np.array(frames, dtype=np.uint8)
+    s = syndrome(frames)
+    status = np.where(s == 0, FRAME_OK, FRAME_REJECTED)
+    bad = np.nonzero(s)[0]
+    if len(bad):
+        slot = np.minimum(np.searchsorted(SINGLE_BIT_SYNDROMES, s[bad]), len(SINGLE_BIT_SYNDROMES) - 1)
+        fixable = SINGLE_BIT_SYNDROMES[slot] == s[bad]
+        rows = bad[fixable]
+        bits = SINGLE_BIT_POSITIONS[slot[fixable]]
+        frames[rows, bits // 8] ^= (0x80 >> (bits % 8)).astype(np.uint8)
+        status[rows] = FRAME_CORRECTED
+    return frames, status
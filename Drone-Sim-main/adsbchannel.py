@@ -1,15 +1,101 @@
 import numpy as np
 import random
 import time
+import kernels
 from gcs import GCS
 from jammer import PulsedNoiseJammer
+from profiling import NULL_METRICS
+from adsb_codec import FrameCodec
+from message_log import FLAG_CORRUPTED, FLAG_JAMMED, FLAG_SPOOFED, FLAG_GARBLED
+
+
+def ppm_bit_error_rate(snr_db, bandwidth_hz=1e6, bit_rate=1e6):
+    """
+    Bit-error probability of non-coherently detected binary PPM, the 1090 MHz ADS-B modulation:
+    Pb = 0.5 * exp(-Eb/N0 / 2), with Eb/N0 = SNR * bandwidth / bit rate.
+    Works on scalars or arrays of SNR values.
+    """
+    ebn0 = 10 ** (np.asarray(snr_db, dtype=np.float64) / 10) * bandwidth_hz / bit_rate
+    return 0.5 * np.exp(-ebn0 / 2)
+
+
+def flip_bits(frames, ber, rng):
+    """
+    Flip every bit of every frame independently with its frame's bit-error probability.
+    Error counts are drawn per frame first and full masks are only built for frames that
+    have errors, which is exact and cheap when most frames arrive clean.
+    :param frames: uint8 array of shape (n, bytes).
+    :param ber: Bit-error probability, scalar or one per frame.
+    :param rng: numpy.random.Generator.
+    :return: (corrupted copy of frames, number of flipped bits per frame).
+    """
+    frames = np.array(frames, dtype=np.uint8)
+    n, nbytes = frames.shape
+    nbits = nbytes * 8
+    ber = np.broadcast_to(np.asarray(ber, dtype=np.float64), (n,))
+    counts = rng.binomial(nbits, ber)
+    hit = np.nonzero(counts)[0]
+    if len(hit):
+        # A random permutation per frame; its first k positions are a uniform k-subset of bits
+        order = rng.random((len(hit), nbits)).argsort(axis=1)
+        mask = np.zeros((len(hit), nbits), dtype=bool)
+        mask[np.arange(len(hit))[:, None], order] = np.arange(nbits) < counts[hit, None]
+        frames[hit] ^= np.packbits(mask, axis=1)
+    return frames, counts
+
 
 class ADSBChannel:
-    def __init__(self, error_rate=0.01, frequency=1090e6, noise_figure_db=5.0):
+    def __init__(self, error_rate=0.01, frequency=1090e6, noise_figure_db=5.0, metrics=None,
+                 corruption_model='uniform', bit_rate=1e6, realtime_delay=True, recorder=None, seed=None,
+                 rng=None, precision='float64', garbling=None, interferer_power_dbm=None):
+        """
+        :param corruption_model: 'uniform' nudges the coordinates of messages hit by error_rate or
+            negative SNR; 'ber' encodes each message as a DF17 frame and flips bits with the
+            PPM bit-error rate implied by its SNR (error_rate is not used in that mode).
+        :param bit_rate: ADS-B bit rate in bits/s, used to convert SNR to Eb/N0.
+        :param realtime_delay: Sleep for the propagation delay in transmit; disable to run
+            faster than real time (the delay is still returned).
+        :param recorder: Optional message_log.MessageLogWriter receiving every transmission.
+        :param seed: Seed for the bit-error generator.
+        :param rng: Optional random.Random for the 'uniform' corruption draws; the module-level
+            generator when None.
+        :param precision: 'float64' or 'float32' for the arrays returned by the batch link budgets;
+            float32 halves the memory and bandwidth of per-message metrics for very large fleets.
+        :param garbling: Optional garbling.GarblingModel; transmit then loses messages that overlap other
+            emitters' squitters without capturing the receiver.
+        :param interferer_power_dbm: Received powers of the other emitters sharing the channel (used with garbling).
+        """
         self.error_rate = np.float64(error_rate)
         self.frequency = np.float64(frequency)
         self.noise_figure_db = np.float64(noise_figure_db)
         self.light_speed = np.float64(3e8)  # Speed of light in m/s
+        self.metrics = metrics if metrics is not None else NULL_METRICS  # Per-stage timers (profiling.StageMetrics)
+        self.corruption_model = corruption_model
+        self.bit_rate = np.float64(bit_rate)
+        self.bit_rng = np.random.default_rng(seed)
+        self.rng = rng
+        self.importance = None  # Optional importance.ImportanceSampler biasing the corruption draw
+        self.codec = None  # FrameCodec referenced to the receiver, created on first 'ber' transmission
+        self.realtime_delay = realtime_delay
+        self.recorder = recorder
+        self.dtype = np.dtype(precision)
+        self.garbling = garbling
+        self.interferer_power_dbm = None if interferer_power_dbm is None else np.asarray(interferer_power_dbm)
+
+    def __getstate__(self):
+        # Profiling hooks and open log files belong to the running process, not to a snapshot
+        state = self.__dict__.copy()
+        state['metrics'] = None
+        state['recorder'] = None
+        return state
+
+    def __setstate__(self, state):
+        state.setdefault('dtype', np.dtype(np.float64))
+        state.setdefault('garbling', None)
+        state.setdefault('interferer_power_dbm', None)
+        self.__dict__.update(state)
+        if self.metrics is None:
+            self.metrics = NULL_METRICS
 
     def haversine_distance(self, lat1, lon1, lat2, lon2):
         R = np.float64(6371000)  # Earth radius in meters
@@ -36,61 +122,154 @@ class ADSBChannel:
         noise_power_dbm = 10 * np.log10(noise_power_watts) + 30
         return noise_power_dbm
 
+    def link_budget_batch(self, lat, lon, gcs_position, tx_power_dbm=50, bandwidth_hz=1e6):
+        """
+        Vectorized link budget for many emitter positions at once (no jamming, no delay sleep).
+        :return: (distance in m, received power in dBm, SNR in dB) arrays.
+        """
+        distance = self.haversine_distance(np.asarray(lat, dtype=np.float64), np.asarray(lon, dtype=np.float64),
+                                           gcs_position[0], gcs_position[1])
+        return self.link_budget_distances(distance, tx_power_dbm, bandwidth_hz)
+
+    def link_budget_distances(self, distance, tx_power_dbm=50, bandwidth_hz=1e6):
+        """
+        Vectorized link budget for precomputed emitter distances (e.g. fleet.FleetState.gcs_distances).
+        :return: (distance in m, received power in dBm, SNR in dB) arrays in the channel's precision.
+        """
+        distance = np.asarray(distance, dtype=self.dtype)
+        rx_power_dbm, snr_db = kernels.active.link_budget_batch(
+            distance, tx_power_dbm, self.light_speed / self.frequency, self.thermal_noise_power(bandwidth_hz),
+            self.noise_figure_db)
+        return distance, rx_power_dbm, snr_db
+
     def transmit(self, message, gcs_position, tx_power_dbm=50, bandwidth_hz=1e6, jammer=None, spoofer=None):
+        metrics = self.metrics
         drone_lat, drone_lon = message["latitude"], message["longitude"]
         gcs_lat, gcs_lon = gcs_position
+        if self.recorder is not None:
+            # Jammers edit the message in place, so keep what was actually sent
+            sent = (message.get("timestamp", 0.0), message["drone_id"], (drone_lat, drone_lon, message["altitude"]))
+        log_flags = 0
 
-        distance = self.haversine_distance(drone_lat, drone_lon, gcs_lat, gcs_lon)
+        with metrics.stage('link_budget'):
+            distance = kernels.active.haversine(drone_lat, drone_lon, gcs_lat, gcs_lon)
 
-        delay_seconds = distance / self.light_speed
-        delay_ns = np.round(delay_seconds * 1e9, decimals=2)
+            delay_seconds = distance / self.light_speed
+            delay_ns = np.round(delay_seconds * 1e9, decimals=2)
 
-        time.sleep(delay_seconds)
+        if self.realtime_delay:
+            with metrics.stage('propagation_sleep'):
+                time.sleep(delay_seconds)
 
-        path_loss_db = self.free_space_path_loss(distance)
-        noise_power_dbm = self.thermal_noise_power(bandwidth_hz)
+        with metrics.stage('link_budget'):
+            noise_power_dbm = self.thermal_noise_power(bandwidth_hz)
 
-        rx_power_dbm = tx_power_dbm - path_loss_db
+            # Initialize SNR with the basic calculation
+            rx_power_dbm, snr_db = kernels.active.link_budget(distance, tx_power_dbm, self.light_speed / self.frequency,
+                                                              noise_power_dbm, self.noise_figure_db)
 
-        # Initialize SNR with the basic calculation
-        snr_db = rx_power_dbm - (noise_power_dbm + self.noise_figure_db)
+        if self.garbling is not None and self.interferer_power_dbm is not None:
+            with metrics.stage('garbling'):
+                if self.garbling.garbled(rx_power_dbm, self.interferer_power_dbm, self.bit_rng):
+                    metrics.count('garbled')
+                    if self.recorder is not None:
+                        self.recorder.record(*sent, None, snr_db, delay_ns, FLAG_GARBLED)
+                    return None, delay_ns, True, snr_db  # Lost in overlapping replies
 
         # Apply jamming effects if a jammer is present
         if jammer:
-            received_message, jammed = jammer.jam_signal(message)
+            with metrics.stage('jamming'):
+                received_message, jammed = jammer.jam_signal(message)
 
-            if jammed and received_message is None:
-                return None, delay_ns, True, snr_db  # Message lost due to jamming
+                if jammed and received_message is None:
+                    metrics.count('jammed_drops')
+                    if self.recorder is not None:
+                        self.recorder.record(*sent, None, snr_db, delay_ns, FLAG_JAMMED)
+                    return None, delay_ns, True, snr_db  # Message lost due to jamming
 
-            message = received_message
-            jamming_signal_power_dbm = jammer.noise_level  # Adjusting noise level impact
-            effective_noise_power_dbm = 10 * np.log10(
-                10**(noise_power_dbm / 10) + 10**(jamming_signal_power_dbm / 10)
-            )
-            snr_db = rx_power_dbm - (effective_noise_power_dbm + self.noise_figure_db)
+                if jammed:
+                    metrics.count('jammed_noisy')
+                    log_flags |= FLAG_JAMMED
+                message = received_message
+                jamming_signal_power_dbm = jammer.noise_level  # Adjusting noise level impact
+                effective_noise_power_dbm = kernels.active.combine_dbm(noise_power_dbm, jamming_signal_power_dbm)
+                snr_db = rx_power_dbm - (effective_noise_power_dbm + self.noise_figure_db)
 
         # Apply spoofing effects if a spoofer is present
         if spoofer:
-            spoofed_message, spoofed = spoofer.spoof_message(message)
-            if spoofed:
-                spoofing_signal_power_dbm = tx_power_dbm + 5  # Slightly stronger spoofing signal
-                effective_noise_power_dbm = 10 * np.log10(
-                    10**(noise_power_dbm / 10) + 10**(spoofing_signal_power_dbm / 10)
-                )
-                snr_db = rx_power_dbm - (effective_noise_power_dbm + self.noise_figure_db)
-                message = spoofed_message  # Apply spoofed message if successful
+            with metrics.stage('spoofing'):
+                spoofed_message, spoofed = spoofer.spoof_message(message)
+                if spoofed:
+                    metrics.count('spoofed')
+                    log_flags |= FLAG_SPOOFED
+                    spoofing_signal_power_dbm = tx_power_dbm + 5  # Slightly stronger spoofing signal
+                    effective_noise_power_dbm = kernels.active.combine_dbm(noise_power_dbm, spoofing_signal_power_dbm)
+                    snr_db = rx_power_dbm - (effective_noise_power_dbm + self.noise_figure_db)
+                    message = spoofed_message  # Apply spoofed message if successful
 
         corrupted = False
-        if snr_db < 0 or random.random() < self.error_rate:
-            message = self.corrupt_message(message)
-            corrupted = True
+        with metrics.stage('corruption'):
+            if self.corruption_model == 'ber':
+                message, corrupted = self.corrupt_message_bits(message, gcs_position, snr_db, bandwidth_hz)
+                if corrupted:
+                    metrics.count('corrupted')
+            elif snr_db < 0 or self.corruption_draw():
+                message = self.corrupt_message(message)
+                corrupted = True
+                metrics.count('corrupted')
 
+        if self.recorder is not None:
+            self.recorder.record(*sent, message, snr_db, delay_ns, log_flags | (FLAG_CORRUPTED if corrupted else 0))
         return message, delay_ns, corrupted, snr_db
 
+    def corruption_draw(self):
+        """True when a message with usable SNR is hit by the flat error rate."""
+        if self.importance is not None:
+            return self.importance.bernoulli('corruption', self.error_rate)
+        return (self.rng or random).random() < self.error_rate
+
     def corrupt_message(self, message):
         """ Introduces random errors into the message. """
+        rng = self.rng or random
         corrupted_message = message.copy()
-        corrupted_message['latitude'] += random.uniform(-0.01, 0.01)
-        corrupted_message['longitude'] += random.uniform(-0.01, 0.01)
-        corrupted_message['altitude'] += random.uniform(-10, 10)
+        corrupted_message['latitude'] += rng.uniform(-0.01, 0.01)
+        corrupted_message['longitude'] += rng.uniform(-0.01, 0.01)
+        corrupted_message['altitude'] += rng.uniform(-10, 10)
         return corrupted_message
+
+    def bit_error_rate(self, snr_db, bandwidth_hz=1e6):
+        """PPM bit-error probability for one SNR or an array of SNRs."""
+        return ppm_bit_error_rate(snr_db, bandwidth_hz, self.bit_rate)
+
+    def corrupt_frames(self, frames, snr_db, bandwidth_hz=1e6):
+        """
+        Apply SNR-dependent bit errors to a batch of encoded frames.
+        :param snr_db: SNR per frame (or one value for the whole batch).
+        :return: (corrupted frames, flipped bits per frame).
+        """
+        return flip_bits(frames, self.bit_error_rate(snr_db, bandwidth_hz), self.bit_rng)
+
+    def corrupt_message_bits(self, message, gcs_position, snr_db, bandwidth_hz=1e6):
+        """
+        Send one message as a DF17 frame through the bit-error model.
+        :return: (message decoded from the received frame, with the raw 'frame' and the channel's
+            'bit_errors' mask attached, corrupted flag).
+        """
+        if self.codec is None or (self.codec.ref_lat, self.codec.ref_lon) != tuple(gcs_position[:2]):
+            self.codec = FrameCodec(gcs_position[0], gcs_position[1])
+        sent = self.codec.encode_messages([message])
+        frames, flipped = self.corrupt_frames(sent, snr_db, bandwidth_hz)
+        received = self.codec.decode_messages(frames, [message.get('timestamp')])[0]
+        received['frame'] = frames[0]
+        received['bit_errors'] = frames[0] ^ sent[0]
+        return received, bool(flipped[0])
+
+    def reencode_frame(self, message):
+        """
+        Rebuild the frame of a received 'ber' message after its fields were edited downstream (e.g. by a
+        post-channel jammer or spoofer), keeping the bit errors the channel put on it: CRC-24 is linear,
+        so a frame that failed the check still fails it and one that passed still passes.
+        """
+        frame = self.codec.encode_messages([message])[0]
+        message['frame'] = frame ^ message.get('bit_errors', 0)
+        return message
@@ -0,0 +1,308 @@
+import time
+
+import numpy as np
+
+from multilateration import to_local
+from scenario import center_lat, center_lon
+
+# Per-report association outcome
+ASSOC_OK = 0          # Matched the track of the drone id it claims
+ASSOC_NEW = 1         # Started a track (unknown id, or re-acquired a stale or unconfirmed track)
+ASSOC_CONFLICT = 2    # Claims a known id but is outside that track's gate (hijacked id / moved position)
+ASSOC_MISMATCH = 3    # Claims a known id but sits on a different drone's track
+ASSOC_DUPLICATE = 4   # A second report for the same id in one scan, farther from the track
+
+_CELL_BIAS = 1 << 31
+
+
+def _cell_keys(cx, cy):
+    return ((cx + _CELL_BIAS) << 32) | (cy + _CELL_BIAS)
+
+
+def gated_pairs(px, py, tx, ty, gate, cell):
+    """
+    All (report, track) pairs closer than the track's gate, found through a uniform grid of
+    side cell >= max(gate): each report only looks at tracks in its own and the 8 neighbouring
+    cells, so the cost is near-linear in the number of reports and tracks.
+    :return: (report indices, track indices, distances) of gated pairs.
+    """
+    if len(px) == 0 or len(tx) == 0:
+        empty = np.zeros(0, dtype=np.int64)
+        return empty, empty, np.zeros(0)
+    tcx = np.floor(tx / cell).astype(np.int64)
+    tcy = np.floor(ty / cell).astype(np.int64)
+    keys = _cell_keys(tcx, tcy)
+    order = np.argsort(keys, kind='stable')
+    sorted_keys = keys[order]
+    pcx = np.floor(px / cell).astype(np.int64)
+    pcy = np.floor(py / cell).astype(np.int64)
+
+    reports, tracks = [], []
+    for dx in (-1, 0, 1):
+        for dy in (-1, 0, 1):
+            query = _cell_keys(pcx + dx, pcy + dy)
+            lo = np.searchsorted(sorted_keys, query, side='left')
+            hi = np.searchsorted(sorted_keys, query, side='right')
+            counts = hi - lo
+            total = int(counts.sum())
+            if total == 0:
+                continue
+            # Expand every [lo, hi) range into explicit positions without a Python loop
+            report_idx = np.repeat(np.arange(len(px)), counts)
+            within = np.arange(total) - np.repeat(np.cumsum(counts) - counts, counts)
+            reports.append(report_idx)
+            tracks.append(order[np.repeat(lo, counts) + within])
+    if not reports:
+        empty = np.zeros(0, dtype=np.int64)
+        return empty, empty, np.zeros(0)
+    reports = np.concatenate(reports)
+    tracks = np.concatenate(tracks)
+    distance = np.hypot(px[reports] - tx[tracks], py[reports] - ty[tracks])
+    keep = distance <= gate[tracks]
+    return reports[keep], tracks[keep], distance[keep]
+
+
+def nearest_neighbour_assignment(reports, tracks, distance):
+    """
+    Global nearest-neighbour assignment over gated pairs: repeatedly accept every pair that is
+    the closest option for both its report and its track. This gives the same matching as
+    greedily taking pairs in order of distance, but each round is vectorized.
+    :return: (assigned report indices, assigned track indices).
+    """
+    assigned_reports, assigned_tracks = [], []
+    while len(reports):
+        order = np.lexsort((distance, reports))
+        best_for_report = np.zeros(len(reports), dtype=bool)
+        first = np.r_[True, reports[order][1:] != reports[order][:-1]]
+        best_for_report[order[first]] = True
+        order = np.lexsort((distance, tracks))
+        best_for_track = np.zeros(len(reports), dtype=bool)
+        first = np.r_[True, tracks[order][1:] != tracks[order][:-1]]
+        best_for_track[order[first]] = True
+        mutual = best_for_report & best_for_track
+        done_reports, done_tracks = reports[mutual], tracks[mutual]
+        assigned_reports.append(done_reports)
+        assigned_tracks.append(done_tracks)
+        remaining = ~np.isin(reports, done_reports) & ~np.isin(tracks, done_tracks)
+        reports, tracks, distance = reports[remaining], tracks[remaining], distance[remaining]
+    if not assigned_reports:
+        empty = np.zeros(0, dtype=np.int64)
+        return empty, empty
+    return np.concatenate(assigned_reports), np.concatenate(assigned_tracks)
+
+
+class TrackAssociator:
+    """
+    Data-association stage in front of GCS.receive_update. Tracks keep a position and a
+    velocity estimate; every scan (batch of reports) is gated against the tracks' predicted
+    positions instead of trusting the drone_id in each report:
+    - a report inside the gate of the track for its claimed id updates that track;
+    - known ids that miss their gate are assigned in bulk (gated global nearest neighbour) to
+      tracks not updated this scan, so a report sitting on another drone's track is a mismatch;
+    - a report claiming a known id far from that track is an identity conflict and does not
+      move the track, unless the track is stale or unconfirmed, in which case it is re-acquired there.
+    """
+    def __init__(self, gate_m=150.0, max_speed=60.0, max_gate_m=2000.0, stale_after=10.0,
+                 ref_lat=center_lat, ref_lon=center_lon, velocity_gain=0.5):
+        """
+        :param gate_m: Gate radius for a track updated at the scan time.
+        :param max_speed: Speed (m/s) by which the gate grows per second since the last update.
+        :param max_gate_m: Gate ceiling; also the spatial grid cell size.
+        :param stale_after: Seconds without an accepted update after which a conflicting report
+            re-acquires the track instead of being rejected; stale tracks are also pruned. Tracks
+            seen only once are re-acquired immediately, so a spoofed first report cannot hold an id.
+        :param ref_lat: Origin of the local metric frame.
+        :param velocity_gain: Weight of the newest velocity measurement (alpha-beta style smoothing).
+        """
+        self.gate_m = gate_m
+        self.max_speed = max_speed
+        self.max_gate_m = max_gate_m
+        self.stale_after = stale_after
+        self.ref_lat, self.ref_lon = ref_lat, ref_lon
+        self.velocity_gain = velocity_gain
+        self.ids = []
+        self.index = {}
+        self.state = np.zeros((0, 7))  # x, y, alt, vx, vy, last update time, accepted updates
+        self.counts = np.zeros(5, dtype=np.int64)
+        self._next_prune = None
+
+    def __len__(self):
+        return len(self.ids)
+
+    def predicted(self, now):
+        """Track positions extrapolated to now, and their gate radii."""
+        dt = np.maximum(now - self.state[:, 5], 0.0)
+        x = self.state[:, 0] + self.state[:, 3] * dt
+        y = self.state[:, 1] + self.state[:, 4] * dt
+        gate = np.minimum(self.gate_m + self.max_speed * dt, self.max_gate_m)
+        return x, y, gate
+
+    def associate(self, messages, now=None, gcs=None):
+        """
+        Associate one scan of reports and update the tracks.
+        :param messages: Message dicts (drone_id, latitude, longitude, altitude).
+        :param now: Scan time in seconds (receive time; the reports' own timestamps can be spoofed).
+        :param gcs: Optional GCS receiving every report accepted as ASSOC_OK or ASSOC_NEW.
+        :return: Per-report status array (ASSOC_* codes).
+        """
+        if now is None:
+            now = time.time()
+        n = len(messages)
+        status = np.full(n, -1, dtype=np.int8)
+        if n == 0:
+            return status
+        lat = np.fromiter((m['latitude'] for m in messages), dtype=np.float64, count=n)
+        lon = np.fromiter((m['longitude'] for m in messages), dtype=np.float64, count=n)
+        alt = np.fromiter((m['altitude'] for m in messages), dtype=np.float64, count=n)
+        px, py = to_local(lat, lon, self.ref_lat, self.ref_lon)
+        claimed = np.fromiter((self.index.get(m['drone_id'], -1) for m in messages), dtype=np.int64, count=n)
+        tx, ty, gate = self.predicted(now)
+        stale = now - self.state[:, 5] > self.stale_after
+        replaceable = stale | (self.state[:, 6] < 2)
+
+        # 1. Reports consistent with their own claimed track; the closest one wins a duplicated id
+        known = np.nonzero(claimed >= 0)[0]
+        distance = np.hypot(px[known] - tx[claimed[known]], py[known] - ty[claimed[known]])
+        inside = distance <= gate[claimed[known]]
+        candidates, candidate_distance = known[inside], distance[inside]
+        order = np.lexsort((candidate_distance, claimed[candidates]))
+        candidates = candidates[order]
+        first = np.ones(len(candidates), dtype=bool)
+        first[1:] = claimed[candidates][1:] != claimed[candidates][:-1]
+        status[candidates[first]] = ASSOC_OK
+        status[candidates[~first]] = ASSOC_DUPLICATE
+        updated = np.zeros(len(self.ids), dtype=bool)
+        updated[claimed[candidates[first]]] = True
+
+        # 2. Known ids that missed their own gate are assigned by position alone against tracks not
+        # updated this scan, to tell an identity swap from a plain conflict. Unknown ids are not:
+        # in a dense fleet almost any new drone lands in some track's gate. Reports whose own
+        # track may simply be re-acquired skip straight to step 3.
+        eligible = np.zeros(n, dtype=bool)
+        eligible[known] = ~replaceable[claimed[known]]
+        rest = np.nonzero((status < 0) & eligible)[0]
+        free = np.nonzero(~updated)[0]
+        if len(rest) and len(free):
+            r, t, d = gated_pairs(px[rest], py[rest], tx[free], ty[free], gate[free], self.max_gate_m)
+            r, t = nearest_neighbour_assignment(r, t, d)
+            matched_reports, matched_tracks = rest[r], free[t]
+            # Step 1 took every report on its own track, so these sit on another drone's track;
+            # a stale track is no longer evidence of anything, so those fall through to step 3
+            status[matched_reports] = np.where(stale[matched_tracks], -1, ASSOC_MISMATCH)
+
+        # 3. Unmatched reports: new ids start tracks, known ids conflict unless their track went stale
+        rest = np.nonzero(status < 0)[0]
+        conflict = rest[claimed[rest] >= 0]
+        status[conflict] = ASSOC_CONFLICT
+        replace = replaceable[claimed[conflict]]
+        # A track updated in step 1 already took its closest report, so the others are duplicates
+        taken = updated[claimed[conflict]]
+        status[conflict[replace & taken]] = ASSOC_DUPLICATE
+        reacquire = conflict[replace & ~taken]
+        # One report per track re-acquires it; further ones in the same scan are duplicates
+        _, first = np.unique(claimed[reacquire], return_index=True)
+        status[reacquire] = ASSOC_DUPLICATE
+        status[reacquire[first]] = ASSOC_NEW
+        status[rest[claimed[rest] < 0]] = ASSOC_NEW
+
+        self._update_tracks(messages, status, claimed, px, py, alt, now)
+        self.counts += np.bincount(status, minlength=5)
+        if gcs is not None:
+            for i in np.nonzero(status <= ASSOC_NEW)[0].tolist():
+                message = messages[i]
+                gcs.receive_update(message['drone_id'], (message['latitude'], message['longitude'],
+                                                         message['altitude']))
+        if self._next_prune is None or now >= self._next_prune:
+            self.prune(now)
+            self._next_prune = now + self.stale_after
+        return status
+
+    def _update_tracks(self, messages, status, claimed, px, py, alt, now):
+        existing = np.nonzero((status <= ASSOC_NEW) & (claimed >= 0))[0]
+        if len(existing):
+            track = claimed[existing]
+            state = self.state[track]
+            ok = status[existing] == ASSOC_OK
+            dt = now - state[:, 5]
+            moving = ok & (dt > 0)
+            step = np.where(moving, dt, 1.0)
+            gain = self.velocity_gain
+            # Re-acquired tracks restart from rest; matched ones blend in the measured velocity
+            vx = np.where(ok, state[:, 3], 0.0)
+            vy = np.where(ok, state[:, 4], 0.0)
+            vx = np.where(moving, (1 - gain) * vx + gain * (px[existing] - state[:, 0]) / step, vx)
+            vy = np.where(moving, (1 - gain) * vy + gain * (py[existing] - state[:, 1]) / step, vy)
+            hits = np.where(ok, state[:, 6] + 1, 1)
+            self.state[track] = np.column_stack([px[existing], py[existing], alt[existing], vx, vy,
+                                                 np.full(len(track), now), hits])
+
+        new = np.nonzero((status == ASSOC_NEW) & (claimed < 0))[0]
+        if len(new):
+            # A new id reported twice in one scan only starts one track
+            for i in new.tolist():
+                drone_id = messages[i]['drone_id']
+                slot = self.index.get(drone_id)
+                if slot is None:
+                    self.index[drone_id] = len(self.ids)
+                    self.ids.append(drone_id)
+                else:
+                    status[i] = ASSOC_DUPLICATE
+            first = new[status[new] == ASSOC_NEW]
+            zeros = np.zeros(len(first))
+            rows = np.column_stack([px[first], py[first], alt[first], zeros, zeros, np.full(len(first), now),
+                                    np.ones(len(first))])
+            self.state = np.concatenate([self.state, rows])
+
+    def prune(self, now):
+        """Drop tracks with no accepted update for stale_after seconds, so ghost ids cannot pile up."""
+        keep = now - self.state[:, 5] <= self.stale_after
+        if keep.all():
+            return 0
+        self.state = self.state[keep]
+        self.ids = [drone_id for drone_id, kept in zip(self.ids, keep.tolist()) if kept]
+        self.index = {drone_id: i for i, drone_id in enumerate(self.ids)}
+        return int((~keep).sum())
+
+
+if __name__ == "__main__":
+    import contextlib
+    import io
+    import random
+    from scenario import make_fleet
+    from spoofer import Spoofer
+
+    random.seed(2)
+    for num_drones in (1000, 10000):
+        drones = make_fleet(num_drones)
+        spoofer = Spoofer(spoof_probability=0.05, fake_drone_id="FAKE-DRONE")
+        associator = TrackAssociator()
+        truth = {'hijacked': 0, 'hijacked_flagged': 0, 'honest': 0, 'honest_flagged': 0}
+        elapsed = 0.0
+        reports = 0
+        for scan in range(1, 21):
+            messages, hijacked, honest = [], [], []
+            with contextlib.redirect_stdout(io.StringIO()):
+                for drone in drones:
+                    if drone.calculate_navigation(1) != 1:
+                        continue
+                    lat, lon, alt = drone.current_position
+                    message, spoofed = spoofer.spoof_message({'drone_id': drone.id, 'latitude': lat,
+                                                              'longitude': lon, 'altitude': alt, 'timestamp': 0.0})
+                    messages.append(message)
+                    hijacked.append(spoofed and message['drone_id'] == drone.id)
+                    honest.append(not spoofed)
+            t0 = time.perf_counter()
+            status = associator.associate(messages, now=float(scan))
+            elapsed += time.perf_counter() - t0
+            reports += len(messages)
+            if scan > 1:
+                hijacked, honest = np.array(hijacked), np.array(honest)
+                flagged = status >= ASSOC_CONFLICT
+                truth['hijacked'] += int(hijacked.sum())
+                truth['hijacked_flagged'] += int(flagged[hijacked].sum())
+                truth['honest'] += int(honest.sum())
+                truth['honest_flagged'] += int(flagged[honest].sum())
+        print(f"[Association] {num_drones} drones: {reports / elapsed:,.0f} reports/s, "
+              f"hijacked ids flagged {truth['hijacked_flagged'] / max(truth['hijacked'], 1):.1%}, "
+              f"honest reports flagged {truth['honest_flagged'] / max(truth['honest'], 1):.2%}, "
+              f"outcomes {dict(zip(['ok', 'new', 'conflict', 'mismatch', 'duplicate'], associator.counts.tolist()))}")
@@ -0,0 +1,258 @@
+import argparse
+import contextlib
+import json
+import os
+import random
+import sys
+import time
+import timeit
+
+import kernels
+from drone import Drone
+from route import RouteGenerator
+from adsbchannel import ADSBChannel
+from jammer import Jammer, PulsedNoiseJammer, ContinuousWaveJammer
+from spoofer import Spoofer
+from scenario import center_lat, center_lon
+
+gcs_pos = (center_lat, center_lon)
+
+# Committed reference timings. They are machine-specific: on new hardware run
+# `python benchmark.py --save-baseline` once on the unchanged tree, then compare changes with
+# `python benchmark.py --threshold 0.2` (exits with status 1 on a regression).
+BASELINE_PATH = 'results/benchmark_baseline.json'
+FLEET_SIZES = (10, 1000, 100000)
+
+
+def make_drone(i, route):
+    """Drone with the same parameters the scenario scripts use."""
+    return Drone(
+        id=f"{i+1}",
+        drone_type=f"type{i+1}",
+        acceleration_rate=2.0,
+        climb_rate=3.0,
+        speed=10.0,
+        position_error=2.0,
+        altitude_error=1.0,
+        battery_consume_rate=0.05,
+        battery_capacity=10.0,
+        route=route
+    )
+
+
+def make_message(drone_id="1"):
+    return {
+        'drone_id': drone_id,
+        'latitude': center_lat + 0.01,
+        'longitude': center_lon - 0.01,
+        'altitude': 120.0,
+        'timestamp': time.time()
+    }
+
+
+def time_per_call(fn, number, repeat=7):
+    """Best-of-repeat wall time of a single call in seconds (the minimum is the least noisy estimate)."""
+    return min(timeit.repeat(fn, number=number, repeat=repeat)) / number
+
+
+# ----------- Microbenchmarks ----------- #
+
+def bench_calculate_navigation():
+    route = RouteGenerator(center_lat, center_lon, num_routes=1, waypoints_per_route=50,
+                           max_offset=0.02).generate_routes()[0]
+    drone = make_drone(0, route)
+    drone.battery_capacity = drone.battery_remaining = float('inf')
+
+    def step():
+        if drone.calculate_navigation(1) != 1:
+            drone.current_position, drone.target_position, drone.route_index = route[0], route[1], 1
+    return time_per_call(step, number=20000)
+
+
+def bench_channel_transmit():
+    channel = ADSBChannel()
+    message = make_message()
+    return time_per_call(lambda: channel.transmit(dict(message), gcs_pos), number=2000)
+
+
+def bench_jammer(jammer):
+    message = make_message()
+    return time_per_call(lambda: jammer.jam_signal(dict(message)), number=20000)
+
+
+def bench_spoof_message():
+    spoofer = Spoofer(spoof_probability=0.5, fake_drone_id="FAKE-DRONE")
+    message = make_message()
+    return time_per_call(lambda: spoofer.spoof_message(message), number=20000)
+
+
+def bench_codec(decode, batch=100000):
+    import numpy as np
+    from adsb_codec import encode_airborne_position, decode_airborne_position
+
+    rng = np.random.default_rng(0)
+    icao = rng.integers(0, 1 << 24, batch)
+    lat = center_lat + rng.uniform(-0.02, 0.02, batch)
+    lon = center_lon + rng.uniform(-0.02, 0.02, batch)
+    alt = rng.uniform(80, 200, batch)
+    if decode:
+        frames = encode_airborne_position(icao, lat, lon, alt, odd=rng.integers(0, 2, batch))
+        return time_per_call(lambda: decode_airborne_position(frames, center_lat, center_lon), number=1) / batch
+    return time_per_call(lambda: encode_airborne_position(icao, lat, lon, alt), number=1) / batch
+
+
+def bench_navigation_batch(num_drones=100000):
+    """Seconds per drone for one batched navigation step of the active kernel backend."""
+    import numpy as np
+
+    rng = np.random.default_rng(0)
+    lat = center_lat + rng.uniform(-0.02, 0.02, (2, num_drones))
+    lon = center_lon + rng.uniform(-0.02, 0.02, (2, num_drones))
+    alt = rng.uniform(80, 200, (2, num_drones))
+    ones = np.ones(num_drones)
+    args = (lat[0], lon[0], alt[0], lat[1], lon[1], alt[1], 10.0 * ones, 3.0 * ones, 1.0, 10.0 * ones, 0.05 * ones,
+            2.0 * ones, 1.0 * ones)
+    kernels.active.navigation_step_batch(*args)  # Compile / warm up outside the timing
+    return time_per_call(lambda: kernels.active.navigation_step_batch(*args), number=1) / num_drones
+
+
+def bench_transport(transport, batch_size=1024):
+    """Seconds per message handed to another process (see shm_transport.benchmark_transports)."""
+    from shm_transport import benchmark_transports
+    return benchmark_transports(batch_size=batch_size)[transport]
+
+
+def bench_gcs_ghost_flood(max_tracks=None, ghosts_per_update=100):
+    """
+    Seconds per real-track update while ghost ids are injected alongside it.
+    :param max_tracks: Track table limit; None leaves the table unbounded.
+    """
+    from gcs import GCS
+
+    gcs = GCS(center_lat, center_lon, track_ttl=None if max_tracks is None else 10.0, max_tracks=max_tracks,
+              eviction='confidence')
+    position = (center_lat, center_lon, 120.0)
+    counter = iter(range(1 << 62))
+
+    def step():
+        for _ in range(ghosts_per_update):
+            gcs.receive_update(f"GHOST-{next(counter)}", position)
+        gcs.receive_update("1", position)
+    return time_per_call(step, number=200) / (ghosts_per_update + 1)
+
+
+def bench_run_simulation(params):
+    from n_scen_stat import run_simulation
+    return time_per_call(lambda: run_simulation(**params), number=1, repeat=3)
+
+
+# ----------- End-to-end fleet throughput ----------- #
+
+def bench_fleet(num_drones, ticks=1):
+    """
+    Seconds per message for one navigation step plus transmission of every drone in a fleet.
+    :param num_drones: Fleet size.
+    :param ticks: Number of one-second simulation steps to run.
+    """
+    routes = RouteGenerator(center_lat, center_lon, num_routes=num_drones, waypoints_per_route=5,
+                            max_offset=0.02).generate_routes()
+    drones = [make_drone(i, route) for i, route in enumerate(routes)]
+    channel = ADSBChannel()
+    jammer = PulsedNoiseJammer(pulse_duration=0.5, pulse_interval=2.0, noise_level=1.0)
+    spoofer = Spoofer(spoof_probability=0.5, fake_drone_id="FAKE-DRONE")
+
+    messages = 0
+    start = time.perf_counter()
+    for _ in range(ticks):
+        for drone in drones:
+            if drone.calculate_navigation(1) in [-1, -2, 0]:
+                continue
+            message = {
+                'drone_id': drone.id,
+                'latitude': drone.current_position[0],
+                'longitude': drone.current_position[1],
+                'altitude': drone.current_position[2],
+                'timestamp': time.time()
+            }
+            channel.transmit(message, gcs_pos, jammer=jammer, spoofer=spoofer)
+            messages += 1
+    elapsed = time.perf_counter() - start
+    return elapsed / max(messages, 1)
+
+
+def collect(fleet_sizes):
+    """Run every benchmark and return {name: seconds per operation}."""
+    benchmarks = {
+        'drone.calculate_navigation': bench_calculate_navigation,
+        'kernels.navigation_step_batch.per_drone': bench_navigation_batch,
+        'adsbchannel.transmit': bench_channel_transmit,
+        'jammer.Jammer.jam_signal': lambda: bench_jammer(Jammer()),
+        'jammer.PulsedNoiseJammer.jam_signal': lambda: bench_jammer(PulsedNoiseJammer()),
+        'jammer.ContinuousWaveJammer.jam_signal': lambda: bench_jammer(ContinuousWaveJammer()),
+        'spoofer.spoof_message': bench_spoof_message,
+        'adsb_codec.encode.per_frame': lambda: bench_codec(decode=False),
+        'adsb_codec.decode.per_frame': lambda: bench_codec(decode=True),
+        'ipc.pickled_dicts.per_message': lambda: bench_transport('pickled_dicts'),
+        'ipc.shared_ring.per_message': lambda: bench_transport('shared_ring'),
+        'gcs.receive_update[ghost_flood,unbounded]': lambda: bench_gcs_ghost_flood(),
+        'gcs.receive_update[ghost_flood,max_tracks=10000]': lambda: bench_gcs_ghost_flood(max_tracks=10000),
+        'n_scen_stat.run_simulation[no_attacks]': lambda: bench_run_simulation({}),
+        'n_scen_stat.run_simulation[jamming_spoofing]': lambda: bench_run_simulation(
+            {'jamming': True, 'spoofing': True}),
+    }
+    for size in fleet_sizes:
+        benchmarks[f'fleet[{size}].per_message'] = lambda size=size: bench_fleet(size)
+
+    results = {}
+    for name, bench in benchmarks.items():
+        random.seed(0)
+        # The attack models print every event; keep that out of the terminal (not out of the timing)
+        with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+            results[name] = bench()
+        rate = f"  ({1 / results[name]:,.0f} msg/s)" if name.startswith('fleet') else ""
+        print(f"{name:48s} {results[name] * 1e6:12.2f} us/op{rate}")
+    return results
+
+
+def compare(results, baseline, threshold):
+    """
+    Compare against a stored baseline.
+    :return: List of (name, baseline, current, ratio) for benchmarks slower than threshold.
+    """
+    regressions = []
+    for name, current in results.items():
+        if name not in baseline:
+            continue
+        ratio = current / baseline[name]
+        flag = "REGRESSION" if ratio > 1 + threshold else ""
+        print(f"{name:48s} {ratio:6.2f}x baseline {flag}")
+        if flag:
+            regressions.append((name, baseline[name], current, ratio))
+    return regressions
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the simulator's hot paths.")
+    parser.add_argument('--baseline', default=BASELINE_PATH, help="Baseline JSON file.")
+    parser.add_argument('--save-baseline', action='store_true', help="Store this run as the new baseline.")
+    parser.add_argument('--threshold', type=float, default=0.20,
+                        help="Allowed slowdown before a benchmark counts as a regression (0.20 = 20%%).")
+    parser.add_argument('--fleet-sizes', type=int, nargs='*', default=list(FLEET_SIZES))
+    args = parser.parse_args()
+
+    print(f"Kernel backend: {kernels.active.name}")
+    results = collect(args.fleet_sizes)
+
+    if args.save_baseline:
+        os.makedirs(os.path.dirname(args.baseline) or '.', exist_ok=True)
+        with open(args.baseline, 'w') as f:
+            json.dump(results, f, indent=2, sort_keys=True)
+        print(f"Baseline saved to {args.baseline}")
+    elif os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            regressions = compare(results, json.load(f), args.threshold)
+        if regressions:
+            print(f"{len(regressions)} benchmark(s) regressed by more than {args.threshold:.0%}")
+            sys.exit(1)
+    else:
+        print(f"No baseline at {args.baseline}; rerun with --save-baseline to create one.")
@@ -0,0 +1,136 @@
+import multiprocessing as mp
+import pickle
+import random
+import time
+
+import numpy as np
+
+from checkpoint import Checkpointer
+from gcs import GCS
+from n_scen_stat import center_lat, center_lon, initial_state, advance_simulation, make_attackers, scenarios
+from streaming_metrics import ScenarioMetrics
+
+# Attack parameters a variant may set; everything else is shared with the warm-up
+ATTACK_PARAMETERS = ('jamming', 'spoofing', 'spoof_probability', 'noise_level', 'pulse_duration', 'pulse_interval')
+
+# Warm-up snapshot seen by branch workers: set in the parent before forking, or by _init_worker
+_prefix = None
+
+
+def warm_up(warmup_messages, num_drones=None, seed=0, error_rate=0.01, corruption_model='uniform',
+            prefix_path=None):
+    """
+    Run the attack-free prefix shared by every variant.
+    :param warmup_messages: Messages to send before the attacks start.
+    :param prefix_path: Optional snapshot file; an existing prefix with the same parameters is reused.
+    :return: Prefix dictionary: pickled state plus the global random generator states.
+    """
+    config = {'scenario': 'warm_up', 'warmup_messages': warmup_messages, 'num_drones': num_drones,
+              'seed': seed, 'error_rate': error_rate, 'corruption_model': corruption_model}
+    checkpoint = Checkpointer(prefix_path, every_seconds=None) if prefix_path is not None else None
+    state, _ = checkpoint.load(config) if checkpoint is not None else (None, 0)
+    if state is None:
+        state = initial_state(num_drones=num_drones, error_rate=error_rate, corruption_model=corruption_model,
+                              stats=ScenarioMetrics(max_series_points=0), seed=seed)
+        state['gcs'] = GCS(center_lat, center_lon)  # Not the module-level GCS: branches own their tracks
+        advance_simulation(state, max_messages=warmup_messages)
+        if checkpoint is not None:
+            checkpoint.save(config, state, state['messages'])
+    else:
+        print(f"[Branch] Reusing warm-up prefix {prefix_path}")
+    return {'state': state, 'blob': pickle.dumps(state, protocol=pickle.HIGHEST_PROTOCOL),
+            'random': random.getstate(), 'np_random': np.random.get_state()}
+
+
+def _init_worker(prefix):
+    global _prefix
+    _prefix = prefix
+
+
+def _run_branch(args):
+    name, variant, shared = args
+    # A forked worker runs a single branch and can use the inherited state in place (copy-on-write);
+    # otherwise every branch starts from its own copy of the pickled snapshot
+    state = _prefix['state'] if shared else pickle.loads(_prefix['blob'])
+    random.setstate(_prefix['random'])
+    np.random.set_state(_prefix['np_random'])
+
+    attacks = {key: value for key, value in variant.items() if key in ATTACK_PARAMETERS}
+    unknown = set(variant) - set(ATTACK_PARAMETERS)
+    if unknown:
+        raise ValueError(f"Variant {name!r} changes {sorted(unknown)}, which the warm-up already fixed")
+    state['jammer'], state['spoofer'] = make_attackers(state['clock'], streams=state['streams'], **attacks)
+    start = time.perf_counter()
+    advance_simulation(state)
+    summary = state['stats'].summary()
+    summary['tracks'] = len(state['gcs'].drone_positions)
+    summary['branch_seconds'] = time.perf_counter() - start
+    return name, summary
+
+
+def run_branches(variants=None, warmup_messages=500, num_drones=None, seed=0, error_rate=0.01,
+                 corruption_model='uniform', processes=None, prefix_path=None):
+    """
+    Run a shared attack-free warm-up once, then fly every attack variant on from that snapshot.
+    Where the platform can fork, each variant gets a fresh worker sharing the warm-up state
+    copy-on-write; elsewhere workers receive the pickled snapshot once and clone it per variant.
+    Every branch restores the warm-up random generator states, so with a seed a branch matches
+    a full run whose attacks switch on after warmup_messages messages.
+    :param variants: Dictionary of name -> attack parameters (as in n_scen_stat.scenarios).
+    :param warmup_messages: Messages sent before the attacks start.
+    :param processes: Worker processes (None uses every core, 1 runs in-process).
+    :param prefix_path: Optional snapshot file caching the warm-up between calls.
+    :return: Dictionary of name -> summary metrics of the complete run (warm-up included).
+    """
+    global _prefix
+    if variants is None:
+        variants = scenarios
+    start = time.perf_counter()
+    prefix = warm_up(warmup_messages, num_drones, seed, error_rate, corruption_model, prefix_path)
+    print(f"[Branch] Warm-up of {prefix['state']['messages']} messages took {time.perf_counter() - start:.2f} s, "
+          f"snapshot {len(prefix['blob']) / 1e3:.0f} kB")
+
+    tasks = list(variants.items())
+    if processes == 1 or len(tasks) < 2:
+        _prefix = prefix
+        results = [_run_branch((name, variant, False)) for name, variant in tasks]
+    elif 'fork' in mp.get_all_start_methods():
+        _prefix = prefix
+        with mp.get_context('fork').Pool(processes, maxtasksperchild=1) as pool:
+            results = pool.map(_run_branch, [(name, variant, True) for name, variant in tasks], chunksize=1)
+    else:
+        # Spawned workers cannot inherit the state; ship the snapshot once per worker instead
+        shipped = {key: value for key, value in prefix.items() if key != 'state'}
+        with mp.get_context('spawn').Pool(processes, initializer=_init_worker, initargs=(shipped,)) as pool:
+            results = pool.map(_run_branch, [(name, variant, False) for name, variant in tasks], chunksize=1)
+    _prefix = None
+    return dict(results)
+
+
+if __name__ == "__main__":
+    import contextlib
+    import io
+
+    variants = dict(scenarios)
+    variants["Weak Spoofing"] = {"spoofing": True, "spoof_probability": 0.2}
+    variants["Long Pulses"] = {"jamming": True, "pulse_duration": 1.5}
+    variants["Jamming + Spoofing"] = {"jamming": True, "spoofing": True}
+    num_drones, warmup_messages = 20, 2000
+
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):  # The spoofer logs every message it alters
+        results = run_branches(variants, warmup_messages, num_drones=num_drones, seed=7)
+    branched = time.perf_counter() - start
+    for name, summary in results.items():
+        print(f"[Branch] {name:20s} messages {summary['messages']:6d}  loss {summary['packet_loss']:6.2f}%  "
+              f"tracks {summary['tracks']:3d}  suffix {summary['branch_seconds']:.2f} s")
+
+    # The same sweep without sharing: every variant replays the warm-up itself
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):
+        for name, variant in variants.items():
+            _prefix = warm_up(warmup_messages, num_drones, seed=7)
+            _run_branch((name, variant, False))
+    _prefix = None
+    print(f"[Branch] {len(variants)} variants: {branched:.2f} s branched vs "
+          f"{time.perf_counter() - start:.2f} s from scratch")
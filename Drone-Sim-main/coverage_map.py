@@ -0,0 +1,261 @@
+import hashlib
+import json
+import os
+
+import numpy as np
+
+import kernels
+from adsb_codec import FRAME_BYTES
+from adsbchannel import ADSBChannel, ppm_bit_error_rate
+from multilateration import to_local, from_local
+from scenario import center_lat, center_lon
+
+# Part of every cache key; bump when the coverage model changes so stale maps are recomputed
+COVERAGE_VERSION = 1
+
+
+def grid_axes(center=(center_lat, center_lon), half_width=5000.0, spacing=100.0, altitudes=(50.0, 100.0, 150.0, 200.0)):
+    """
+    Latitude, longitude and altitude axes of a square grid of drone positions.
+    :param half_width: Meters from the center to the grid edge, east/west and north/south.
+    :param spacing: Meters between neighbouring grid points.
+    """
+    offsets = np.arange(-half_width, half_width + spacing / 2, spacing)
+    lat_axis, _ = from_local(np.zeros_like(offsets), offsets, *center)
+    _, lon_axis = from_local(offsets, np.zeros_like(offsets), *center)
+    return lat_axis, lon_axis, np.asarray(altitudes, dtype=np.float64)
+
+
+def combine_dbm_batch(a_dbm, b_dbm):
+    """Power sum of two (arrays of) levels in dBm, like kernels.combine_dbm."""
+    return 10 * np.log10(10 ** (np.asarray(a_dbm) / 10) + 10 ** (np.asarray(b_dbm) / 10))
+
+
+class CoverageMap:
+    """
+    Received SNR, jam-to-signal ratio and predicted packet loss over a 3D grid of drone positions
+    for any number of candidate GCS sites, evaluated with broadcast array arithmetic instead of
+    one ADSBChannel.transmit call per point. The loss model is transmit's in expectation:
+    corruption below 0 dB SNR or at error_rate ('uniform'), or any bit error in the frame ('ber'),
+    and with a PulsedNoiseJammer its drop probability during pulses, its noise always counting
+    against SNR as it does in transmit.
+    Maps are cached on disk, keyed by the channel, jammer, sites and grid.
+    """
+    def __init__(self, channel=None, jammer=None, jammer_position=None, jammer_eirp_dbm=None, tx_power_dbm=50,
+                 bandwidth_hz=1e6, slant_range=True, cache_dir='results/coverage_cache'):
+        """
+        :param channel: ADSBChannel whose link budget, corruption model and precision are used.
+        :param jammer: Optional jammer.PulsedNoiseJammer. Without jammer_position its noise_level is
+            the jamming power at every receiver in dBm, as in transmit.
+        :param jammer_position: Optional (lat, lon) of the jammer; the jamming power at each site is
+            then jammer_eirp_dbm less the free-space loss from the jammer, so siting can move away from it.
+        :param slant_range: Include the altitude difference in the distance; transmit uses ground
+            distance only, which is what False reproduces.
+        :param cache_dir: Directory of cached maps (None disables caching).
+        """
+        if jammer_position is not None and (jammer is None or jammer_eirp_dbm is None):
+            raise ValueError("A jammer position needs a jammer and its EIRP")
+        self.channel = channel if channel is not None else ADSBChannel(realtime_delay=False)
+        self.jammer = jammer
+        self.jammer_position = jammer_position
+        self.jammer_eirp_dbm = jammer_eirp_dbm
+        self.tx_power_dbm = tx_power_dbm
+        self.bandwidth_hz = bandwidth_hz
+        self.slant_range = slant_range
+        self.cache_dir = cache_dir
+
+    def cache_key(self, sites, lat_axis, lon_axis, alt_axis):
+        """Stable hash of everything a map depends on."""
+        channel = self.channel
+        jammer = self.jammer
+        key = {
+            'version': COVERAGE_VERSION,
+            'channel': {'error_rate': float(channel.error_rate), 'frequency': float(channel.frequency),
+                        'noise_figure_db': float(channel.noise_figure_db), 'bit_rate': float(channel.bit_rate),
+                        'corruption_model': channel.corruption_model, 'precision': channel.dtype.name},
+            'jammer': None if jammer is None else {
+                'type': type(jammer).__name__, 'pulse_duration': jammer.pulse_duration,
+                'pulse_interval': jammer.pulse_interval, 'noise_level': jammer.noise_level,
+                'drop_probability': jammer.drop_probability, 'position': self.jammer_position,
+                'eirp_dbm': self.jammer_eirp_dbm},
+            'tx_power_dbm': self.tx_power_dbm,
+            'bandwidth_hz': self.bandwidth_hz,
+            'slant_range': self.slant_range,
+            'sites': np.asarray(sites, dtype=np.float64).tolist(),
+            'axes': [np.asarray(axis, dtype=np.float64).tolist() for axis in (lat_axis, lon_axis, alt_axis)],
+        }
+        encoded = json.dumps(key, sort_keys=True, separators=(',', ':'), default=repr)
+        return hashlib.sha256(encoded.encode('utf-8')).hexdigest()[:32]
+
+    def corruption_probability(self, snr_db):
+        """Probability that a message arriving with this SNR is corrupted."""
+        channel = self.channel
+        if channel.corruption_model == 'ber':
+            ber = ppm_bit_error_rate(snr_db, self.bandwidth_hz, channel.bit_rate)
+            return -np.expm1(FRAME_BYTES * 8 * np.log1p(-ber))
+        return np.where(np.asarray(snr_db) < 0, 1.0, float(channel.error_rate))
+
+    def jamming_power_dbm(self, sites):
+        """Jamming power at each site in dBm (None without a jammer)."""
+        if self.jammer is None:
+            return None
+        if self.jammer_position is None:
+            return np.full(len(sites), float(self.jammer.noise_level))
+        distance = kernels.active.haversine_batch(sites[:, 0], sites[:, 1], *self.jammer_position)
+        wavelength = self.channel.light_speed / self.channel.frequency
+        path_loss_db = 20 * np.log10(4 * np.pi * np.maximum(distance, 1.0) / wavelength)
+        return self.jammer_eirp_dbm - path_loss_db
+
+    def _evaluate(self, sites, lat_axis, lon_axis, alt_axis):
+        # Sites along the first axis, then altitude, latitude, longitude
+        site_lat = sites[:, 0, None, None, None]
+        site_lon = sites[:, 1, None, None, None]
+        site_alt = sites[:, 2, None, None, None]
+        ground = kernels.active.haversine_batch(lat_axis[None, None, :, None], lon_axis[None, None, None, :],
+                                                site_lat, site_lon)
+        distance = np.broadcast_to(ground, (len(sites), len(alt_axis), len(lat_axis), len(lon_axis)))
+        if self.slant_range:
+            distance = np.hypot(distance, alt_axis[None, :, None, None] - site_alt)
+        _, rx_power_dbm, snr_db = self.channel.link_budget_distances(distance, self.tx_power_dbm, self.bandwidth_hz)
+        dtype = self.channel.dtype
+
+        jamming_dbm = self.jamming_power_dbm(sites)
+        if jamming_dbm is None:
+            return {'snr_db': snr_db, 'js_db': np.full_like(snr_db, -np.inf),
+                    'loss': self.corruption_probability(snr_db).astype(dtype)}
+        jamming_dbm = jamming_dbm[:, None, None, None]
+        noise_dbm = self.channel.thermal_noise_power(self.bandwidth_hz)
+        jammed_snr_db = rx_power_dbm - (combine_dbm_batch(noise_dbm, jamming_dbm) + self.channel.noise_figure_db)
+        jammer = self.jammer
+        blocked = jammer.pulse_duration / (jammer.pulse_duration + jammer.pulse_interval) * jammer.drop_probability
+        loss = blocked + (1 - blocked) * self.corruption_probability(jammed_snr_db)
+        return {'snr_db': jammed_snr_db.astype(dtype), 'js_db': (jamming_dbm - rx_power_dbm).astype(dtype),
+                'loss': loss.astype(dtype)}
+
+    def compute(self, sites, lat_axis, lon_axis, alt_axis, chunk_sites=64):
+        """
+        Evaluate the grid for every site.
+        :param sites: Sequence of (lat, lon) or (lat, lon, alt) receiver positions.
+        :param lat_axis, lon_axis, alt_axis: Grid axes (see grid_axes).
+        :param chunk_sites: Sites evaluated per broadcast pass, bounding temporary memory.
+        :return: Dictionary of 'snr_db' (SNR including any jamming noise), 'js_db' (jam-to-signal ratio,
+            -inf without a jammer) and 'loss' (predicted packet-loss probability) arrays of shape
+            (sites, altitudes, latitudes, longitudes) in the channel's precision.
+        """
+        sites = np.asarray(sites, dtype=np.float64)
+        if sites.shape[1] == 2:
+            sites = np.column_stack([sites, np.zeros(len(sites))])
+        axes = [np.asarray(axis, dtype=np.float64) for axis in (lat_axis, lon_axis, alt_axis)]
+
+        path = None
+        if self.cache_dir is not None:
+            path = os.path.join(self.cache_dir, f"{self.cache_key(sites, *axes)}.npz")
+            if os.path.exists(path):
+                with np.load(path) as cached:
+                    return {name: cached[name] for name in cached.files}
+
+        chunks = [self._evaluate(sites[start:start + chunk_sites], *axes)
+                  for start in range(0, len(sites), chunk_sites)]
+        result = {name: np.concatenate([chunk[name] for chunk in chunks]) for name in chunks[0]}
+        if path is not None:
+            # Write to a temporary file first so an interrupted run never leaves a truncated map
+            os.makedirs(self.cache_dir, exist_ok=True)
+            tmp_path = f"{path}.{os.getpid()}.tmp.npz"
+            np.savez(tmp_path, **result)
+            os.replace(tmp_path, path)
+        return result
+
+    def best_sites(self, candidates, lat_axis, lon_axis, alt_axis, k=1, max_loss=0.05, weights=None):
+        """
+        Greedy placement of k receivers among candidate sites. A grid point counts as covered when
+        its best receiver predicts at most max_loss; each round adds the site covering the most
+        remaining weight, ties going to the lower mean loss. Greedy placement is within 1 - 1/e of
+        the best possible coverage for this kind of objective.
+        :param weights: Optional (altitudes, latitudes, longitudes) importance of each grid point,
+            e.g. expected traffic; uniform when None.
+        :return: List of per-round dictionaries: 'site' (lat, lon, alt), 'index' into candidates,
+            'coverage' (covered share of the weight) and 'mean_loss' with the receivers chosen so far.
+        """
+        candidates = np.asarray(candidates, dtype=np.float64)
+        loss = self.compute(candidates, lat_axis, lon_axis, alt_axis)['loss']
+        loss = loss.reshape(len(candidates), -1).astype(np.float64)
+        weights = np.ones(loss.shape[1]) if weights is None else np.asarray(weights, dtype=np.float64).ravel()
+        weights = weights / weights.sum()
+
+        best = np.ones(loss.shape[1])
+        rounds = []
+        for _ in range(min(k, len(candidates))):
+            combined = np.minimum(best, loss)
+            coverage = (combined <= max_loss) @ weights
+            mean_loss = combined @ weights
+            choice = int(np.lexsort((mean_loss, -coverage))[0])
+            best = combined[choice]
+            rounds.append({'site': tuple(candidates[choice].tolist()), 'index': choice,
+                           'coverage': float(coverage[choice]), 'mean_loss': float(mean_loss[choice])})
+        return rounds
+
+
+if __name__ == "__main__":
+    import time
+    from checkpoint import SimClock
+    from jammer import PulsedNoiseJammer
+
+    lat_axis, lon_axis, alt_axis = grid_axes(half_width=20000.0, spacing=250.0)
+    east, north = np.meshgrid(np.linspace(-15000, 15000, 15), np.linspace(-15000, 15000, 15))
+    candidate_lat, candidate_lon = from_local(east.ravel(), north.ravel(), center_lat, center_lon)
+    candidates = np.column_stack([candidate_lat, candidate_lon])
+    points = len(candidates) * len(alt_axis) * len(lat_axis) * len(lon_axis)
+
+    # A jammer 8 km east of the White House site; transmit's jammer (noise_level 1 dBm at the receiver) blocks
+    # every message anywhere, so this one is placed and powered to leave room for siting
+    jammer = PulsedNoiseJammer(pulse_duration=0.5, pulse_interval=2.0)
+    jammer_position = from_local(8000.0, 0.0, center_lat, center_lon)
+    coverage = CoverageMap(ADSBChannel(realtime_delay=False, precision='float32'), jammer=jammer,
+                           jammer_position=jammer_position, jammer_eirp_dbm=45.0, cache_dir=None)
+    start = time.perf_counter()
+    maps = coverage.compute(candidates, lat_axis, lon_axis, alt_axis)
+    seconds = time.perf_counter() - start
+    print(f"[Coverage] {len(candidates)} sites x {points // len(candidates)} grid points in {seconds:.2f} s "
+          f"({seconds / points * 1e9:.1f} ns per point, {sum(a.nbytes for a in maps.values()) / 1e6:.0f} MB)")
+
+    # Scalar reference: transmit's SNR at random points for the White House site
+    channel = ADSBChannel(realtime_delay=False)
+    reference = CoverageMap(channel, slant_range=False, cache_dir=None)
+    rng = np.random.default_rng(0)
+    lat_index, lon_index = rng.integers(0, len(lat_axis), 500), rng.integers(0, len(lon_axis), 500)
+    snr_map = reference.compute([(center_lat, center_lon)], lat_axis, lon_axis, alt_axis[:1])['snr_db'][0, 0]
+    start = time.perf_counter()
+    snr_scalar = [channel.transmit({'drone_id': "1", 'latitude': lat_axis[i], 'longitude': lon_axis[j],
+                                    'altitude': 100.0, 'timestamp': 0.0}, (center_lat, center_lon))[3]
+                  for i, j in zip(lat_index, lon_index)]
+    per_transmit = (time.perf_counter() - start) / len(lat_index)
+    print(f"[Coverage] SNR vs transmit: max difference {np.max(np.abs(snr_map[lat_index, lon_index] - snr_scalar)):.1e} dB; "
+          f"the same grid through transmit would take {per_transmit * points:.0f} s without its sleeps")
+
+    # Predicted loss vs transmit's empirical loss with a weaker jammer at the receiver, either side of 0 dB SNR;
+    # messages every 10 ms so pulse edges are sampled finely
+    clock = SimClock()
+    weak = PulsedNoiseJammer(pulse_duration=0.5, pulse_interval=2.0, noise_level=-70.0, clock=clock)
+    predicted = CoverageMap(channel, jammer=weak, slant_range=False, cache_dir=None).compute(
+        [(center_lat, center_lon)], lat_axis, lon_axis, alt_axis[:1])['loss'][0, 0]
+    middle = len(lon_axis) // 2
+    for j in (middle + 20, len(lon_axis) - 1):
+        lost, sent = 0, 20000
+        for _ in range(sent):
+            clock.advance(0.01)
+            message = {'drone_id': "1", 'latitude': lat_axis[middle], 'longitude': lon_axis[j], 'altitude': 100.0,
+                       'timestamp': clock()}
+            received, _, corrupted, _ = channel.transmit(message, (center_lat, center_lon), jammer=weak)
+            lost += received is None or corrupted
+        distance = to_local(lat_axis[middle], lon_axis[j], center_lat, center_lon)[0]
+        print(f"[Coverage] {distance / 1e3:5.1f} km: predicted loss {predicted[middle, j]:.3f}, "
+              f"transmit {lost / sent:.3f}")
+
+    # The candidate grid's center is the White House site run_simulation uses
+    default = maps['loss'][len(candidates) // 2]
+    print(f"[Coverage] White House site: coverage {np.mean(default <= 0.15):.1%}, mean loss {default.mean():.3f}")
+    placements = coverage.best_sites(candidates, lat_axis, lon_axis, alt_axis, k=3, max_loss=0.15)
+    for k, placement in enumerate(placements, start=1):
+        site_east, site_north = to_local(placement['site'][0], placement['site'][1], center_lat, center_lon)
+        print(f"[Coverage] Receiver {k} at ({site_east / 1e3:+.1f}, {site_north / 1e3:+.1f}) km: coverage "
+              f"{placement['coverage']:.1%}, mean loss {placement['mean_loss']:.3f}")
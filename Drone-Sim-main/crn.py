@@ -0,0 +1,76 @@
+import math
+
+from streaming_metrics import RunningStats
+from sweep import ParameterSweep
+
+# Summary metrics compared by default
+DEFAULT_METRICS = ('packet_loss', 'mean_snr', 'mean_latency', 'throughput')
+
+
+def paired_comparison(baseline, variants, replications=10, seed=0, common_random=True, metrics=DEFAULT_METRICS,
+                      max_workers=None, cache_dir='results/crn_cache', **shared):
+    """
+    Estimate how each variant scenario differs from a baseline, replication by replication.
+    With common_random, replication r runs every scenario with seed + r and per-message synchronized
+    random streams (see n_scen_stat.synchronize_streams): the scenarios fly the same routes through
+    the same channel noise, so the paired differences only carry the attack's own randomness.
+    Without it every scenario gets its own seeds, which is the independent-sampling reference.
+    :param baseline: run_simulation parameters of the reference scenario (e.g. scenarios["No Attacks"]).
+    :param variants: Dictionary of name -> run_simulation parameters.
+    :param replications: Paired replications per scenario.
+    :param metrics: Summary metrics to compare.
+    :param max_workers: Worker processes for the underlying sweep (1 runs in-process).
+    :param cache_dir: Sweep cache; replications that were already run are not repeated.
+    :param shared: Further run_simulation arguments common to every scenario (num_drones, error_rate, ...).
+    :return: Dictionary of name -> metric -> {'difference': mean paired difference, 'half_width': 95%
+        confidence half-width, 'replications', 'variance_reduction': (var(variant) + var(baseline)) /
+        var(difference), i.e. how many independent replications each paired one is worth}.
+    """
+    scenario_params = [baseline] + list(variants.values())
+    configs = []
+    for replication in range(replications):
+        for index, params in enumerate(scenario_params):
+            run_seed = seed + replication if common_random else seed + index * replications + replication
+            configs.append(dict(shared, **params, seed=run_seed, common_random=common_random))
+    summaries = [result for _, result in ParameterSweep(cache_dir=cache_dir, max_workers=max_workers).run(configs)]
+
+    width = len(scenario_params)
+    report = {}
+    for index, name in enumerate(variants, start=1):
+        report[name] = {}
+        for metric in metrics:
+            difference, reference, variant = RunningStats(), RunningStats(), RunningStats()
+            for replication in range(replications):
+                base_value = summaries[replication * width][metric]
+                value = summaries[replication * width + index][metric]
+                if base_value is None or value is None:  # e.g. no delivery to take an SNR from
+                    continue
+                difference.push(value - base_value)
+                reference.push(base_value)
+                variant.push(value)
+            unpaired = reference.variance + variant.variance
+            report[name][metric] = {
+                'difference': difference.mean,
+                'half_width': difference.half_width,
+                'replications': difference.count,
+                'variance_reduction': unpaired / difference.variance if difference.variance > 0 else math.inf,
+            }
+    return report
+
+
+if __name__ == "__main__":
+    import contextlib
+    import io
+    from n_scen_stat import scenarios
+
+    variants = {name: scenarios[name] for name in ("Only Spoofing", "Aggressive Spoofing", "Only Jamming")}
+    for common_random in (False, True):
+        with contextlib.redirect_stdout(io.StringIO()):  # The spoofer logs every message it alters
+            report = paired_comparison(scenarios["No Attacks"], variants, replications=8, seed=11,
+                                       common_random=common_random, num_drones=5)
+        print(f"[CRN] {'common random numbers' if common_random else 'independent streams'}:")
+        for name, result in report.items():
+            for metric in ('packet_loss', 'mean_latency'):
+                r = result[metric]
+                print(f"[CRN]   {name:20s} {metric:13s} {r['difference']:+10.4f} +/- {r['half_width']:.4f} "
+                      f"(variance reduction x{r['variance_reduction']:.1f})")
@@ -1,4 +1,5 @@
 from jammer import ContinuousWaveJammer
+import random
 import time
 import numpy as np
 import matplotlib.pyplot as plt
@@ -8,6 +9,8 @@ from route import RouteGenerator
 from gcs import GCS
 from adsbchannel import ADSBChannel
 from spoofer import Spoofer
+from streaming_metrics import ScenarioMetrics
+from checkpoint import SimClock
 import seaborn as sns
 
 # Define central location (e.g., Washington, D.C.)
@@ -22,7 +25,13 @@ route_gen = RouteGenerator(center_lat, center_lon, num_routes=2, waypoints_per_r
 routes = route_gen.generate_routes()
 
 # Function to initialize drones
-def initialize_drones():
+def initialize_drones(drone_routes=None):
+    """
+    Build one drone per route.
+    :param drone_routes: Routes to fly; defaults to the module-level routes.
+    """
+    if drone_routes is None:
+        drone_routes = routes
     return [
         Drone(
             id=f"{i+1}",
@@ -34,9 +43,9 @@ def initialize_drones():
             altitude_error=1.0,
             battery_consume_rate=0.05,
             battery_capacity=10.0 + i*5,
-            route=routes[i]
+            route=drone_routes[i]
         )
-        for i in range(len(routes))
+        for i in range(len(drone_routes))
     ]
 
 # Scenarios using CW Jamming
@@ -46,30 +55,61 @@ scenarios = {
     "CW Jamming and Spoofing": {"jamming": True, "spoofing": True},
 }
 
-def run_simulation(jamming=False, spoofing=False, spoof_probability=0.5): 
-    channel = ADSBChannel()
-    
-    jammer = ContinuousWaveJammer(power_dbm=-55, noise_level=0.1, jamming_interval=1.0) if jamming else None  
-   
-    spoofer = Spoofer(spoof_probability=spoof_probability, fake_drone_id="FAKE-DRONE") if spoofing else None
-
-    drones = initialize_drones()
-    total_messages = 0
-    lost_messages = 0
-    packet_loss_over_time = []
-    snr_values = []
-    latency_values = []
-    throughput_values = []
-
-    start_time = time.time()
-
-    for drone in drones:
+def run_simulation(jamming=False, spoofing=False, spoof_probability=0.5, stats=None, seed=None, checkpoint=None):
+    """
+    Runs a CW jamming scenario.
+    :param stats: Optional streaming_metrics.ScenarioMetrics to fill; read summary() after the run.
+    :param seed: Seed the random generators and run on a simulated clock, making the run, routes included,
+        reproducible across processes.
+    :param checkpoint: Optional checkpoint.Checkpointer to resume from and save to (see n_scen_stat).
+    :return: Plotting series (packet_loss, snr, latency, throughput).
+    """
+    config = {'scenario': 'cw_scen_stat', 'jamming': jamming, 'spoofing': spoofing,
+              'spoof_probability': spoof_probability, 'seed': seed}
+    state, messages = checkpoint.load(config) if checkpoint is not None else (None, 0)
+
+    if state is None:
+        drone_routes = routes
+        if seed is not None:
+            random.seed(seed)
+            np.random.seed(seed)
+            # Drawn straight after seeding, so a seeded run flies the same mission in every process
+            drone_routes = RouteGenerator(center_lat, center_lon, num_routes=len(routes), waypoints_per_route=5,
+                                          max_offset=0.02).generate_routes()
+        channel = ADSBChannel(seed=seed)
+
+        jammer = ContinuousWaveJammer(power_dbm=-55, noise_level=0.1, jamming_interval=1.0) if jamming else None
+
+        spoofer = Spoofer(spoof_probability=spoof_probability, fake_drone_id="FAKE-DRONE") if spoofing else None
+
+        state = {'drones': initialize_drones(drone_routes), 'drone_index': 0, 'channel': channel, 'jammer': jammer,
+                 'spoofer': spoofer, 'clock': SimClock() if seed is not None else time.time,
+                 'stats': stats if stats is not None else ScenarioMetrics(), 'gcs': gcs}
+    else:
+        if stats is not None:
+            stats.__dict__.update(state['stats'].__dict__)
+            state['stats'] = stats
+        gcs.__dict__.update(state['gcs'].__dict__)
+        state['gcs'] = gcs
+
+    drones, channel, jammer, spoofer = state['drones'], state['channel'], state['jammer'], state['spoofer']
+    clock, stats = state['clock'], state['stats']
+
+    for drone_index in range(state['drone_index'], len(drones)):
+        state['drone_index'] = drone_index
+        drone = drones[drone_index]
         while True:
+            if checkpoint is not None and checkpoint.due(messages):
+                checkpoint.save(config, state, messages)
+            if isinstance(clock, SimClock):
+                clock.advance(1)
+
             status = drone.calculate_navigation(1)
             if status in [-1, -2, 0]:
                 break
+            messages += 1
 
-            send_time = time.time()
+            send_time = clock()
             original_message = {
                 'drone_id': drone.id,
                 'latitude': drone.current_position[0],
@@ -77,27 +117,20 @@ def run_simulation(jamming=False, spoofing=False, spoof_probability=0.5):
                 'altitude': drone.current_position[2],
                 'timestamp': send_time
             }
+            stats.record_sent(send_time)
 
+            # ContinuousWaveJammer.jam_signal returns only the message, unlike the jammers
+            # ADSBChannel.transmit expects, so CW noise is applied after the channel instead
             received_message, delay_ns, corrupted, snr_db = channel.transmit(
-                original_message, gcs_pos, jammer=jammer, spoofer=spoofer
+                original_message, gcs_pos, spoofer=spoofer
             )
 
-            if jamming and received_message is not None:
-                received_message = jammer.jam_signal(received_message)
-
-            receive_time = time.time()
-            total_messages += 1
-
             if jamming and jammer:
                 received_message = jammer.jam_signal(received_message)
-                jammed = received_message is None
-    
-                if jammed:
-                    lost_messages += 1
-                    packet_loss_over_time.append((total_messages, lost_messages / total_messages * 100))
+                if received_message is None:
+                    stats.record_drop()
                     continue
 
-
             if spoofing and spoofer:
                 received_message, spoofed = spoofer.spoof_message(received_message)
 
@@ -110,42 +143,18 @@ def run_simulation(jamming=False, spoofing=False, spoof_probability=0.5):
                 )
             )
 
-            if corrupted and not (jamming and jammed):
-                lost_messages += 1
-
-            packet_loss_over_time.append((total_messages, lost_messages / total_messages * 100))
-            snr_values.append((total_messages, snr_db))
-
-            latency = (receive_time - send_time) * 1000
-            latency_values.append((total_messages, latency))
-
-            elapsed_time = receive_time - start_time
-            throughput = total_messages / elapsed_time
-            throughput_values.append((elapsed_time, throughput))
-
-    return packet_loss_over_time, snr_values, latency_values, throughput_values
-
-# Run simulations for CW Jamming scenarios
-results = {}
-for scenario, params in scenarios.items():
-    print(f"Running scenario: {scenario}")
-    packet_loss_data, snr_data, latency_data, throughput_data = run_simulation(**params)
-    results[scenario] = {
-        'packet_loss': packet_loss_data,
-        'snr': snr_data,
-        'latency': latency_data,
-        'throughput': throughput_data
-    }
+            # Latency is the modeled over-the-air delay, not wall time spent in time.sleep
+            stats.record_delivery(clock(), snr_db, delay_ns / 1e6, corrupted)
 
-# Save results
-if not os.path.exists('results'):
-    os.makedirs('results')
+    if checkpoint is not None:
+        checkpoint.complete()
+    return stats.series()
 
 # Plot results
 def plot_cw_results(results):
     plt.figure(figsize=(12, 6))
     for scenario, data in results.items():
-        if 'packet_loss' in data:
+        if 'packet_loss' in data and data['packet_loss']:
             times, packet_loss = zip(*data['packet_loss'])
             plt.plot(times, packet_loss, label=scenario)
 
@@ -157,4 +166,21 @@ def plot_cw_results(results):
     plt.savefig('results/cw_packet_loss.png')
     plt.show()
 
-plot_cw_results(results)
+if __name__ == "__main__":
+    # Run simulations for CW Jamming scenarios
+    results = {}
+    for scenario, params in scenarios.items():
+        print(f"Running scenario: {scenario}")
+        packet_loss_data, snr_data, latency_data, throughput_data = run_simulation(**params)
+        results[scenario] = {
+            'packet_loss': packet_loss_data,
+            'snr': snr_data,
+            'latency': latency_data,
+            'throughput': throughput_data
+        }
+
+    # Save results
+    if not os.path.exists('results'):
+        os.makedirs('results')
+
+    plot_cw_results(results)
@@ -1,6 +1,6 @@
-import math
 import matplotlib.pyplot as plt
 import time
+import kernels
 
 class Drone:
     def __init__(self, id, drone_type, acceleration_rate, climb_rate, speed, position_error,
@@ -28,15 +28,7 @@ class Drone:
 
     def haversine_distance(self, lat1, lon1, lat2, lon2):
         """Calculate the great-circle distance between two points on Earth (meters)."""
-        R = 6371000  # Earth radius in meters
-        phi1, phi2 = math.radians(lat1), math.radians(lat2)
-        delta_phi = math.radians(lat2 - lat1)
-        delta_lambda = math.radians(lon2 - lon1)
-
-        a = (math.sin(delta_phi / 2) ** 2 +
-             math.cos(phi1) * math.cos(phi2) * math.sin(delta_lambda / 2) ** 2)
-        c = 2 * math.atan2(math.sqrt(a), math.sqrt(1 - a))
-        return R * c  # Distance in meters
+        return kernels.active.haversine(lat1, lon1, lat2, lon2)
 
     def calculate_battery_usage(self, move_distance, move_altitude):
         """Compute battery consumption based on movement and altitude change."""
@@ -62,30 +54,16 @@ class Drone:
         lat1, lon1, alt1 = self.current_position
         lat2, lon2, alt2 = self.target_position
 
-        distance = self.haversine_distance(lat1, lon1, lat2, lon2)
-        alt_difference = alt2 - alt1
-        move_distance = min(self.speed * delta_time, distance)
-        move_altitude = min(self.climb_rate * delta_time, abs(alt_difference)) * (1 if alt_difference > 0 else -1)
-
-        # Interpolate new position
-        if distance > 0:
-            ratio = move_distance / distance
-            new_lat = lat1 + ratio * (lat2 - lat1)
-            new_lon = lon1 + ratio * (lon2 - lon1)
-        else:
-            new_lat, new_lon = lat1, lon1
-
-        new_alt = alt1 + move_altitude
-
-        # Battery usage
-        energy_used = self.calculate_battery_usage(move_distance, move_altitude)
-        self.battery_remaining = max(0, self.battery_remaining - energy_used)  # Prevent negative battery
+        # Movement, battery usage and arrival test in one compiled (or plain Python) kernel
+        new_lat, new_lon, new_alt, self.battery_remaining, arrived = kernels.active.navigation_step(
+            lat1, lon1, alt1, lat2, lon2, alt2, self.speed, self.climb_rate, delta_time, self.battery_remaining,
+            self.battery_consume_rate, self.position_error, self.altitude_error)
 
         if self.battery_remaining == 0:
             return -2  # Battery depleted
 
         # Check if the drone reached the target
-        if self.haversine_distance(new_lat, new_lon, lat2, lon2) <= self.position_error and abs(new_alt - alt2) <= self.altitude_error:
+        if arrived:
             self.current_position = self.target_position
             self.route_index += 1
             if self.route_index < len(self.route):
@@ -1,16 +1,122 @@
 import matplotlib.pyplot as plt
 from mpl_toolkits.mplot3d import Axes3D
+import numpy as np
+import time
+from collections import OrderedDict
+from adsb_codec import correct_single_bit_errors, parity_ok, FRAME_OK, FRAME_CORRECTED, FRAME_REJECTED
 
 class GCS:
-    def __init__(self, lat, lon, alt=0):
-        """Initialize GCS position."""
+    def __init__(self, lat, lon, alt=0, track_ttl=None, max_tracks=None, eviction='lru', confirm_hits=3,
+                 clock=time.time):
+        """
+        Initialize GCS position and its track table.
+        :param track_ttl: Seconds without an update after which a track is dropped; None keeps tracks forever.
+        :param max_tracks: Hard limit on the number of tracks; None is unbounded.
+        :param eviction: Which track makes room when the table is full: 'lru' drops the least recently
+            updated one, 'confidence' drops the least recently updated tentative track (fewer than
+            confirm_hits updates) first and only touches confirmed tracks when there are none.
+        :param confirm_hits: Updates after which a track counts as confirmed under 'confidence' eviction.
+        :param clock: Time source for TTL expiry when receive_update is not given a time.
+        """
+        if eviction not in ('lru', 'confidence'):
+            raise ValueError(f"Unknown eviction policy {eviction!r}")
+        if max_tracks is not None and max_tracks < 1:
+            raise ValueError("max_tracks must be at least 1")
         self.position = (lat, lon, alt)
         self.drone_positions = {}
+        self.frame_counts = {'ok': 0, 'corrected': 0, 'rejected': 0}
+        self.track_ttl = track_ttl
+        self.max_tracks = max_tracks
+        self.eviction = eviction
+        self.confirm_hits = confirm_hits if eviction == 'confidence' else 1
+        self.clock = clock
+        # Track id -> last update time, least recently updated first. Refreshing a track moves it to
+        # the back, so both TTL expiry and LRU eviction only ever pop from the front: O(1) per update.
+        self._tentative = OrderedDict()
+        self._confirmed = OrderedDict()
+        self._hits = {}
+        self.evictions = {'expired': 0, 'capacity': 0}
 
-    def receive_update(self, drone_id, position):
-        """Receive updated position from the drone."""
+    def receive_update(self, drone_id, position, now=None):
+        """
+        Receive updated position from the drone.
+        :param now: Update time for TTL bookkeeping (defaults to the GCS clock); must not go backwards.
+        """
+        if self.track_ttl is None and self.max_tracks is None:
+            self.drone_positions[drone_id] = position
+            return
+        if now is None:
+            now = self.clock()
+        hits = self._hits.get(drone_id, 0) + 1
+        self._hits[drone_id] = hits
+        if drone_id in self._confirmed:
+            self._confirmed.move_to_end(drone_id)
+            self._confirmed[drone_id] = now
+        elif hits >= self.confirm_hits:
+            self._tentative.pop(drone_id, None)
+            self._confirmed[drone_id] = now
+        else:
+            self._tentative[drone_id] = now
+            self._tentative.move_to_end(drone_id)
         self.drone_positions[drone_id] = position
 
+        if self.track_ttl is not None:
+            self.expire(now)
+        if self.max_tracks is not None:
+            while len(self.drone_positions) > self.max_tracks:
+                # Never evict the track that was just updated
+                victims = self._tentative if self._tentative and next(iter(self._tentative)) != drone_id \
+                    else self._confirmed
+                self._drop(victims, next(iter(victims)))
+                self.evictions['capacity'] += 1
+
+    def expire(self, now=None):
+        """
+        Drop tracks not updated within track_ttl of now.
+        :return: Number of tracks removed.
+        """
+        if self.track_ttl is None:
+            return 0
+        if now is None:
+            now = self.clock()
+        cutoff = now - self.track_ttl
+        removed = 0
+        for tracks in (self._tentative, self._confirmed):
+            while tracks:
+                drone_id, last_seen = next(iter(tracks.items()))
+                if last_seen > cutoff:
+                    break
+                self._drop(tracks, drone_id)
+                removed += 1
+        self.evictions['expired'] += removed
+        return removed
+
+    def _drop(self, tracks, drone_id):
+        del tracks[drone_id]
+        del self._hits[drone_id]
+        del self.drone_positions[drone_id]
+
+    def receive_frames(self, frames, codec, correct_errors=True):
+        """
+        Receive a batch of raw DF17 frames: frames failing the CRC-24 check are dropped,
+        optionally after repairing those with a single-bit error.
+        :param frames: uint8 array of shape (n, 14).
+        :param codec: adsb_codec.FrameCodec used to decode positions and drone ids.
+        :param correct_errors: Attempt single-bit error correction before rejecting.
+        :return: Per-frame status (FRAME_OK, FRAME_CORRECTED or FRAME_REJECTED).
+        """
+        if correct_errors:
+            frames, status = correct_single_bit_errors(frames)
+        else:
+            status = np.where(parity_ok(frames), FRAME_OK, FRAME_REJECTED)
+        accepted = status != FRAME_REJECTED
+        for message in codec.decode_messages(frames[accepted]):
+            self.receive_update(message['drone_id'], (message['latitude'], message['longitude'], message['altitude']))
+        self.frame_counts['ok'] += int(np.count_nonzero(status == FRAME_OK))
+        self.frame_counts['corrected'] += int(np.count_nonzero(status == FRAME_CORRECTED))
+        self.frame_counts['rejected'] += int(np.count_nonzero(status == FRAME_REJECTED))
+        return status
+
     def plot_status(self, routes):
         """Plots the waypoints, drones, and GCS position."""
         fig = plt.figure()
@@ -0,0 +1,227 @@
+import argparse
+import asyncio
+import random
+import multiprocessing as mp
+import socket
+import struct
+import time
+
+import numpy as np
+
+from adsb_codec import FrameCodec, FRAME_BYTES, FRAME_REJECTED, correct_single_bit_errors
+from gcs import GCS
+from scenario import center_lat, center_lon
+
+# Datagram: emitter send time (float64, for one-way latency on localhost) + one or more DF17 frames
+DATAGRAM_HEADER = struct.Struct('<d')
+
+
+class GCSServer(asyncio.DatagramProtocol):
+    """
+    Networked ground station: receives ADS-B frames over UDP, queues them, and a consumer task
+    decodes them in batches (CRC check, single-bit repair) and updates the GCS track table.
+    The queue is bounded; datagrams arriving while it is full are dropped and counted, the way a
+    saturated ingest path sheds load. Malformed datagrams are dropped and counted on arrival.
+    """
+    def __init__(self, gcs, max_queue=10000, batch_size=1024):
+        """
+        :param gcs: GCS receiving the decoded positions.
+        :param max_queue: Datagrams held between the socket and the decoder.
+        :param batch_size: Frames decoded per consumer iteration.
+        """
+        self.gcs = gcs
+        self.codec = FrameCodec(gcs.position[0], gcs.position[1])
+        self.queue = asyncio.Queue(maxsize=max_queue)
+        self.batch_size = batch_size
+        self.transport = None
+        self.datagrams = 0
+        self.frames = 0
+        self.dropped = 0
+        self.malformed = 0
+        self.rejected = 0
+        self.max_queue_depth = 0
+        self.latency_sum = 0.0
+        self.started = None
+        self.last_decoded = None
+
+    def connection_made(self, transport):
+        self.transport = transport
+
+    def datagram_received(self, data, addr):
+        if self.started is None:
+            self.started = time.perf_counter()
+        self.datagrams += 1
+        payload = len(data) - DATAGRAM_HEADER.size
+        if payload <= 0 or payload % FRAME_BYTES:
+            self.malformed += 1  # Would break the decoder's header unpack or frame reshape
+            return
+        try:
+            self.queue.put_nowait((time.time(), data))
+        except asyncio.QueueFull:
+            self.dropped += 1
+            return
+        depth = self.queue.qsize()
+        if depth > self.max_queue_depth:
+            self.max_queue_depth = depth
+
+    async def consume(self):
+        """Decoder task: drain the queue in batches and update the GCS."""
+        while True:
+            items = [await self.queue.get()]
+            while len(items) < self.batch_size and not self.queue.empty():
+                items.append(self.queue.get_nowait())
+
+            payloads = []
+            for received_at, data in items:
+                (sent_at,) = DATAGRAM_HEADER.unpack_from(data)
+                self.latency_sum += (received_at - sent_at) * ((len(data) - DATAGRAM_HEADER.size) // FRAME_BYTES)
+                payloads.append(data[DATAGRAM_HEADER.size:])
+            frames = np.frombuffer(b''.join(payloads), dtype=np.uint8).reshape(-1, FRAME_BYTES)
+            frames, status = correct_single_bit_errors(frames)
+            accepted = status != FRAME_REJECTED
+            for message in self.codec.decode_messages(frames[accepted]):
+                self.gcs.receive_update(message['drone_id'],
+                                        (message['latitude'], message['longitude'], message['altitude']))
+            self.frames += len(frames)
+            self.rejected += int(np.count_nonzero(~accepted))
+            self.last_decoded = time.perf_counter()
+            # Yield to the event loop so the socket keeps being serviced under load
+            await asyncio.sleep(0)
+
+    def report(self):
+        elapsed = (self.last_decoded or time.perf_counter()) - self.started if self.started else 0.0
+        return {
+            'datagrams': self.datagrams,
+            'frames': self.frames,
+            'dropped_datagrams': self.dropped,
+            'malformed_datagrams': self.malformed,
+            'rejected_frames': self.rejected,
+            'queue_depth': self.queue.qsize(),
+            'max_queue_depth': self.max_queue_depth,
+            'ingest_frames_per_s': self.frames / elapsed if elapsed > 0 else 0.0,
+            'mean_latency_ms': self.latency_sum / self.frames * 1e3 if self.frames else None,
+            'tracks': len(self.gcs.drone_positions),
+        }
+
+
+def run_emitter(address, first_id, num_drones, rate, duration, frames_per_datagram=1, seed=None):
+    """
+    Load-generator process: flies a slice of the fleet and sends each drone's position as
+    DF17 frames over UDP at the requested per-drone rate.
+    :param rate: Position reports per drone per second (ADS-B nominal is 2).
+    :param duration: Seconds to emit for.
+    :param seed: Seed for this emitter's routes and send-time jitter.
+    """
+    from drone import Drone
+    from route import RouteGenerator
+
+    rng = np.random.default_rng(seed)
+    random.seed(seed)  # Routes come from the global generator, which forked emitters would otherwise share
+    routes = RouteGenerator(center_lat, center_lon, num_routes=num_drones, waypoints_per_route=5,
+                            max_offset=0.02).generate_routes()
+    drones = [
+        Drone(id=f"{first_id + i + 1}", drone_type="type1", acceleration_rate=2.0, climb_rate=3.0,
+              speed=10.0 + (i % 5) * 5, position_error=2.0, altitude_error=1.0, battery_consume_rate=0.05,
+              battery_capacity=1e9, route=route)  # Battery never limits a load test
+        for i, route in enumerate(routes)
+    ]
+    codec = FrameCodec(center_lat, center_lon)
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+
+    period = 1.0 / rate
+    start = time.perf_counter()
+    tick = 0
+    while time.perf_counter() - start < duration:
+        messages = []
+        for drone in drones:
+            if drone.calculate_navigation(period) == 1:
+                lat, lon, alt = drone.current_position
+                messages.append({'drone_id': drone.id, 'latitude': lat, 'longitude': lon, 'altitude': alt})
+        if messages:
+            frames = codec.encode_messages(messages)
+            offsets = range(0, len(frames), frames_per_datagram)
+            spacing = period / len(offsets)
+            tick_start = start + tick * period
+            for k, offset in enumerate(offsets):
+                # Spread one tick's reports over the period instead of sending them as a single burst;
+                # sub-millisecond gaps are not worth a sleep each, so those datagrams go out together
+                ahead = tick_start + k * spacing - time.perf_counter()
+                if ahead > 1e-3:
+                    time.sleep(ahead)
+                sock.sendto(DATAGRAM_HEADER.pack(time.time())
+                            + frames[offset:offset + frames_per_datagram].tobytes(), address)
+        tick += 1
+        # Jitter each tick around its nominal slot; scaling it by the tick count would let the schedule drift
+        delay = start + tick * period + period * rng.uniform(-0.01, 0.01) - time.perf_counter()
+        if delay > 0:
+            time.sleep(delay)
+    sock.close()
+
+
+def check_consumer(consumer):
+    """Raise if the decoder task has stopped, instead of reporting a queue that only fills up."""
+    if consumer.done():
+        error = consumer.exception()
+        raise RuntimeError("GCS decoder task stopped") from error
+
+
+async def serve(num_drones, processes, rate, duration, port=0, max_queue=10000, frames_per_datagram=1,
+                report_interval=1.0, track_ttl=None, max_tracks=None):
+    """
+    Start the UDP GCS on localhost, launch emitter processes and report ingest statistics.
+    :param track_ttl: GCS track expiry in seconds (None keeps tracks forever).
+    :param max_tracks: GCS track table limit (None is unbounded).
+    :return: Final report dictionary.
+    """
+    loop = asyncio.get_running_loop()
+    gcs = GCS(center_lat, center_lon, track_ttl=track_ttl, max_tracks=max_tracks, eviction='confidence')
+    server = GCSServer(gcs, max_queue=max_queue)
+    transport, _ = await loop.create_datagram_endpoint(lambda: server, local_addr=('127.0.0.1', port))
+    sock = transport.get_extra_info('socket')
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 1 << 22)
+    address = sock.getsockname()
+    consumer = asyncio.create_task(server.consume())
+
+    per_process = int(np.ceil(num_drones / processes))
+    emitters = []
+    for p in range(processes):
+        count = min(per_process, num_drones - p * per_process)
+        if count <= 0:
+            break
+        emitter = mp.Process(target=run_emitter, args=(address, p * per_process, count, rate, duration,
+                                                       frames_per_datagram, p), daemon=True)
+        emitter.start()
+        emitters.append(emitter)
+
+    try:
+        while any(emitter.is_alive() for emitter in emitters):
+            await asyncio.sleep(report_interval)
+            check_consumer(consumer)
+            print(f"[GCSServer] {server.report()}")
+        # Let the decoder drain what is still queued
+        while not server.queue.empty():
+            await asyncio.sleep(0.01)
+            check_consumer(consumer)
+    finally:
+        for emitter in emitters:
+            emitter.terminate()
+        consumer.cancel()
+    transport.close()
+    return server.report()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Load-test a UDP ground station with emitter processes.")
+    parser.add_argument('--drones', type=int, default=1000)
+    parser.add_argument('--processes', type=int, default=4)
+    parser.add_argument('--rate', type=float, default=2.0, help="Reports per drone per second.")
+    parser.add_argument('--duration', type=float, default=10.0)
+    parser.add_argument('--max-queue', type=int, default=10000)
+    parser.add_argument('--frames-per-datagram', type=int, default=1)
+    parser.add_argument('--track-ttl', type=float)
+    parser.add_argument('--max-tracks', type=int)
+    args = parser.parse_args()
+
+    print(asyncio.run(serve(args.drones, args.processes, args.rate, args.duration,
+                            max_queue=args.max_queue, frames_per_datagram=args.frames_per_datagram,
+                            track_ttl=args.track_ttl, max_tracks=args.max_tracks)))
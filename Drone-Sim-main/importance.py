@@ -0,0 +1,262 @@
+import math
+import random
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from gcs import GCS
+from message_log import FLAG_CORRUPTED, FLAG_JAMMED, FLAG_SPOOFED
+from n_scen_stat import center_lat, center_lon, initial_state, advance_simulation
+
+
+class ImportanceSampler:
+    """
+    Draws the simulator's rare Bernoulli events ('corruption' in ADSBChannel, 'jam_drop' in
+    PulsedNoiseJammer) from biased probabilities and keeps the log likelihood ratio of the
+    nominal over the biased path, so outcomes of a biased run can be reweighted to nominal ones.
+    The bias may depend on how many times in a row the event has just happened: outages are runs
+    of losses, and pushing a run along is far cheaper in weight variance than raising the loss
+    rate everywhere. Any such history-dependent bias keeps the reweighted estimate unbiased.
+    """
+    def __init__(self, biases, rng=None, stop_after=None):
+        """
+        :param biases: Dictionary of event name -> sampling probability, or list of probabilities
+            indexed by the current run of consecutive hits (the last entry covers longer runs).
+            Events not listed are drawn nominally.
+        :param rng: random.Random driving the draws.
+        :param stop_after: Once an event has hit this many times in a row, draw everything nominally:
+            the outage has happened and further bias would only add weight variance.
+        """
+        self.biases = {name: list(bias) if isinstance(bias, (list, tuple)) else [bias]
+                       for name, bias in biases.items()}
+        self.rng = rng if rng is not None else random.Random()
+        self.stop_after = stop_after
+        self.log_weight = 0.0
+        self.run = {name: 0 for name in biases}
+        self.trials = {name: [0] * len(bias) for name, bias in self.biases.items()}
+        self.hits = {name: [0] * len(bias) for name, bias in self.biases.items()}
+        self.stopped = False
+
+    def bernoulli(self, name, probability):
+        """Draw one event whose nominal probability is `probability`."""
+        bias = self.biases.get(name)
+        if bias is None or self.stopped:
+            return self.rng.random() < probability
+        stage = min(self.run[name], len(bias) - 1)
+        q = bias[stage]
+        hit = self.rng.random() < q
+        self.trials[name][stage] += 1
+        if hit:
+            self.hits[name][stage] += 1
+            self.log_weight += math.log(probability / q) if probability > 0 else -math.inf
+            self.run[name] += 1
+            if self.stop_after is not None and self.run[name] >= self.stop_after:
+                self.stopped = True
+        else:
+            self.log_weight += math.log1p(-probability) - math.log1p(-q)
+            self.run[name] = 0
+        return hit
+
+
+class OutageMonitor:
+    """
+    Channel recorder (same record() signature as message_log.MessageLogWriter) that tracks, per
+    drone, the longest run of consecutive reports lost to jamming or arriving corrupted or spoofed.
+    Drones report once per simulated second, so a run of k reports is a k-second outage.
+    """
+    def __init__(self):
+        self.current = {}
+        self.longest = {}
+        self.reports = {}
+
+    def record(self, timestamp, tx_id, tx_position, rx_message, snr_db, delay_ns, flags):
+        self.reports[tx_id] = self.reports.get(tx_id, 0) + 1
+        if rx_message is None or flags & (FLAG_CORRUPTED | FLAG_JAMMED | FLAG_SPOOFED):
+            run = self.current.get(tx_id, 0) + 1
+            self.current[tx_id] = run
+            if run > self.longest.get(tx_id, 0):
+                self.longest[tx_id] = run
+        else:
+            self.current[tx_id] = 0
+            self.longest.setdefault(tx_id, 0)
+
+    def longest_outage(self):
+        """Longest run of lost reports over the whole fleet."""
+        return max(self.longest.values(), default=0)
+
+
+def run_replication(config):
+    """
+    One biased replication (top-level so it can run in worker processes).
+    :param config: Dictionary with 'seed', 'biases', 'outage_reports', 'route_seed' and initial_state parameters.
+        The fleet comes from route_seed, so every replication flies the same mission; seed
+        drives the channel and attack randomness.
+    :return: Dictionary with the longest outage, the log likelihood ratio and the biased draw counts.
+    """
+    config = dict(config)
+    seed, biases, outage_reports = config.pop('seed'), config.pop('biases'), config.pop('outage_reports')
+    state = initial_state(seed=config.pop('route_seed'), **config)
+    random.seed(seed)
+    np.random.seed(seed)
+    state['gcs'] = GCS(center_lat, center_lon)
+    channel = state['channel']
+    channel.realtime_delay = False
+    sampler = ImportanceSampler(biases, random.Random(seed), stop_after=outage_reports)
+    channel.importance = sampler
+    if state['jammer'] is not None:
+        state['jammer'].importance = sampler
+    monitor = OutageMonitor()
+    channel.recorder = monitor
+    advance_simulation(state)
+    return {'longest_outage': monitor.longest_outage(), 'log_weight': sampler.log_weight,
+            'trials': sampler.trials, 'hits': sampler.hits}
+
+
+def estimate(results, outage_reports):
+    """
+    Reweighted probability that some drone loses at least outage_reports consecutive reports.
+    :return: Dictionary with the estimate, its standard error and relative error, the effective
+        sample size of the weights (ESS), the effective number of event samples, the mean weight
+        (close to 1 for a sound bias) and the largest single contribution to the estimate.
+    """
+    n = len(results)
+    weights = np.exp([r['log_weight'] for r in results])
+    events = np.array([r['longest_outage'] >= outage_reports for r in results])
+    values = np.where(events, weights, 0.0)
+    probability = values.mean()
+    std_error = values.std(ddof=1) / math.sqrt(n) if n > 1 else math.inf
+    event_weight = values.sum()
+    return {
+        'probability': probability,
+        'std_error': std_error,
+        'relative_error': std_error / probability if probability > 0 else math.inf,
+        'replications': n,
+        'events': int(events.sum()),
+        'ess': weights.sum() ** 2 / (weights ** 2).sum(),
+        'event_ess': event_weight ** 2 / (values ** 2).sum() if event_weight > 0 else 0.0,
+        'mean_weight': weights.mean(),
+        'max_weight_share': values.max() / event_weight if event_weight > 0 else 0.0,
+    }
+
+
+def cross_entropy_biases(results, outage_reports, floor=1e-4):
+    """
+    Cross-entropy update of the biases from a batch of replications: each event's new sampling
+    probability, per run stage, is its likelihood-weighted hit rate over the replications that
+    reached the outage.
+    :return: New biases dictionary (None when no replication reached the outage).
+    """
+    weights = np.exp([r['log_weight'] for r in results])
+    events = np.array([r['longest_outage'] >= outage_reports for r in results])
+    if not events.any():
+        return None
+    reached = weights * events
+    biases = {}
+    for name in results[0]['trials']:
+        hits = np.array([r['hits'][name] for r in results])
+        trials = np.array([r['trials'][name] for r in results])
+        weighted_hits = reached @ hits
+        weighted_trials = reached @ trials
+        stages = [min(max(h / t, floor), 1 - floor) if t > 0 else None
+                  for h, t in zip(weighted_hits.tolist(), weighted_trials.tolist())]
+        # Stages no event passed through keep their previous neighbour's value
+        for stage in range(len(stages)):
+            if stages[stage] is None:
+                stages[stage] = stages[stage - 1] if stage else floor
+        biases[name] = stages
+    return biases
+
+
+class RareOutageStudy:
+    """
+    Importance-sampling estimate of the probability that a mission suffers a rare link outage,
+    with optional cross-entropy tuning of the biases from pilot batches.
+    """
+    def __init__(self, outage_reports=5, route_seed=0, max_workers=None, **scenario):
+        """
+        :param outage_reports: Consecutive lost reports (seconds) that count as an outage.
+        :param route_seed: Seed of the mission's routes, shared by every replication.
+        :param max_workers: Worker processes (None uses every core, 1 runs in-process).
+        :param scenario: initial_state parameters (num_drones, error_rate, jamming, ...).
+        """
+        self.outage_reports = outage_reports
+        self.route_seed = route_seed
+        self.max_workers = max_workers
+        self.scenario = scenario
+
+    def simulate(self, biases, replications, seed=0):
+        """Run replications seed .. seed + replications - 1 under the given biases."""
+        configs = [dict(self.scenario, seed=seed + i, biases=biases, route_seed=self.route_seed,
+                        outage_reports=self.outage_reports)
+                   for i in range(replications)]
+        if self.max_workers == 1:
+            return [run_replication(config) for config in configs]
+        with ProcessPoolExecutor(max_workers=self.max_workers) as executor:
+            return list(executor.map(run_replication, configs, chunksize=max(1, replications // 64)))
+
+    def tune(self, biases, replications=100, rounds=3, seed=0):
+        """
+        Refine the biases with cross-entropy pilot rounds.
+        :param biases: Starting biases, strong enough that some pilot replications reach the outage.
+        """
+        for round_index in range(rounds):
+            results = self.simulate(biases, replications, seed + round_index * replications)
+            updated = cross_entropy_biases(results, self.outage_reports)
+            if updated is None:
+                print(f"[IS] Pilot round {round_index + 1} saw no outage; keeping {biases}")
+                break
+            biases = updated
+            print(f"[IS] Pilot round {round_index + 1}: biases {biases}")
+        return biases
+
+    def run(self, biases, replications, seed=1_000_000):
+        """Biased replications and their reweighted estimate (see estimate())."""
+        return estimate(self.simulate(biases, replications, seed), self.outage_reports)
+
+
+def exact_outage_probability(report_counts, probability, outage_reports):
+    """
+    Probability that at least one drone loses outage_reports consecutive reports when each report is
+    lost independently with the given probability; the reference for the attack-free case.
+    :param report_counts: Number of reports each drone sends.
+    """
+    none_anywhere = 1.0
+    for n in report_counts:
+        # Distribution of the current run of losses, capped below the outage length
+        runs = np.zeros(outage_reports)
+        runs[0] = 1.0
+        for _ in range(n):
+            lost = runs * probability
+            runs = np.concatenate([[runs.sum() * (1 - probability)], lost[:-1]])
+        none_anywhere *= runs.sum()
+    return 1 - none_anywhere
+
+
+if __name__ == "__main__":
+    import time
+
+    error_rate, outage_reports, num_drones = 0.01, 5, 4
+    study = RareOutageStudy(outage_reports=outage_reports, route_seed=3, num_drones=num_drones, error_rate=error_rate)
+
+    # Reports per drone of this mission, for the exact attack-free reference
+    state = initial_state(seed=3, num_drones=num_drones, error_rate=error_rate)
+    state['gcs'] = GCS(center_lat, center_lon)
+    state['channel'].realtime_delay = False
+    monitor = state['channel'].recorder = OutageMonitor()
+    advance_simulation(state)
+    exact = exact_outage_probability(list(monitor.reports.values()), error_rate, outage_reports)
+
+    start = time.perf_counter()
+    plain = estimate(study.simulate({}, 400), outage_reports)
+    plain_seconds = time.perf_counter() - start
+    start = time.perf_counter()
+    # Nominal loss rate until a run starts, then push runs along until they become outages
+    biases = study.tune({'corruption': [error_rate] + [0.5] * (outage_reports - 1)}, replications=100)
+    result = study.run(biases, 400)
+    is_seconds = time.perf_counter() - start
+    print(f"[IS] Exact: {exact:.3e} for {sum(monitor.reports.values())} reports")
+    print(f"[IS] Plain Monte Carlo: {plain['probability']:.3e} ({plain['events']} outages in 400 runs, "
+          f"{plain_seconds:.1f} s)")
+    print(f"[IS] Importance sampling: {result['probability']:.3e} +/- {result['std_error']:.1e} "
+          f"(relative error {result['relative_error']:.2f}, ESS {result['ess']:.1f}, "
+          f"event ESS {result['event_ess']:.1f}, largest share {result['max_weight_share']:.2f}, {is_seconds:.1f} s)")
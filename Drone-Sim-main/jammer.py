@@ -31,22 +31,28 @@ class Jammer:
         return self.jamming_power_dbm
 
 class PulsedNoiseJammer:
-    def __init__(self, pulse_duration=0.5, pulse_interval=2.0, noise_level=1.0):
+    def __init__(self, pulse_duration=0.5, pulse_interval=2.0, noise_level=1.0, clock=time.time, rng=None):
         """
         Initialize a pulsed noise jammer.
         :param pulse_duration: Duration of each jamming pulse in seconds.
         :param pulse_interval: Interval between pulses in seconds.
         :param noise_level: Strength of the noise added during jamming.
+        :param clock: Time source for pulse timing (e.g. checkpoint.SimClock for reproducible runs).
+        :param rng: Optional random.Random for jamming draws; the module-level generator when None.
         """
         self.pulse_duration = pulse_duration
         self.pulse_interval = pulse_interval
         self.noise_level = noise_level
-        self.last_pulse_time = time.time()
+        self.clock = clock
+        self.rng = rng
+        self.drop_probability = 0.5  # Chance that an active pulse blocks a message outright
+        self.importance = None  # Optional importance.ImportanceSampler biasing the drop draw
+        self.last_pulse_time = clock()
         self.jamming_active = False
 
     def update_jamming_state(self):
         """Toggle jamming based on pulse timing."""
-        current_time = time.time()
+        current_time = self.clock()
         elapsed_time = current_time - self.last_pulse_time
 
         if self.jamming_active and elapsed_time >= self.pulse_duration:
@@ -64,13 +70,18 @@ class PulsedNoiseJammer:
         """
         self.update_jamming_state()
         if self.jamming_active:
+            rng = self.rng or random
+            if self.importance is not None:
+                dropped = self.importance.bernoulli('jam_drop', self.drop_probability)
+            else:
+                dropped = rng.random() < self.drop_probability
             # Either completely jam (None) or introduce high noise in coordinates
-            if random.random() < 0.5:  # 50% chance to completely jam the message
+            if dropped:
                 return None, True
             else:
-                message['latitude'] += random.uniform(-self.noise_level, self.noise_level)
-                message['longitude'] += random.uniform(-self.noise_level, self.noise_level)
-                message['altitude'] += random.uniform(-10 * self.noise_level, 10 * self.noise_level)
+                message['latitude'] += rng.uniform(-self.noise_level, self.noise_level)
+                message['longitude'] += rng.uniform(-self.noise_level, self.noise_level)
+                message['altitude'] += rng.uniform(-10 * self.noise_level, 10 * self.noise_level)
                 return message, True
         return message, False  # Message not jammed
 
@@ -216,18 +227,19 @@ class Drone:
         self.logs.append(jammed_message)
         return jammed_message
 
-# Initialize drone and jammer
-jammer = SweepingJammer(jamming_probability=0.5, noise_intensity=0.8, hop_rate=3, freq_range=(1090, 1095), power_dbm=-55)
-#jammer = PulsedNoiseJammer(jamming_probability=0.3, noise_intensity=0.7, jamming_power_dbm=-70)
-drone = Drone(drone_id=1, initial_position=(33.6844, 73.0479, 1000), frequency=1092)
+if __name__ == "__main__":
+    # Initialize drone and jammer
+    jammer = SweepingJammer(jamming_probability=0.5, noise_intensity=0.8, hop_rate=3, freq_range=(1090, 1095), power_dbm=-55)
+    #jammer = PulsedNoiseJammer(jamming_probability=0.3, noise_intensity=0.7, jamming_power_dbm=-70)
+    drone = Drone(drone_id=1, initial_position=(33.6844, 73.0479, 1000), frequency=1092)
 
-# Start jamming before drone transmission
-jammer.start_jamming()
+    # Start jamming before drone transmission
+    jammer.start_jamming()
 
-# Simulate transmissions
-for _ in range(10):
-    time.sleep(1)
-    drone.transmit(jammer)
+    # Simulate transmissions
+    for _ in range(10):
+        time.sleep(1)
+        drone.transmit(jammer)
 
-# Stop jamming after testing
-jammer.stop_jamming()
+    # Stop jamming after testing
+    jammer.stop_jamming()
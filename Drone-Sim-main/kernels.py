@@ -0,0 +1,379 @@
+import math
+import os
+
+import numpy as np
+
+try:
+    import numba
+    from numba.extending import register_jitable
+except ImportError:  # Optional: without Numba every kernel runs as plain Python / NumPy
+    numba = None
+
+EARTH_RADIUS = 6371000.0  # Meters
+
+
+def _jitable(fn):
+    # Lets compiled code call the function while Python callers keep the plain version
+    return register_jitable(fn) if numba is not None else fn
+
+
+# ----------- Scalar kernels (plain math; compiled as-is when Numba is available) ----------- #
+
+@_jitable
+def haversine(lat1, lon1, lat2, lon2):
+    """Great-circle distance between two points on Earth (meters)."""
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    delta_phi = math.radians(lat2 - lat1)
+    delta_lambda = math.radians(lon2 - lon1)
+    a = math.sin(delta_phi / 2) ** 2 + math.cos(phi1) * math.cos(phi2) * math.sin(delta_lambda / 2) ** 2
+    return EARTH_RADIUS * 2 * math.atan2(math.sqrt(a), math.sqrt(1 - a))
+
+
+@_jitable
+def navigation_step(lat1, lon1, alt1, lat2, lon2, alt2, speed, climb_rate, delta_time, battery_remaining,
+                    battery_consume_rate, position_error, altitude_error):
+    """
+    One Drone.calculate_navigation move towards the target waypoint.
+    :return: (new lat, new lon, new alt, battery remaining, True if the target was reached).
+    """
+    distance = haversine(lat1, lon1, lat2, lon2)
+    alt_difference = alt2 - alt1
+    move_distance = min(speed * delta_time, distance)
+    move_altitude = min(climb_rate * delta_time, abs(alt_difference)) * (1 if alt_difference > 0 else -1)
+    if distance > 0:
+        ratio = move_distance / distance
+        new_lat = lat1 + ratio * (lat2 - lat1)
+        new_lon = lon1 + ratio * (lon2 - lon1)
+    else:
+        new_lat, new_lon = lat1, lon1
+    new_alt = alt1 + move_altitude
+    energy_used = battery_consume_rate * (move_distance / speed) + abs(move_altitude) * 0.05
+    battery = max(0.0, battery_remaining - energy_used)
+    arrived = (haversine(new_lat, new_lon, lat2, lon2) <= position_error
+               and abs(new_alt - alt2) <= altitude_error)
+    return new_lat, new_lon, new_alt, battery, arrived
+
+
+@_jitable
+def navigation_step_local(east, north, alt, target_east, target_north, target_alt, speed, climb_rate, delta_time,
+                          battery_remaining, battery_consume_rate, position_error, altitude_error):
+    """
+    navigation_step in local east/north meters around a fleet origin (planar distances, which over
+    the tens of kilometres of an operating area differ from great-circle ones by well under 0.1%).
+    :return: (new east, new north, new alt, battery remaining, True if the target was reached).
+    """
+    d_east, d_north = target_east - east, target_north - north
+    distance = math.sqrt(d_east * d_east + d_north * d_north)
+    alt_difference = target_alt - alt
+    move_distance = min(speed * delta_time, distance)
+    move_altitude = min(climb_rate * delta_time, abs(alt_difference))
+    if alt_difference <= 0:
+        move_altitude = -move_altitude
+    ratio = move_distance / distance if distance > 0 else 0.0
+    new_east, new_north = east + ratio * d_east, north + ratio * d_north
+    new_alt = alt + move_altitude
+    energy_used = battery_consume_rate * (move_distance / speed) + abs(move_altitude) * 0.05
+    battery = max(0.0, battery_remaining - energy_used)
+    remaining = math.sqrt((target_east - new_east) ** 2 + (target_north - new_north) ** 2)
+    arrived = remaining <= position_error and abs(new_alt - target_alt) <= altitude_error
+    return new_east, new_north, new_alt, battery, arrived
+
+
+@_jitable
+def link_budget(distance, tx_power_dbm, wavelength, noise_power_dbm, noise_figure_db):
+    """Free-space link budget: (received power in dBm, SNR in dB)."""
+    path_loss_db = 20 * math.log10(4 * math.pi * distance / wavelength) if distance > 0 else 0.0
+    rx_power_dbm = tx_power_dbm - path_loss_db
+    return rx_power_dbm, rx_power_dbm - (noise_power_dbm + noise_figure_db)
+
+
+def combine_dbm(power1_dbm, power2_dbm):
+    """Sum of two powers given in dBm (noise plus interference)."""
+    return 10 * math.log10(10 ** (power1_dbm / 10) + 10 ** (power2_dbm / 10))
+
+
+# ----------- NumPy batch kernels ----------- #
+
+def haversine_batch_numpy(lat1, lon1, lat2, lon2):
+    """haversine for arrays of points against one reference point or a matching array."""
+    phi1, phi2 = np.radians(lat1), np.radians(lat2)
+    delta_phi = np.radians(np.subtract(lat2, lat1))
+    delta_lambda = np.radians(np.subtract(lon2, lon1))
+    a = np.sin(delta_phi / 2) ** 2 + np.cos(phi1) * np.cos(phi2) * np.sin(delta_lambda / 2) ** 2
+    return EARTH_RADIUS * 2 * np.arctan2(np.sqrt(a), np.sqrt(1 - a))
+
+
+def navigation_step_batch_numpy(lat1, lon1, alt1, lat2, lon2, alt2, speed, climb_rate, delta_time,
+                                battery_remaining, battery_consume_rate, position_error, altitude_error):
+    """navigation_step for a whole fleet; every argument but delta_time is an array (or broadcasts)."""
+    distance = haversine_batch_numpy(lat1, lon1, lat2, lon2)
+    alt_difference = alt2 - alt1
+    move_distance = np.minimum(speed * delta_time, distance)
+    move_altitude = np.minimum(climb_rate * delta_time, np.abs(alt_difference)) * np.where(alt_difference > 0, 1, -1)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        ratio = np.where(distance > 0, move_distance / distance, 0.0)
+    new_lat = lat1 + ratio * (lat2 - lat1)
+    new_lon = lon1 + ratio * (lon2 - lon1)
+    new_alt = alt1 + move_altitude
+    energy_used = battery_consume_rate * (move_distance / speed) + np.abs(move_altitude) * 0.05
+    battery = np.maximum(0.0, battery_remaining - energy_used)
+    arrived = (haversine_batch_numpy(new_lat, new_lon, lat2, lon2) <= position_error) & \
+              (np.abs(new_alt - alt2) <= altitude_error)
+    return new_lat, new_lon, new_alt, battery, arrived
+
+
+def navigation_step_local_batch_numpy(east, north, alt, target_east, target_north, target_alt, speed, climb_rate,
+                                      delta_time, battery_remaining, battery_consume_rate, position_error,
+                                      altitude_error):
+    """navigation_step_local for a whole fleet; results keep the dtype of `east` (float32 stays float32)."""
+    dtype = np.asarray(east).dtype
+    d_east, d_north = target_east - east, target_north - north
+    distance = np.hypot(d_east, d_north)
+    alt_difference = target_alt - alt
+    move_distance = np.minimum(speed * delta_time, distance)
+    move_altitude = np.minimum(climb_rate * delta_time, np.abs(alt_difference))
+    move_altitude = np.where(alt_difference > 0, move_altitude, -move_altitude)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        ratio = np.where(distance > 0, move_distance / distance, 0)
+    new_east, new_north = east + ratio * d_east, north + ratio * d_north
+    new_alt = alt + move_altitude
+    energy_used = battery_consume_rate * (move_distance / speed) + np.abs(move_altitude) * 0.05
+    battery = np.maximum(battery_remaining - energy_used, 0)
+    arrived = (np.hypot(target_east - new_east, target_north - new_north) <= position_error) & \
+              (np.abs(new_alt - target_alt) <= altitude_error)
+    return (new_east.astype(dtype, copy=False), new_north.astype(dtype, copy=False), new_alt.astype(dtype, copy=False),
+            battery.astype(dtype, copy=False), arrived)
+
+
+def link_budget_batch_numpy(distance, tx_power_dbm, wavelength, noise_power_dbm, noise_figure_db):
+    """link_budget for an array of distances; float32 distances give float32 results."""
+    distance = np.asarray(distance)
+    dtype = distance.dtype if distance.dtype == np.float32 else np.float64
+    with np.errstate(divide='ignore'):
+        path_loss_db = np.where(distance > 0, 20 * np.log10(4 * np.pi * distance / wavelength), 0.0)
+    rx_power_dbm = tx_power_dbm - path_loss_db
+    snr_db = rx_power_dbm - (noise_power_dbm + noise_figure_db)
+    return rx_power_dbm.astype(dtype, copy=False), snr_db.astype(dtype, copy=False)
+
+
+class Kernels:
+    """One backend's set of kernels, scalar and batched."""
+    def __init__(self, name, haversine, navigation_step, navigation_step_local, link_budget, combine_dbm,
+                 haversine_batch, navigation_step_batch, navigation_step_local_batch, link_budget_batch):
+        self.name = name
+        self.haversine = haversine
+        self.navigation_step = navigation_step
+        self.navigation_step_local = navigation_step_local
+        self.link_budget = link_budget
+        self.combine_dbm = combine_dbm
+        self.haversine_batch = haversine_batch
+        self.navigation_step_batch = navigation_step_batch
+        self.navigation_step_local_batch = navigation_step_local_batch
+        self.link_budget_batch = link_budget_batch
+
+
+NUMPY = Kernels('numpy', haversine, navigation_step, navigation_step_local, link_budget, combine_dbm,
+                haversine_batch_numpy, navigation_step_batch_numpy, navigation_step_local_batch_numpy,
+                link_budget_batch_numpy)
+
+
+if numba is not None:
+    # Loop-based batch kernels calling the scalar kernels, compiled in parallel
+    @numba.njit(cache=True, parallel=True)
+    def _haversine_batch_loop(lat1, lon1, lat2, lon2):
+        out = np.empty(lat1.shape[0])
+        for i in numba.prange(lat1.shape[0]):
+            out[i] = haversine(lat1[i], lon1[i], lat2, lon2)
+        return out
+
+    @numba.njit(cache=True, parallel=True)
+    def _navigation_batch_loop(lat1, lon1, alt1, lat2, lon2, alt2, speed, climb_rate, delta_time,
+                               battery_remaining, battery_consume_rate, position_error, altitude_error):
+        n = lat1.shape[0]
+        new_lat, new_lon, new_alt = np.empty(n), np.empty(n), np.empty(n)
+        battery, arrived = np.empty(n), np.empty(n, dtype=np.bool_)
+        for i in numba.prange(n):
+            step = navigation_step(lat1[i], lon1[i], alt1[i], lat2[i], lon2[i], alt2[i], speed[i], climb_rate[i],
+                                   delta_time, battery_remaining[i], battery_consume_rate[i], position_error[i],
+                                   altitude_error[i])
+            new_lat[i], new_lon[i], new_alt[i], battery[i], arrived[i] = step[0], step[1], step[2], step[3], step[4]
+        return new_lat, new_lon, new_alt, battery, arrived
+
+    @numba.njit(cache=True, parallel=True)
+    def _navigation_local_batch_loop(east, north, alt, target_east, target_north, target_alt, speed, climb_rate,
+                                     delta_time, battery_remaining, battery_consume_rate, position_error,
+                                     altitude_error):
+        n = east.shape[0]
+        new_east, new_north, new_alt = np.empty_like(east), np.empty_like(east), np.empty_like(east)
+        battery, arrived = np.empty_like(east), np.empty(n, dtype=np.bool_)
+        for i in numba.prange(n):
+            step = navigation_step_local(east[i], north[i], alt[i], target_east[i], target_north[i], target_alt[i],
+                                         speed[i], climb_rate[i], delta_time, battery_remaining[i],
+                                         battery_consume_rate[i], position_error[i], altitude_error[i])
+            new_east[i], new_north[i], new_alt[i], battery[i], arrived[i] = step[0], step[1], step[2], step[3], step[4]
+        return new_east, new_north, new_alt, battery, arrived
+
+    @numba.njit(cache=True, parallel=True)
+    def _link_budget_batch_loop(distance, tx_power_dbm, wavelength, noise_power_dbm, noise_figure_db):
+        n = distance.shape[0]
+        rx_power_dbm, snr_db = np.empty_like(distance), np.empty_like(distance)
+        for i in numba.prange(n):
+            budget = link_budget(distance[i], tx_power_dbm, wavelength, noise_power_dbm, noise_figure_db)
+            rx_power_dbm[i], snr_db[i] = budget[0], budget[1]
+        return rx_power_dbm, snr_db
+
+    def _haversine_batch_numba(lat1, lon1, lat2, lon2):
+        # The compiled loop takes one reference point; pairs of arrays go through NumPy
+        if np.ndim(lat2) or np.ndim(lon2):
+            return haversine_batch_numpy(lat1, lon1, lat2, lon2)
+        lat1, lon1 = np.asarray(lat1, dtype=np.float64), np.asarray(lon1, dtype=np.float64)
+        return _haversine_batch_loop(lat1.ravel(), lon1.ravel(), float(lat2), float(lon2)).reshape(lat1.shape)
+
+    def _navigation_step_batch_numba(lat1, lon1, alt1, lat2, lon2, alt2, speed, climb_rate, delta_time,
+                                     battery_remaining, battery_consume_rate, position_error, altitude_error):
+        n = len(lat1)
+        columns = [np.ascontiguousarray(np.broadcast_to(np.asarray(c, dtype=np.float64), n))
+                   for c in (lat1, lon1, alt1, lat2, lon2, alt2, speed, climb_rate)]
+        extra = [np.ascontiguousarray(np.broadcast_to(np.asarray(c, dtype=np.float64), n))
+                 for c in (battery_remaining, battery_consume_rate, position_error, altitude_error)]
+        return _navigation_batch_loop(*columns, float(delta_time), *extra)
+
+    def _navigation_step_local_batch_numba(east, north, alt, target_east, target_north, target_alt, speed,
+                                           climb_rate, delta_time, battery_remaining, battery_consume_rate,
+                                           position_error, altitude_error):
+        # Keep the fleet's own precision: float32 fleets are computed and returned in float32
+        dtype = np.asarray(east).dtype
+        n = len(east)
+        columns = [np.ascontiguousarray(np.broadcast_to(np.asarray(c, dtype=dtype), n))
+                   for c in (east, north, alt, target_east, target_north, target_alt, speed, climb_rate)]
+        extra = [np.ascontiguousarray(np.broadcast_to(np.asarray(c, dtype=dtype), n))
+                 for c in (battery_remaining, battery_consume_rate, position_error, altitude_error)]
+        return _navigation_local_batch_loop(*columns, dtype.type(delta_time), *extra)
+
+    def _link_budget_batch_numba(distance, tx_power_dbm, wavelength, noise_power_dbm, noise_figure_db):
+        distance = np.asarray(distance)
+        if distance.dtype != np.float32:
+            distance = distance.astype(np.float64)
+        rx_power_dbm, snr_db = _link_budget_batch_loop(distance.ravel(), float(tx_power_dbm), float(wavelength),
+                                                       float(noise_power_dbm), float(noise_figure_db))
+        return rx_power_dbm.reshape(distance.shape), snr_db.reshape(distance.shape)
+
+    NUMBA = Kernels('numba', numba.njit(cache=True)(haversine), numba.njit(cache=True)(navigation_step),
+                    numba.njit(cache=True)(navigation_step_local), numba.njit(cache=True)(link_budget),
+                    numba.njit(cache=True)(combine_dbm), _haversine_batch_numba, _navigation_step_batch_numba,
+                    _navigation_step_local_batch_numba, _link_budget_batch_numba)
+else:
+    NUMBA = None
+
+# Kernels used by the simulator; DRONE_SIM_KERNELS=numpy forces the fallback even with Numba installed
+active = NUMBA if NUMBA is not None and os.environ.get('DRONE_SIM_KERNELS', 'numba') != 'numpy' else NUMPY
+
+
+def use(backend):
+    """
+    Switch the simulator's kernels.
+    :param backend: 'numba' or 'numpy'.
+    """
+    global active
+    if backend == 'numba' and NUMBA is None:
+        raise ValueError("The numba backend needs the numba package")
+    if backend not in ('numba', 'numpy'):
+        raise ValueError(f"Unknown kernel backend {backend!r}")
+    active = NUMBA if backend == 'numba' else NUMPY
+
+
+def check_agreement(n=100000, seed=0, rtol=1e-9):
+    """
+    Run every kernel of every available backend, scalar and batched, on the same random inputs and
+    compare them with the NumPy batch results.
+    :return: Dictionary of '<backend>.<kernel>' -> largest relative difference.
+    """
+    rng = np.random.default_rng(seed)
+    lat1, lon1 = 38.9 + rng.uniform(-0.05, 0.05, n), -77.0 + rng.uniform(-0.05, 0.05, n)
+    lat2, lon2 = lat1 + rng.normal(0, 1e-3, n), lon1 + rng.normal(0, 1e-3, n)
+    lat2[::97], lon2[::97] = lat1[::97], lon1[::97]  # Exercise the zero-distance branch
+    alt1, alt2 = rng.uniform(80, 200, n), rng.uniform(80, 200, n)
+    speed, climb = rng.uniform(5, 30, n), np.full(n, 3.0)
+    battery, consume = rng.uniform(0, 20, n), np.full(n, 0.05)
+    position_error, altitude_error = np.full(n, 2.0), np.full(n, 1.0)
+    nav_args = (lat1, lon1, alt1, lat2, lon2, alt2, speed, climb, 1.0, battery, consume, position_error,
+                altitude_error)
+    east1, north1 = rng.uniform(-5000, 5000, n), rng.uniform(-5000, 5000, n)
+    east2, north2 = east1 + rng.normal(0, 100, n), north1 + rng.normal(0, 100, n)
+    east2[::97], north2[::97] = east1[::97], north1[::97]
+    local_args = (east1, north1, alt1, east2, north2, alt2) + nav_args[6:]
+    distance = haversine_batch_numpy(lat1, lon1, 38.8977, -77.0365)
+    distance[::101] = 0.0
+    link_args = (50.0, 3e8 / 1090e6, -113.97, 5.0)
+
+    reference = {
+        'haversine': haversine_batch_numpy(lat1, lon1, 38.8977, -77.0365),
+        'navigation_step': np.column_stack(navigation_step_batch_numpy(*nav_args)),
+        'navigation_step_local': np.column_stack(navigation_step_local_batch_numpy(*local_args)),
+        'link_budget': np.column_stack(link_budget_batch_numpy(distance, *link_args)),
+        'combine_dbm': 10 * np.log10(10 ** (distance[:1000] / 1e4) + 10 ** (-100 / 10)),
+    }
+
+    def relative(values, expected):
+        values = np.asarray(values, dtype=np.float64)
+        return float(np.max(np.abs(values - expected) / np.maximum(np.abs(expected), 1.0)))
+
+    report = {}
+    for backend in (NUMPY, NUMBA):
+        if backend is None:
+            continue
+        sample = range(0, n, max(1, n // 2000))  # Scalar kernels are checked on a subset
+        report[f'{backend.name}.haversine'] = relative(
+            [backend.haversine(lat1[i], lon1[i], 38.8977, -77.0365) for i in sample], reference['haversine'][sample])
+        report[f'{backend.name}.navigation_step'] = relative(
+            [backend.navigation_step(lat1[i], lon1[i], alt1[i], lat2[i], lon2[i], alt2[i], speed[i], climb[i], 1.0,
+                                     battery[i], consume[i], position_error[i], altitude_error[i]) for i in sample],
+            reference['navigation_step'][sample])
+        report[f'{backend.name}.navigation_step_local'] = relative(
+            [backend.navigation_step_local(*(a[i] if isinstance(a, np.ndarray) else a for a in local_args))
+             for i in sample], reference['navigation_step_local'][sample])
+        report[f'{backend.name}.link_budget'] = relative(
+            [backend.link_budget(distance[i], *link_args) for i in sample], reference['link_budget'][sample])
+        report[f'{backend.name}.combine_dbm'] = relative(
+            [backend.combine_dbm(d / 1e3, -100.0) for d in distance[:1000]], reference['combine_dbm'])
+        report[f'{backend.name}.haversine_batch'] = relative(
+            backend.haversine_batch(lat1, lon1, 38.8977, -77.0365), reference['haversine'])
+        report[f'{backend.name}.navigation_step_batch'] = relative(
+            np.column_stack(backend.navigation_step_batch(*nav_args)), reference['navigation_step'])
+        report[f'{backend.name}.navigation_step_local_batch'] = relative(
+            np.column_stack(backend.navigation_step_local_batch(*local_args)), reference['navigation_step_local'])
+        report[f'{backend.name}.link_budget_batch'] = relative(
+            np.column_stack(backend.link_budget_batch(distance, *link_args)), reference['link_budget'])
+    failures = {name: diff for name, diff in report.items() if not diff <= rtol}
+    if failures:
+        raise AssertionError(f"Kernel backends disagree beyond {rtol}: {failures}")
+    return report
+
+
+if __name__ == "__main__":
+    import time
+
+    if NUMBA is None:
+        print("[Kernels] numba is not installed; checking the NumPy backend's scalar and batch kernels only")
+    for name, diff in check_agreement().items():
+        print(f"[Kernels] {name:32s} max relative difference {diff:.1e}")
+
+    n = 1_000_000
+    rng = np.random.default_rng(1)
+    fleet = (38.9 + rng.uniform(-0.05, 0.05, n), -77.0 + rng.uniform(-0.05, 0.05, n), rng.uniform(80, 200, n),
+             38.9 + rng.uniform(-0.05, 0.05, n), -77.0 + rng.uniform(-0.05, 0.05, n), rng.uniform(80, 200, n),
+             np.full(n, 15.0), np.full(n, 3.0), 1.0, np.full(n, 10.0), np.full(n, 0.05), np.full(n, 2.0),
+             np.full(n, 1.0))
+    for backend in (NUMPY, NUMBA):
+        if backend is None:
+            continue
+        backend.navigation_step_batch(*fleet)  # Warm-up (compilation for Numba)
+        start = time.perf_counter()
+        backend.navigation_step_batch(*fleet)
+        batch = time.perf_counter() - start
+        start = time.perf_counter()
+        for i in range(10000):
+            backend.navigation_step(*(column[i] if isinstance(column, np.ndarray) else column for column in fleet))
+        scalar = (time.perf_counter() - start) / 10000
+        print(f"[Kernels] {backend.name}: navigation_step {scalar * 1e6:.2f} us/call, "
+              f"batch {n / batch / 1e6:.1f} M drones/s")
@@ -0,0 +1,232 @@
+import argparse
+import contextlib
+import multiprocessing as mp
+import os
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from scenario import center_lat, center_lon, make_fleet
+
+# Status codes published per drone slot
+STATUS_OK = 0
+STATUS_CORRUPTED = 1
+STATUS_SPOOFED = 2
+STATUS_LOST = 3
+
+
+class SnapshotBuffer:
+    """
+    Latest fleet snapshot in shared memory, guarded by a sequence lock: the writer makes the
+    sequence odd while it writes and even when done, and readers retry if it changed under them.
+    A single writer never waits for readers, so the simulation runs at full speed.
+
+    Layout: seq int64 | count int64 | done int64 | sim_time float64 | positions float64[max_drones, 3]
+            | status int8[max_drones]
+    """
+    HEADER_BYTES = 32
+
+    def __init__(self, max_drones, name=None):
+        """
+        :param max_drones: Capacity in drones.
+        :param name: Attach to an existing buffer by name instead of creating one.
+        """
+        self.max_drones = max_drones
+        size = self.HEADER_BYTES + max_drones * 3 * 8 + max_drones
+        if name is None:
+            self.shm = shared_memory.SharedMemory(create=True, size=size)
+            self.owner = True
+        else:
+            # Child processes share the creator's resource tracker, so attaching does not
+            # schedule a second unlink; only the owner unlinks in close()
+            self.shm = shared_memory.SharedMemory(name=name)
+            self.owner = False
+        buf = self.shm.buf
+        self._ints = np.ndarray((3,), dtype=np.int64, buffer=buf, offset=0)
+        self._sim_time = np.ndarray((1,), dtype=np.float64, buffer=buf, offset=24)
+        self.positions = np.ndarray((max_drones, 3), dtype=np.float64, buffer=buf, offset=self.HEADER_BYTES)
+        self.status = np.ndarray((max_drones,), dtype=np.int8, buffer=buf,
+                                 offset=self.HEADER_BYTES + max_drones * 3 * 8)
+        if self.owner:
+            self._ints[:] = 0
+            self._sim_time[0] = 0.0
+
+    @property
+    def name(self):
+        return self.shm.name
+
+    @property
+    def done(self):
+        return bool(self._ints[2])
+
+    def publish(self, sim_time, positions, status):
+        """Writer side: copy a whole snapshot in one batch."""
+        count = len(positions)
+        self._ints[0] += 1  # Odd: write in progress
+        self.positions[:count] = positions
+        self.status[:count] = status
+        self._ints[1] = count
+        self._sim_time[0] = sim_time
+        self._ints[0] += 1  # Even: snapshot consistent
+
+    def mark_done(self):
+        self._ints[2] = 1
+
+    def read(self, retries=100):
+        """
+        Reader side: consistent copy of the latest snapshot.
+        :return: (sim_time, positions, status), or None if the writer kept the buffer busy.
+        """
+        for _ in range(retries):
+            seq = self._ints[0]
+            if seq % 2:
+                continue
+            count = int(self._ints[1])
+            sim_time = float(self._sim_time[0])
+            positions = self.positions[:count].copy()
+            status = self.status[:count].copy()
+            if self._ints[0] == seq:
+                return sim_time, positions, status
+        return None
+
+    def close(self):
+        # Drop the numpy views first; SharedMemory refuses to close while they export its buffer
+        del self._ints, self._sim_time, self.positions, self.status
+        self.shm.close()
+        if self.owner:
+            self.shm.unlink()
+
+
+def run_producer(buffer_name, num_drones, jammer_type='pulsed', spoofing=True, quiet=True):
+    """
+    Simulation process: advances every drone one second per tick, sends its report through
+    the ADS-B channel and publishes what the GCS received, never waiting on the viewer.
+    """
+    from adsbchannel import ADSBChannel
+    from gcs import GCS
+    from jammer import PulsedNoiseJammer, ContinuousWaveJammer
+    from spoofer import Spoofer
+
+    buffer = SnapshotBuffer(num_drones, name=buffer_name)
+    gcs = GCS(center_lat, center_lon)
+    gcs_pos = (center_lat, center_lon)
+    channel = ADSBChannel(realtime_delay=False)
+    pulsed_jammer = PulsedNoiseJammer(pulse_duration=0.5, pulse_interval=2.0, noise_level=1.0) \
+        if jammer_type == 'pulsed' else None
+    cw_jammer = ContinuousWaveJammer(power_dbm=-55, noise_level=0.1) if jammer_type == 'cw' else None
+    spoofer = Spoofer(spoof_probability=0.5, fake_drone_id="FAKE-DRONE") if spoofing else None
+    drones = make_fleet(num_drones)
+
+    positions = np.full((num_drones, 3), np.nan)
+    status = np.full(num_drones, STATUS_LOST, dtype=np.int8)
+    sim_time = 0
+
+    # The attack models print every event, which would dominate the run time at fleet scale
+    with open(os.devnull, 'w') as devnull, \
+            (contextlib.redirect_stdout(devnull) if quiet else contextlib.nullcontext()):
+        active = True
+        while active:
+            active = False
+            sim_time += 1
+            for index, drone in enumerate(drones):
+                if drone.calculate_navigation(1) in [-1, -2, 0]:
+                    continue
+                active = True
+                message = {
+                    'drone_id': drone.id,
+                    'latitude': drone.current_position[0],
+                    'longitude': drone.current_position[1],
+                    'altitude': drone.current_position[2],
+                    'timestamp': sim_time
+                }
+                received, delay_ns, corrupted, snr_db = channel.transmit(
+                    message, gcs_pos, jammer=pulsed_jammer, spoofer=spoofer)
+                if received is not None and cw_jammer is not None:
+                    received = cw_jammer.jam_signal(received)
+                if received is None:
+                    positions[index] = np.nan
+                    status[index] = STATUS_LOST
+                    continue
+
+                gcs.receive_update(received['drone_id'],
+                                   (received['latitude'], received['longitude'], received['altitude']))
+                positions[index] = (received['latitude'], received['longitude'], received['altitude'])
+                if received['drone_id'] != drone.id:
+                    status[index] = STATUS_SPOOFED
+                elif corrupted:
+                    status[index] = STATUS_CORRUPTED
+                else:
+                    status[index] = STATUS_OK
+            buffer.publish(sim_time, positions, status)
+    buffer.mark_done()
+    buffer.close()
+
+
+class LiveViewer:
+    """
+    Top-down map that samples the snapshot buffer at its own frame rate. All drones share one
+    scatter artist updated in a single batch, and blitting redraws only that artist and the clock
+    (mplot3d axes cannot blit, hence the 2D view).
+    """
+    def __init__(self, buffer, fps=30, max_offset=0.02):
+        import matplotlib.pyplot as plt
+        from matplotlib.colors import ListedColormap
+
+        self.buffer = buffer
+        self.fps = fps
+        self.fig, self.ax = plt.subplots(figsize=(8, 8))
+        self.ax.set_xlim(center_lon - 1.2 * max_offset, center_lon + 1.2 * max_offset)
+        self.ax.set_ylim(center_lat - 1.2 * max_offset, center_lat + 1.2 * max_offset)
+        self.ax.set_xlabel("Longitude")
+        self.ax.set_ylabel("Latitude")
+        self.ax.plot([center_lon], [center_lat], 'ks', markersize=8, label="GCS")
+        self.scatter = self.ax.scatter([], [], c=[], s=12, marker='^', vmin=0, vmax=2,
+                                       cmap=ListedColormap(['tab:blue', 'tab:orange', 'tab:red']))
+        self.clock = self.ax.text(0.02, 0.97, "", transform=self.ax.transAxes, va='top')
+        self.ax.legend(handles=[
+            plt.Line2D([], [], marker='^', linestyle='', color=color, label=label)
+            for color, label in [('tab:blue', 'Received'), ('tab:orange', 'Corrupted'), ('tab:red', 'Spoofed ID')]
+        ] + [plt.Line2D([], [], marker='s', linestyle='', color='k', label='GCS')], loc='lower right')
+        self.frames = 0
+        self.last_sim_time = None
+
+    def update(self, frame):
+        snapshot = self.buffer.read()
+        if snapshot is not None:
+            sim_time, positions, status = snapshot
+            visible = status != STATUS_LOST
+            self.scatter.set_offsets(positions[visible][:, [1, 0]])  # (lon, lat) for x/y
+            self.scatter.set_array(status[visible].astype(float))
+            self.clock.set_text(f"t = {sim_time:.0f} s   received {visible.sum()}/{len(status)}"
+                                + ("   (finished)" if self.buffer.done else ""))
+            self.last_sim_time = sim_time
+        self.frames += 1
+        return self.scatter, self.clock
+
+    def show(self):
+        import matplotlib.pyplot as plt
+        from matplotlib.animation import FuncAnimation
+
+        self.animation = FuncAnimation(self.fig, self.update, interval=1000 / self.fps, blit=True,
+                                       cache_frame_data=False)
+        plt.show()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Watch a scenario live while it runs at full speed.")
+    parser.add_argument('--drones', type=int, default=1000)
+    parser.add_argument('--jammer', choices=['none', 'pulsed', 'cw'], default='pulsed')
+    parser.add_argument('--no-spoofing', action='store_true')
+    parser.add_argument('--fps', type=int, default=30)
+    args = parser.parse_args()
+
+    buffer = SnapshotBuffer(args.drones)
+    producer = mp.Process(target=run_producer,
+                          args=(buffer.name, args.drones, args.jammer, not args.no_spoofing), daemon=True)
+    producer.start()
+    try:
+        LiveViewer(buffer, fps=args.fps).show()
+    finally:
+        producer.terminate()
+        producer.join()
+        buffer.close()
@@ -0,0 +1,210 @@
+import json
+import os
+
+import numpy as np
+
+LOG_MAGIC = b'DSIMLOG1'
+HEADER_BYTES = 16  # Magic + record size (uint32) + reserved
+
+# One fixed-size record per transmission: what the drone sent and what the GCS would receive
+RECORD_DTYPE = np.dtype([
+    ('timestamp', '<f8'),
+    ('tx_id', '<u4'),
+    ('rx_id', '<u4'),
+    ('tx_lat', '<f8'),
+    ('tx_lon', '<f8'),
+    ('rx_lat', '<f8'),
+    ('rx_lon', '<f8'),
+    ('tx_alt', '<f4'),
+    ('rx_alt', '<f4'),
+    ('snr_db', '<f4'),
+    ('delay_ns', '<f4'),
+    ('flags', 'u1'),
+    ('_pad', 'u1', (7,)),
+])
+
+FLAG_CORRUPTED = 1
+FLAG_LOST = 2
+FLAG_SPOOFED = 4
+FLAG_JAMMED = 8
+FLAG_GARBLED = 16
+
+
+class MessageLogWriter:
+    """
+    Append-only binary log of channel transmissions. Records are buffered and written in blocks;
+    drone ids are interned to integers and appended to a '<path>.ids' sidecar as they first appear.
+    """
+    def __init__(self, path, buffer_records=4096):
+        """
+        :param path: Log file; an existing log is appended to.
+        :param buffer_records: Records held in memory between writes.
+        """
+        self.path = path
+        self.ids = {}
+        if os.path.exists(path + '.ids'):
+            with open(path + '.ids') as f:
+                for line in f:
+                    self.ids[json.loads(line)] = len(self.ids)
+        new_file = not os.path.exists(path) or os.path.getsize(path) == 0
+        self._file = open(path, 'ab')
+        self._ids_file = open(path + '.ids', 'a')
+        if new_file:
+            self._file.write(LOG_MAGIC + np.uint32(RECORD_DTYPE.itemsize).tobytes() + bytes(4))
+        self._buffer = np.zeros(buffer_records, dtype=RECORD_DTYPE)
+        self._pending = 0
+
+    def intern(self, drone_id):
+        index = self.ids.get(drone_id)
+        if index is None:
+            index = self.ids[drone_id] = len(self.ids)
+            self._ids_file.write(json.dumps(drone_id) + '\n')
+        return index
+
+    def record(self, timestamp, tx_id, tx_position, rx_message, snr_db, delay_ns, flags):
+        """
+        Append one transmission.
+        :param tx_position: (lat, lon, alt) as sent by the drone.
+        :param rx_message: Message dict as received, or None if it was lost.
+        """
+        row = self._buffer[self._pending]
+        row['timestamp'] = timestamp
+        row['tx_id'] = self.intern(tx_id)
+        row['tx_lat'], row['tx_lon'], row['tx_alt'] = tx_position
+        if rx_message is None:
+            row['rx_id'] = row['tx_id']
+            row['rx_lat'] = row['rx_lon'] = row['rx_alt'] = np.nan
+            flags |= FLAG_LOST
+        else:
+            row['rx_id'] = self.intern(rx_message['drone_id'])
+            row['rx_lat'] = rx_message['latitude']
+            row['rx_lon'] = rx_message['longitude']
+            row['rx_alt'] = rx_message['altitude']
+        row['snr_db'] = snr_db
+        row['delay_ns'] = delay_ns
+        row['flags'] = flags
+        self._pending += 1
+        if self._pending == len(self._buffer):
+            self.flush()
+
+    def flush(self):
+        if self._pending:
+            self._file.write(self._buffer[:self._pending].tobytes())
+            self._pending = 0
+        self._file.flush()
+        self._ids_file.flush()
+
+    def close(self):
+        self.flush()
+        self._file.close()
+        self._ids_file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+class MessageLog:
+    """
+    Read-only, memory-mapped view of a message log with a time index and a per-drone index.
+    The indexes are built on first use and cached in '<path>.idx.npz'.
+    """
+    def __init__(self, path):
+        self.path = path
+        with open(path, 'rb') as f:
+            header = f.read(HEADER_BYTES)
+        if header[:8] != LOG_MAGIC:
+            raise ValueError(f"{path} is not a simulator message log")
+        if int(np.frombuffer(header[8:12], dtype=np.uint32)[0]) != RECORD_DTYPE.itemsize:
+            raise ValueError(f"{path} uses an incompatible record layout")
+        count = (os.path.getsize(path) - HEADER_BYTES) // RECORD_DTYPE.itemsize
+        self.records = np.memmap(path, dtype=RECORD_DTYPE, mode='r', offset=HEADER_BYTES, shape=(count,)) \
+            if count else np.zeros(0, dtype=RECORD_DTYPE)
+        self.ids = []
+        if os.path.exists(path + '.ids'):
+            with open(path + '.ids') as f:
+                self.ids = [json.loads(line) for line in f]
+        self._id_index = {drone_id: i for i, drone_id in enumerate(self.ids)}
+        self._index = None
+
+    def __len__(self):
+        return len(self.records)
+
+    def _load_index(self):
+        if self._index is not None:
+            return self._index
+        index_path = self.path + '.idx.npz'
+        if os.path.exists(index_path):
+            cached = np.load(index_path)
+            if int(cached['count']) == len(self.records):
+                self._index = {name: cached[name] for name in cached.files}
+                return self._index
+        timestamps = self.records['timestamp']
+        # Logs written by one run are already in time order; only sort when they are not
+        time_order = np.argsort(timestamps, kind='stable') if np.any(np.diff(timestamps) < 0) \
+            else np.arange(len(timestamps))
+        tx_id = self.records['tx_id']
+        drone_order = np.argsort(tx_id, kind='stable')
+        drone_offsets = np.searchsorted(tx_id[drone_order], np.arange(len(self.ids) + 1))
+        self._index = {
+            'count': np.int64(len(self.records)),
+            'time_order': time_order,
+            'sorted_times': timestamps[time_order],
+            'drone_order': drone_order,
+            'drone_offsets': drone_offsets,
+        }
+        np.savez(index_path, **self._index)
+        return self._index
+
+    def time_range(self, start, end):
+        """Records with start <= timestamp < end, in time order."""
+        index = self._load_index()
+        lo, hi = np.searchsorted(index['sorted_times'], [start, end], side='left')
+        return self.records[index['time_order'][lo:hi]]
+
+    def for_drone(self, drone_id):
+        """Records transmitted by one drone, in log order."""
+        index = self._load_index()
+        slot = self._id_index.get(drone_id)
+        if slot is None or slot + 1 >= len(index['drone_offsets']):
+            return self.records[:0]
+        lo, hi = index['drone_offsets'][slot], index['drone_offsets'][slot + 1]
+        return self.records[np.sort(index['drone_order'][lo:hi])]
+
+    def batches(self, batch_size=65536):
+        """Records in time order, as structured arrays of up to batch_size rows."""
+        time_order = self._load_index()['time_order']
+        for start in range(0, len(time_order), batch_size):
+            rows = time_order[start:start + batch_size]
+            if len(rows) and np.all(np.diff(rows) == 1):
+                yield self.records[rows[0]:rows[-1] + 1]  # Contiguous: a zero-copy slice of the map
+            else:
+                yield self.records[rows]
+
+
+def replay_log(log, gcs=None, detector=None, batch_size=65536):
+    """
+    Feed a recorded run into a GCS and/or a detector without re-running navigation or the channel.
+    Logs written by n_scen_stat runs hold what their GCS received; logs recorded straight from
+    ADSBChannel.transmit hold the channel output only.
+    :param log: MessageLog (or path to one).
+    :param gcs: Object with receive_update(drone_id, position); gets every delivered report.
+    :param detector: Callable taking (batch, ids) where batch is a structured record array.
+    :return: Number of records replayed.
+    """
+    if not isinstance(log, MessageLog):
+        log = MessageLog(log)
+    count = 0
+    for batch in log.batches(batch_size):
+        if detector is not None:
+            detector(batch, log.ids)
+        if gcs is not None:
+            delivered = batch[(batch['flags'] & FLAG_LOST) == 0]
+            ids = log.ids
+            for rx_id, lat, lon, alt in zip(delivered['rx_id'].tolist(), delivered['rx_lat'].tolist(),
+                                            delivered['rx_lon'].tolist(), delivered['rx_alt'].tolist()):
+                gcs.receive_update(ids[rx_id], (lat, lon, alt))
+        count += len(batch)
+    return count
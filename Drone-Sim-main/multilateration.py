@@ -0,0 +1,213 @@
+import time
+
+import numpy as np
+
+from adsbchannel import ADSBChannel
+from gcs import GCS
+from scenario import center_lat, center_lon
+
+EARTH_RADIUS = 6371000.0  # Meters, same sphere as the channel's haversine distance
+
+
+def to_local(lat, lon, ref_lat, ref_lon):
+    """Equirectangular projection to east/north meters around a reference point (fine over tens of km)."""
+    east = np.radians(np.asarray(lon) - ref_lon) * EARTH_RADIUS * np.cos(np.radians(ref_lat))
+    north = np.radians(np.asarray(lat) - ref_lat) * EARTH_RADIUS
+    return east, north
+
+
+def from_local(east, north, ref_lat, ref_lon):
+    """Inverse of to_local."""
+    lat = ref_lat + np.degrees(np.asarray(north) / EARTH_RADIUS)
+    lon = ref_lon + np.degrees(np.asarray(east) / (EARTH_RADIUS * np.cos(np.radians(ref_lat))))
+    return lat, lon
+
+
+def solve_tdoa(pseudoranges, receivers, altitude, initial=None, iterations=8):
+    """
+    Batched Gauss-Newton multilateration. Each message has one time of arrival per receiver,
+    expressed as a pseudorange c * toa; the unknowns per message are the emitter's east/north
+    position and the common offset b (c times the unknown transmit time), so only arrival time
+    differences matter. Altitude is taken from the report, as in altitude-aided MLAT: ground
+    receivers at nearly the same height cannot resolve it.
+    :param pseudoranges: (n, m) array, m >= 3 receivers.
+    :param receivers: (m, 3) receiver east, north, up in meters.
+    :param altitude: (n,) emitter altitude in meters, same datum as the receivers' up coordinate.
+    :param initial: Optional (n, 2) starting east/north; defaults to the receiver centroid.
+    :return: (east/north estimates (n, 2), RMS range residual in meters (n,)).
+    """
+    pseudoranges = np.asarray(pseudoranges, dtype=np.float64)
+    receivers = np.asarray(receivers, dtype=np.float64)
+    n, m = pseudoranges.shape
+    if m < 3:
+        raise ValueError("TDOA needs at least three receivers")
+    position = np.empty((n, 2))
+    position[:] = receivers[:, :2].mean(axis=0) if initial is None else initial
+    dz = np.asarray(altitude, dtype=np.float64)[:, None] - receivers[None, :, 2]
+
+    for _ in range(iterations):
+        dx = position[:, None, 0] - receivers[None, :, 0]
+        dy = position[:, None, 1] - receivers[None, :, 1]
+        ranges = np.sqrt(dx * dx + dy * dy + dz * dz)
+        # The offset has a closed-form least-squares value for the current position
+        offset = (pseudoranges - ranges).mean(axis=1, keepdims=True)
+        residual = pseudoranges - ranges - offset
+        # Jacobian of the ranges with the offset projected out (columns centred per message)
+        ux = dx / ranges
+        uy = dy / ranges
+        ux -= ux.mean(axis=1, keepdims=True)
+        uy -= uy.mean(axis=1, keepdims=True)
+        # 2x2 normal equations, solved in closed form for every message at once
+        a = (ux * ux).sum(axis=1)
+        b = (ux * uy).sum(axis=1)
+        d = (uy * uy).sum(axis=1)
+        gx = (ux * residual).sum(axis=1)
+        gy = (uy * residual).sum(axis=1)
+        det = a * d - b * b
+        det = np.where(np.abs(det) > 1e-12, det, np.inf)  # Degenerate geometry: leave the estimate alone
+        position[:, 0] += (d * gx - b * gy) / det
+        position[:, 1] += (a * gy - b * gx) / det
+
+    dx = position[:, None, 0] - receivers[None, :, 0]
+    dy = position[:, None, 1] - receivers[None, :, 1]
+    ranges = np.sqrt(dx * dx + dy * dy + dz * dz)
+    residual = pseudoranges - ranges
+    residual -= residual.mean(axis=1, keepdims=True)
+    return position, np.sqrt((residual ** 2).mean(axis=1))
+
+
+class ReceiverNetwork:
+    """
+    Several ground receivers at known positions, each a GCS with its own track table. Every
+    transmission is timestamped at each receiver from the channel's propagation delay; the
+    arrival times are multilaterated to estimate where the signal really came from, and reports
+    whose claimed position disagrees with that estimate are flagged instead of being tracked.
+    """
+    def __init__(self, positions, channel=None, timing_noise_ns=50.0, tolerance_m=300.0, rng=None):
+        """
+        :param positions: Receiver (lat, lon, alt) tuples; at least three, four to eight is typical.
+        :param channel: ADSBChannel providing the propagation model (a default one when None).
+        :param timing_noise_ns: Standard deviation of each receiver's timestamp error.
+        :param tolerance_m: Largest accepted distance between claimed and multilaterated position.
+        """
+        if len(positions) < 3:
+            raise ValueError("A receiver network needs at least three receivers")
+        self.positions = np.asarray(positions, dtype=np.float64)
+        self.stations = [GCS(lat, lon, alt) for lat, lon, alt in positions]
+        self.channel = channel if channel is not None else ADSBChannel()
+        self.timing_noise_ns = timing_noise_ns
+        self.tolerance_m = tolerance_m
+        self.rng = np.random.default_rng() if rng is None else rng
+        self.ref_lat, self.ref_lon = self.positions[:, 0].mean(), self.positions[:, 1].mean()
+        east, north = to_local(self.positions[:, 0], self.positions[:, 1], self.ref_lat, self.ref_lon)
+        self.local = np.column_stack([east, north, self.positions[:, 2]])
+        self.flagged = 0
+
+    def arrival_times(self, emitter_lat, emitter_lon, emitter_alt):
+        """
+        Arrival time (s) of each transmission at each receiver relative to its transmit time,
+        shape (n, receivers): slant range / c + receiver timing noise. The slant range combines
+        the channel's great-circle distance with the height difference. Times are kept relative
+        because epoch seconds in float64 cannot resolve nanoseconds; the solver only uses differences.
+        """
+        emitter_lat = np.atleast_1d(np.asarray(emitter_lat, dtype=np.float64))
+        emitter_lon = np.atleast_1d(np.asarray(emitter_lon, dtype=np.float64))
+        emitter_alt = np.atleast_1d(np.asarray(emitter_alt, dtype=np.float64))
+        ground = self.channel.haversine_distance(emitter_lat[:, None], emitter_lon[:, None],
+                                                 self.positions[None, :, 0], self.positions[None, :, 1])
+        slant = np.sqrt(ground ** 2 + (emitter_alt[:, None] - self.positions[None, :, 2]) ** 2)
+        noise = self.rng.normal(0.0, self.timing_noise_ns * 1e-9, slant.shape)
+        return slant / self.channel.light_speed + noise
+
+    def locate(self, toa_offsets, altitude):
+        """
+        Multilaterate a batch of arrivals.
+        :param toa_offsets: (n, receivers) arrival times in seconds relative to any per-message epoch.
+        :param altitude: (n,) reported emitter altitude in meters.
+        :return: (latitude, longitude, rms residual in meters) arrays.
+        """
+        pseudoranges = np.asarray(toa_offsets, dtype=np.float64) * self.channel.light_speed
+        estimate, rms = solve_tdoa(pseudoranges, self.local, altitude)
+        lat, lon = from_local(estimate[:, 0], estimate[:, 1], self.ref_lat, self.ref_lon)
+        return lat, lon, rms
+
+    def verify(self, claimed_lat, claimed_lon, claimed_alt, toa_offsets):
+        """
+        Compare claimed positions with their multilaterated emitter positions.
+        :return: Dictionary of arrays: latitude, longitude (estimates), error_m (claimed vs estimate),
+            residual_m and flagged.
+        """
+        claimed_alt = np.asarray(claimed_alt, dtype=np.float64)
+        lat, lon, rms = self.locate(toa_offsets, claimed_alt)
+        error = self.channel.haversine_distance(np.asarray(claimed_lat, dtype=np.float64),
+                                                np.asarray(claimed_lon, dtype=np.float64), lat, lon)
+        return {'latitude': lat, 'longitude': lon, 'error_m': error, 'residual_m': rms,
+                'flagged': error > self.tolerance_m}
+
+    def receive_batch(self, messages, emitter_positions):
+        """
+        Deliver a batch of reports to every receiver, keeping only those whose claimed position
+        matches where the signal came from.
+        :param messages: Message dicts as received (possibly spoofed).
+        :param emitter_positions: (lat, lon, alt) of the physical transmitter of each message.
+        :return: Boolean array, True for reports flagged as inconsistent.
+        """
+        if not messages:
+            return np.zeros(0, dtype=bool)
+        emitters = np.asarray(emitter_positions, dtype=np.float64)
+        offsets = self.arrival_times(emitters[:, 0], emitters[:, 1], emitters[:, 2])
+        result = self.verify([m['latitude'] for m in messages], [m['longitude'] for m in messages],
+                             [m['altitude'] for m in messages], offsets)
+        flagged = result['flagged']
+        for message, bad in zip(messages, flagged.tolist()):
+            if bad:
+                continue
+            position = (message['latitude'], message['longitude'], message['altitude'])
+            for station in self.stations:
+                station.receive_update(message['drone_id'], position)
+        self.flagged += int(flagged.sum())
+        return flagged
+
+
+def ring_receivers(num_receivers, radius_m=5000.0, lat=center_lat, lon=center_lon, alt=0.0):
+    """Receivers evenly spaced on a circle around a center point."""
+    angles = 2 * np.pi * np.arange(num_receivers) / num_receivers
+    rlat, rlon = from_local(radius_m * np.cos(angles), radius_m * np.sin(angles), lat, lon)
+    return [(a, b, alt) for a, b in zip(rlat.tolist(), rlon.tolist())]
+
+
+if __name__ == "__main__":
+    import contextlib
+    import io
+    import random
+    from spoofer import Spoofer
+
+    rng = np.random.default_rng(1)
+    n = 20000
+    true_lat = center_lat + rng.uniform(-0.02, 0.02, n)
+    true_lon = center_lon + rng.uniform(-0.02, 0.02, n)
+    true_alt = rng.uniform(80, 200, n)
+    spoofer = Spoofer(spoof_probability=0.3, fake_drone_id="FAKE-DRONE")
+    random.seed(1)
+    messages, spoofed = [], []
+    with contextlib.redirect_stdout(io.StringIO()):  # The spoofer logs every message it alters
+        for i in range(n):
+            message, was_spoofed = spoofer.spoof_message({'drone_id': f"{i % 500 + 1}", 'latitude': true_lat[i],
+                                                          'longitude': true_lon[i], 'altitude': true_alt[i],
+                                                          'timestamp': 0.0})
+            messages.append(message)
+            spoofed.append(was_spoofed)
+    spoofed = np.array(spoofed)
+
+    for num_receivers in (4, 6, 8):
+        network = ReceiverNetwork(ring_receivers(num_receivers), rng=rng)
+        offsets = network.arrival_times(true_lat, true_lon, true_alt)
+        t0 = time.perf_counter()
+        result = network.verify([m['latitude'] for m in messages], [m['longitude'] for m in messages],
+                                [m['altitude'] for m in messages], offsets)
+        elapsed = time.perf_counter() - t0
+        honest_error = result['error_m'][~spoofed]
+        print(f"[TDOA] {num_receivers} receivers: {n / elapsed:,.0f} solves/s, "
+              f"median error {np.median(honest_error):.1f} m (p99 {np.percentile(honest_error, 99):.1f} m), "
+              f"spoofed flagged {result['flagged'][spoofed].mean():.1%}, "
+              f"false alarms {result['flagged'][~spoofed].mean():.2%}")
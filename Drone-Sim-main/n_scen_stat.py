@@ -1,3 +1,4 @@
+import random
 import time
 import numpy as np
 import matplotlib.pyplot as plt
@@ -8,11 +9,20 @@ from gcs import GCS
 from adsbchannel import ADSBChannel
 from jammer import PulsedNoiseJammer
 from spoofer import Spoofer
+from profiling import StageMetrics, NULL_METRICS, profile_scenario
+from streaming_metrics import ScenarioMetrics
+from adsb_codec import FRAME_REJECTED, correct_single_bit_errors
+from message_log import FLAG_CORRUPTED, FLAG_JAMMED, FLAG_SPOOFED
+from checkpoint import SimClock
+from garbling import GarblingModel
 import seaborn as sns
 
 # Define central location (e.g., Washington, D.C.)
 center_lat, center_lon = 38.8977, -77.0365  # White House location
 
+# Set to True to write a cProfile file per scenario into results/
+PROFILE_SCENARIOS = False
+
 # Initialize GCS
 gcs = GCS(center_lat, center_lon)
 gcs_pos = (center_lat, center_lon)
@@ -22,7 +32,13 @@ route_gen = RouteGenerator(center_lat, center_lon, num_routes=2, waypoints_per_r
 routes = route_gen.generate_routes()
 
 # Function to initialize drones
-def initialize_drones():
+def initialize_drones(drone_routes=None):
+    """
+    Build one drone per route.
+    :param drone_routes: Routes to fly; defaults to the module-level routes.
+    """
+    if drone_routes is None:
+        drone_routes = routes
     return [
         Drone(
             id=f"{i+1}",
@@ -34,9 +50,9 @@ def initialize_drones():
             altitude_error=1.0,
             battery_consume_rate=0.05,
             battery_capacity=10.0 + i*5,
-            route=routes[i]
+            route=drone_routes[i]
         )
-        for i in range(len(routes))
+        for i in range(len(drone_routes))
     ]
 
 # Simulation scenarios
@@ -132,31 +148,143 @@ def plot_packet_loss_data(results, colors=None, output_path='results/packet_loss
 
 
 
-# Function to run a simulation scenario
-def run_simulation(jamming=False, spoofing=False, spoof_probability=0.5):
-    """ Runs a simulation scenario with or without jamming/spoofing. """
-    channel = ADSBChannel()
-    jammer = PulsedNoiseJammer(pulse_duration=0.5, pulse_interval=2.0, noise_level=1.0) if jamming else None
-    spoofer = Spoofer(spoof_probability=spoof_probability, fake_drone_id="FAKE-DRONE") if spoofing else None
+# Components drawing from their own random stream in common-random-numbers mode
+RANDOM_STREAMS = ('channel', 'jammer', 'spoofer')
+
+
+def make_attackers(clock=time.time, jamming=False, spoofing=False, spoof_probability=0.5, noise_level=1.0,
+                   pulse_duration=0.5, pulse_interval=2.0, streams=None):
+    """
+    Build a scenario's jammer and spoofer.
+    :param clock: Time source for the pulsed jammer.
+    :param streams: Optional dictionary of per-component random.Random streams (common random numbers).
+    :return: (jammer, spoofer), each None when that attack is off.
+    """
+    streams = streams or {}
+    jammer = PulsedNoiseJammer(pulse_duration=pulse_duration, pulse_interval=pulse_interval,
+                               noise_level=noise_level, clock=clock, rng=streams.get('jammer')) if jamming else None
+    spoofer = Spoofer(spoof_probability=spoof_probability, fake_drone_id="FAKE-DRONE",
+                      rng=streams.get('spoofer')) if spoofing else None
+    return jammer, spoofer
+
+
+def synchronize_streams(state):
+    """
+    Re-seed every component stream from (seed, component, message number) before a message is sent.
+    Each message then sees the same channel draws in every scenario of a comparison, however many
+    numbers an attack consumed earlier, so scenario differences are attack effects rather than noise.
+    """
+    number = state['messages']
+    for index, name in enumerate(RANDOM_STREAMS):
+        state['streams'][name].seed((state['seed'] * len(RANDOM_STREAMS) + index) << 32 | number)
+    if state['channel'].corruption_model == 'ber' or state['channel'].garbling is not None:
+        state['channel'].bit_rng = np.random.default_rng((state['seed'], number))
+
+
+def initial_state(jamming=False, spoofing=False, spoof_probability=0.5, error_rate=0.01, noise_level=1.0,
+                  pulse_duration=0.5, pulse_interval=2.0, num_drones=None, stats=None, corruption_model='uniform',
+                  seed=None, common_random=False, garbling_emitters=0):
+    """
+    Everything a run needs, in one dictionary that can be checkpointed, resumed or forked.
+    Parameters are those of run_simulation.
+    """
+    if common_random and seed is None:
+        raise ValueError("common_random needs a seed")
+    if seed is not None:
+        random.seed(seed)
+        np.random.seed(seed)
+    if num_drones is None and seed is None:
+        drone_routes = routes
+    else:
+        # Drawn straight after seeding, so a seeded run flies the same mission in every process
+        count = len(routes) if num_drones is None else num_drones
+        drone_routes = RouteGenerator(center_lat, center_lon, num_routes=count, waypoints_per_route=5,
+                                      max_offset=0.02).generate_routes()
+    clock = SimClock() if seed is not None else time.time
+    streams = {name: random.Random() for name in RANDOM_STREAMS} if common_random else None
+    channel = ADSBChannel(error_rate=error_rate, corruption_model=corruption_model, seed=seed,
+                          rng=streams['channel'] if streams else None)
+    jammer, spoofer = make_attackers(clock, jamming, spoofing, spoof_probability, noise_level,
+                                     pulse_duration, pulse_interval, streams)
+    if garbling_emitters:
+        # Other traffic sharing 1090 MHz, spread over the area the routes cover
+        lat = center_lat + np.random.uniform(-0.02, 0.02, garbling_emitters)
+        lon = center_lon + np.random.uniform(-0.02, 0.02, garbling_emitters)
+        channel.garbling = GarblingModel()
+        channel.interferer_power_dbm = channel.link_budget_batch(lat, lon, gcs_pos)[1]
+
+    drones = initialize_drones(drone_routes)
+    return {'drones': drones, 'drone_index': 0, 'messages': 0, 'channel': channel, 'jammer': jammer,
+            'spoofer': spoofer, 'clock': clock, 'stats': stats if stats is not None else ScenarioMetrics(),
+            'gcs': gcs, 'seed': seed, 'streams': streams}
+
+
+class PendingRecord:
+    """
+    Stand-in channel recorder: holds the record transmit makes so that advance_simulation can complete
+    it with the post-channel attacks and the GCS's CRC verdict before passing it to the real recorder.
+    """
+    def __init__(self, recorder):
+        self.recorder = recorder
+        self.fields = None
 
-    drones = initialize_drones()
+    def record(self, *fields):
+        self.fields = list(fields)
 
-    total_messages = 0
-    lost_messages = 0
-    packet_loss_over_time = []
-    snr_values = []
-    latency_values = []
-    throughput_values = []
+    def commit(self, message, add_flags=0, clear_flags=0):
+        """Write the held record with the message the GCS finally acted on (None if it was lost)."""
+        if self.fields is None:
+            return
+        fields, self.fields = self.fields, None
+        fields[3] = message
+        fields[6] = (fields[6] | add_flags) & ~clear_flags
+        self.recorder.record(*fields)
 
-    start_time = time.time()
 
-    for drone in drones:
+def advance_simulation(state, metrics=NULL_METRICS, checkpoint=None, config=None, max_messages=None):
+    """
+    Fly the fleet onward from wherever state left off.
+    :param checkpoint: Optional checkpoint.Checkpointer saving state (tagged with config) as it goes.
+    :param max_messages: Stop, resumably, once this many messages have been sent in total.
+    :return: True when every drone has finished its route.
+    """
+    channel = state['channel']
+    recorder = channel.recorder
+    # Log what the GCS ends up with rather than the channel output alone, so replays see the same stream
+    channel.recorder = PendingRecord(recorder) if recorder is not None else None
+    try:
+        return _advance_fleet(state, metrics, checkpoint, config, max_messages)
+    finally:
+        channel.recorder = recorder
+
+
+def _advance_fleet(state, metrics, checkpoint, config, max_messages):
+    drones, channel, jammer, spoofer = state['drones'], state['channel'], state['jammer'], state['spoofer']
+    clock, stats, gcs = state['clock'], state['stats'], state['gcs']
+    pending = channel.recorder
+
+    for drone_index in range(state['drone_index'], len(drones)):
+        state['drone_index'] = drone_index
+        drone = drones[drone_index]
         while True:
-            status = drone.calculate_navigation(1)
+            if max_messages is not None and state['messages'] >= max_messages:
+                return False
+            if checkpoint is not None and checkpoint.due(state['messages']):
+                with metrics.stage('checkpoint'):
+                    checkpoint.save(config, state, state['messages'])
+            if isinstance(clock, SimClock):
+                clock.advance(1)
+
+            with metrics.stage('navigation'):
+                status = drone.calculate_navigation(1)
             if status in [-1, -2, 0]:
                 break
+            if state['streams'] is not None:
+                synchronize_streams(state)
+            state['messages'] += 1
 
-            send_time = time.time()
+            metrics.count('messages')
+            send_time = clock()
             original_message = {
                 'drone_id': drone.id,
                 'latitude': drone.current_position[0],
@@ -164,96 +292,169 @@ def run_simulation(jamming=False, spoofing=False, spoof_probability=0.5):
                 'altitude': drone.current_position[2],
                 'timestamp': send_time
             }
+            stats.record_sent(send_time)
 
             received_message, delay_ns, corrupted, snr_db = channel.transmit(
                 original_message, gcs_pos, jammer=jammer, spoofer=spoofer
             )
-
-            if jamming and received_message is not None:
-                received_message, jammed = jammer.jam_signal(received_message)
+            if received_message is None:  # Blocked by the jammer inside the channel
+                metrics.count('dropped')
+                stats.record_drop()
+                if pending is not None:
+                    pending.commit(None)
+                continue
+
+            jammed = spoofed = False
+            if jammer is not None:
+                with metrics.stage('jamming'):
+                    received_message, jammed = jammer.jam_signal(received_message)
                 if jammed and received_message is None:
-                    lost_messages += 1
-                    if total_messages > 0:
-                        packet_loss_over_time.append((total_messages, (lost_messages / total_messages) * 100))
-                    else:
-                        packet_loss_over_time.append((total_messages, 0))  # Avoid division by zero
+                    metrics.count('dropped')
+                    stats.record_drop()
+                    if pending is not None:
+                        pending.commit(None, FLAG_JAMMED)
                     continue
 
-            if spoofing and spoofer:
-                received_message, spoofed = spoofer.spoof_message(received_message)
-
-            gcs.receive_update(
-                received_message['drone_id'],
-                (
-                    received_message['latitude'],
-                    received_message['longitude'],
-                    received_message['altitude']
-                )
-            )
-
-            if corrupted and not (jamming and jammed):
-                lost_messages += 1
-
-            if total_messages > 0:
-                packet_loss_over_time.append((total_messages, (lost_messages / total_messages) * 100))
-            else:
-                packet_loss_over_time.append((total_messages, 0))  # Avoid division by zero
-
-            snr_values.append((total_messages, snr_db))
-
-            latency = (time.time() - send_time) * 1000
-            latency_values.append((total_messages, latency))
-
-            elapsed_time = time.time() - start_time
-            throughput = total_messages / elapsed_time if elapsed_time > 0 else 0
-            throughput_values.append((elapsed_time, throughput))
+            if spoofer is not None:
+                with metrics.stage('spoofing'):
+                    received_message, spoofed = spoofer.spoof_message(received_message)
+
+            if (jammed or spoofed) and 'frame' in received_message:
+                # The attacks above edit the message fields only; put the edits into the bits the GCS decodes
+                channel.reencode_frame(received_message)
+
+            with metrics.stage('gcs_update'):
+                if 'frame' in received_message:
+                    # Bit-error model: the GCS sees the raw frame and applies CRC checking itself
+                    frame_status = gcs.receive_frames(received_message['frame'][None, :], channel.codec)[0]
+                else:
+                    frame_status = None
+                    gcs.receive_update(
+                        received_message['drone_id'],
+                        (
+                            received_message['latitude'],
+                            received_message['longitude'],
+                            received_message['altitude']
+                        )
+                    )
+            attack_flags = (FLAG_JAMMED if jammed else 0) | (FLAG_SPOOFED if spoofed else 0)
+            if frame_status == FRAME_REJECTED:
+                metrics.count('crc_rejected')
+                stats.record_drop()
+                if pending is not None:
+                    pending.commit(None, attack_flags | FLAG_CORRUPTED)
+                continue
+            if frame_status is not None:
+                corrupted = False  # Clean or repaired by single-bit correction
+                if pending is not None:
+                    # Log the report the GCS decoded from the (repaired) frame, not the fields it was encoded from
+                    repaired, _ = correct_single_bit_errors(received_message['frame'][None, :])
+                    received_message = channel.codec.decode_messages(repaired, [received_message['timestamp']])[0]
+            if pending is not None:
+                pending.commit(received_message, attack_flags, 0 if corrupted else FLAG_CORRUPTED)
+
+            # Latency is the modeled over-the-air delay; sleep and compute time live in the stage timers
+            stats.record_delivery(clock(), snr_db, delay_ns / 1e6, corrupted)
+    state['drone_index'] = len(drones)
+    return True
 
-    return packet_loss_over_time, snr_values, latency_values, throughput_values
 
-# Run simulations for each scenario and collect results
-results = {}
-for scenario, params in scenarios.items():
-    print(f"Running scenario: {scenario}")
-    packet_loss_data, snr_data, latency_data, throughput_data = run_simulation(**params)
-    results[scenario] = {
-        'packet_loss': packet_loss_data,
-        'snr': snr_data,
-        'latency': latency_data,
-        'throughput': throughput_data
-    }
-
-# Ensure the 'results' directory exists
-if not os.path.exists('results'):
-    os.makedirs('results')
-
-def plot_packet_loss_data(results, colors=None, output_path='results/packet_loss.png'):
-    """ Plots packet loss over time for each scenario. """
-    if colors is None:
-        colors = ['blue', 'green', 'orange', 'red', 'purple']
-
-    plt.figure(figsize=(12, 8))
-
-    for (scenario, data), color in zip(results.items(), colors):
-        if 'packet_loss' in data and data['packet_loss']:
-            times, packet_loss = zip(*data['packet_loss'])
-            plt.plot(times, packet_loss, label=scenario, color=color)
-
-    plt.xlabel('Total Messages Sent')
-    plt.ylabel('Packet Loss (%)')
-    plt.title('Packet Loss over Simulation Time for Different Scenarios')
-    plt.legend()
-    plt.grid(True)
-    plt.savefig(output_path)
-    plt.show()
-
-plot_packet_loss_data(results)
-
-
-# Plotting SNR over time for each scenario
-plot_snr_data(results)
-
-# Plotting Latency over time for each scenario
-plot_latency_data(results)
-
-# Plotting Throughput over time for each scenario
-plot_throughput_data(results)
\ No newline at end of file
+# Function to run a simulation scenario
+def run_simulation(jamming=False, spoofing=False, spoof_probability=0.5, error_rate=0.01,
+                   noise_level=1.0, pulse_duration=0.5, pulse_interval=2.0, num_drones=None,
+                   metrics=None, stats=None, corruption_model='uniform', recorder=None, seed=None,
+                   checkpoint=None, common_random=False, garbling_emitters=0):
+    """
+    Runs a simulation scenario with or without jamming/spoofing.
+    :param error_rate: Flat message corruption probability of the ADS-B channel.
+    :param noise_level: Pulsed jammer noise level.
+    :param pulse_duration: Pulsed jammer pulse length in seconds.
+    :param pulse_interval: Pulsed jammer gap between pulses in seconds.
+    :param num_drones: Fleet size; None flies as many drones as the module-level routes (those very routes
+        when unseeded, routes drawn from the seed otherwise).
+    :param metrics: Optional profiling.StageMetrics collecting per-stage timings and counters.
+    :param stats: Optional streaming_metrics.ScenarioMetrics to fill; read summary() after the run.
+    :param corruption_model: 'uniform' or 'ber' (bit errors on DF17 frames, CRC-checked by the GCS).
+    :param recorder: Optional message_log.MessageLogWriter capturing every transmission as the GCS finally
+        received it, after the post-channel attacks and CRC checks (rejected frames are logged as lost).
+    :param seed: Seed the random generators and run on a simulated clock (one second per navigation
+        step) instead of wall time, which makes the run, routes included, reproducible across processes.
+    :param checkpoint: Optional checkpoint.Checkpointer. The run resumes from its snapshot if there is
+        one, saves new snapshots as it goes and removes the snapshot when it finishes. Resumed runs
+        match uninterrupted ones exactly when seeded. A recorder is re-attached, not rewound.
+    :param common_random: Give the channel, jammer and spoofer their own random streams, re-seeded
+        from the seed and message number, so scenarios run with the same seed see identical channel
+        noise and their differences can be compared pair by pair (see crn.paired_comparison).
+    :param garbling_emitters: Number of other emitters squittering around the GCS; when non-zero,
+        messages overlapped by their replies without capturing the receiver are lost (garbling.GarblingModel).
+    :return: Plotting series (packet_loss, snr, latency, throughput).
+    """
+    if metrics is None:
+        metrics = NULL_METRICS
+    config = {'scenario': 'n_scen_stat', 'jamming': jamming, 'spoofing': spoofing,
+              'spoof_probability': spoof_probability, 'error_rate': error_rate, 'noise_level': noise_level,
+              'pulse_duration': pulse_duration, 'pulse_interval': pulse_interval, 'num_drones': num_drones,
+              'corruption_model': corruption_model, 'seed': seed, 'common_random': common_random,
+              'garbling_emitters': garbling_emitters}
+    state, _ = checkpoint.load(config) if checkpoint is not None else (None, 0)
+
+    if state is None:
+        state = initial_state(jamming, spoofing, spoof_probability, error_rate, noise_level, pulse_duration,
+                              pulse_interval, num_drones, stats, corruption_model, seed, common_random,
+                              garbling_emitters)
+    else:
+        # Carry the restored results into the caller's objects
+        if stats is not None:
+            stats.__dict__.update(state['stats'].__dict__)
+            state['stats'] = stats
+        gcs.__dict__.update(state['gcs'].__dict__)
+        state['gcs'] = gcs
+    state['channel'].metrics = metrics
+    state['channel'].recorder = recorder
+
+    advance_simulation(state, metrics, checkpoint, config)
+    if checkpoint is not None:
+        checkpoint.complete()
+    return state['stats'].series()
+
+if __name__ == "__main__":
+    # Run simulations for each scenario and collect results
+    results = {}
+    total_metrics = StageMetrics()
+    for scenario, params in scenarios.items():
+        print(f"Running scenario: {scenario}")
+        scenario_metrics = StageMetrics()
+        if PROFILE_SCENARIOS:
+            profile_path = os.path.join('results', f"profile_{scenario.lower().replace(' ', '_')}.prof")
+            packet_loss_data, snr_data, latency_data, throughput_data = profile_scenario(
+                run_simulation, profile_path, metrics=scenario_metrics, **params)
+        else:
+            packet_loss_data, snr_data, latency_data, throughput_data = run_simulation(
+                metrics=scenario_metrics, **params)
+        scenario_metrics.report(scenario)
+        total_metrics.merge(scenario_metrics)
+        results[scenario] = {
+            'packet_loss': packet_loss_data,
+            'snr': snr_data,
+            'latency': latency_data,
+            'throughput': throughput_data
+        }
+
+    # Ensure the 'results' directory exists
+    if not os.path.exists('results'):
+        os.makedirs('results')
+
+    with total_metrics.stage('plotting'):
+        plot_packet_loss_data(results)
+
+
+        # Plotting SNR over time for each scenario
+        plot_snr_data(results)
+
+        # Plotting Latency over time for each scenario
+        plot_latency_data(results)
+
+        # Plotting Throughput over time for each scenario
+        plot_throughput_data(results)
+
+    total_metrics.report("All scenarios")
@@ -0,0 +1,385 @@
+import argparse
+import multiprocessing as mp
+import queue
+import random
+import threading
+import time
+import traceback
+import types
+
+from adsbchannel import ADSBChannel
+from gcs import GCS
+from jammer import PulsedNoiseJammer
+from scenario import center_lat, center_lon, make_fleet
+from spoofer import Spoofer
+from streaming_metrics import ScenarioMetrics
+
+# Marker passed down a queue once per downstream worker when its upstream stage has finished
+END_OF_STREAM = '__end_of_stream__'
+
+
+class Stage:
+    """
+    One pipeline step. fn takes a batch and returns the batch to pass on (None drops it), or is a
+    generator function yielding several batches per input, each passed on as soon as it is ready.
+    fn may be a callable object holding state; with workers > 1 each worker gets its own copy
+    in process mode and shares one in thread mode, and output order is no longer guaranteed.
+    """
+    def __init__(self, name, fn, workers=1):
+        self.name = name
+        self.fn = fn
+        self.workers = workers
+
+
+def _stage_worker(name, fn, inbox, outbox, stats_queue, reseed=False):
+    """Worker loop shared by thread and process mode."""
+    if reseed:
+        random.seed()  # Forked workers would otherwise all replay the parent's random stream
+    stats = {'batches': 0, 'items': 0, 'busy_s': 0.0, 'starved_s': 0.0, 'blocked_s': 0.0, 'error': None}
+    while True:
+        t0 = time.perf_counter()
+        batch = inbox.get()
+        t1 = time.perf_counter()
+        stats['starved_s'] += t1 - t0
+        if isinstance(batch, str) and batch == END_OF_STREAM:
+            break
+        if stats['error'] is not None:
+            continue  # Keep draining so upstream stages are not blocked forever
+        blocked = 0.0
+        try:
+            result = fn(batch)
+            # A generator is paused while its output waits for room, so it never runs ahead of the queue
+            for output in (result if isinstance(result, types.GeneratorType) else (result,)):
+                if output is not None:
+                    # A full outbox blocks here: this is the backpressure a slow downstream stage exerts
+                    t2 = time.perf_counter()
+                    outbox.put(output)
+                    blocked += time.perf_counter() - t2
+        except Exception:
+            stats['error'] = traceback.format_exc()
+            continue
+        stats['busy_s'] += time.perf_counter() - t1 - blocked
+        stats['blocked_s'] += blocked
+        stats['batches'] += 1
+        stats['items'] += len(batch) if hasattr(batch, '__len__') else 1
+    stats_queue.put((name, stats))
+
+
+class Pipeline:
+    """
+    Source -> stages -> sink, connected by bounded queues. Each stage runs in its own worker
+    threads or processes; a stage that cannot keep up fills its input queue, which blocks the
+    stage before it and ultimately the source, so memory stays bounded by queue_size batches
+    per link instead of growing with the backlog.
+    """
+    def __init__(self, stages, queue_size=8, mode='thread'):
+        """
+        :param stages: List of Stage.
+        :param queue_size: Batches buffered between two stages.
+        :param mode: 'thread' or 'process'. Process mode needs picklable stage functions and batches.
+        """
+        if mode not in ('thread', 'process'):
+            raise ValueError(f"Unknown pipeline mode {mode!r}")
+        self.stages = stages
+        self.queue_size = queue_size
+        self.mode = mode
+        self.report = {}
+
+    def run(self, source, sink):
+        """
+        Feed every batch from source through the stages and hand the results to sink.
+        The source runs in a feeder thread and the sink in the calling thread, so the sink may
+        own state (e.g. the GCS) that the caller reads afterwards.
+        :param source: Iterable of batches.
+        :param sink: Callable receiving each output batch.
+        :return: Per-stage report: batches, items, busy_s, starved_s (waiting for input) and
+            blocked_s (waiting for room downstream).
+        """
+        if self.mode == 'process':
+            make_queue, worker_type, stats_queue = mp.Queue, mp.Process, mp.Queue()
+        else:
+            make_queue, worker_type, stats_queue = queue.Queue, threading.Thread, queue.Queue()
+        queues = [make_queue(maxsize=self.queue_size) for _ in range(len(self.stages) + 1)]
+
+        workers, closers = [], []
+        for i, stage in enumerate(self.stages):
+            stage_workers = [
+                worker_type(target=_stage_worker, args=(stage.name, stage.fn, queues[i], queues[i + 1], stats_queue,
+                                                              self.mode == 'process'), daemon=True)
+                for _ in range(stage.workers)
+            ]
+            for worker in stage_workers:
+                worker.start()
+            workers.extend(stage_workers)
+            downstream = self.stages[i + 1].workers if i + 1 < len(self.stages) else 1
+            # Once every worker of this stage has exited, tell each downstream consumer the stream ended
+            closer = threading.Thread(target=self._close_stage, args=(stage_workers, queues[i + 1], downstream),
+                                      daemon=True)
+            closer.start()
+            closers.append(closer)
+
+        feed_stats = {'batches': 0, 'blocked_s': 0.0, 'error': None}
+        feeder = threading.Thread(target=self._feed, args=(source, queues[0], self.stages[0].workers, feed_stats),
+                                  daemon=True)
+        feeder.start()
+
+        sink_stats = {'batches': 0, 'busy_s': 0.0, 'starved_s': 0.0}
+        outbox = queues[-1]
+        while True:
+            t0 = time.perf_counter()
+            batch = outbox.get()
+            t1 = time.perf_counter()
+            sink_stats['starved_s'] += t1 - t0
+            if isinstance(batch, str) and batch == END_OF_STREAM:
+                break
+            sink(batch)
+            sink_stats['busy_s'] += time.perf_counter() - t1
+            sink_stats['batches'] += 1
+
+        feeder.join()
+        for closer in closers:
+            closer.join()
+
+        errors = []
+        if feed_stats['error'] is not None:
+            errors.append(f"[source] {feed_stats['error']}")
+        report = {'source': {key: value for key, value in feed_stats.items() if key != 'error'}}
+        for _ in workers:
+            name, stats = stats_queue.get()
+            error = stats.pop('error')
+            if error is not None:
+                errors.append(f"[{name}] {error}")
+            totals = report.setdefault(name, {'workers': 0, 'batches': 0, 'items': 0, 'busy_s': 0.0,
+                                              'starved_s': 0.0, 'blocked_s': 0.0})
+            totals['workers'] += 1
+            for key, value in stats.items():
+                totals[key] += value
+        report['sink'] = sink_stats
+        self.report = report
+        if errors:
+            raise RuntimeError("Pipeline stage failed:\n" + "\n".join(errors))
+        return report
+
+    @staticmethod
+    def _feed(source, inbox, consumers, stats):
+        try:
+            for batch in source:
+                t0 = time.perf_counter()
+                inbox.put(batch)
+                stats['blocked_s'] += time.perf_counter() - t0
+                stats['batches'] += 1
+        except Exception:
+            stats['error'] = traceback.format_exc()  # Raised from run() once the stages have drained
+        finally:
+            # Without the end markers the stages, and the sink loop behind them, would wait forever
+            for _ in range(consumers):
+                inbox.put(END_OF_STREAM)
+
+    @staticmethod
+    def _close_stage(stage_workers, outbox, consumers):
+        for worker in stage_workers:
+            worker.join()
+        for _ in range(consumers):
+            outbox.put(END_OF_STREAM)
+
+
+def navigation_batches(drones, delta_time=1, batch_size=256, start_time=None):
+    """
+    Source stage: advance the whole fleet one tick at a time and yield its position reports
+    as lists of message dicts, batch_size messages at most per batch. Timestamps follow the
+    simulated clock (start_time + tick * delta_time), not the wall clock, since ticks are
+    computed much faster than real time.
+    """
+    sim_time = time.time() if start_time is None else start_time
+    active = list(drones)
+    batch = []
+    while active:
+        sim_time += delta_time
+        still_flying = []
+        for drone in active:
+            if drone.calculate_navigation(delta_time) in (-1, -2, 0):
+                continue
+            still_flying.append(drone)
+            batch.append({
+                'drone_id': drone.id,
+                'latitude': drone.current_position[0],
+                'longitude': drone.current_position[1],
+                'altitude': drone.current_position[2],
+                'timestamp': sim_time,
+            })
+            if len(batch) >= batch_size:
+                yield batch
+                batch = []
+        active = still_flying
+    if batch:
+        yield batch
+
+
+def fleet_slices(drones, drones_per_batch=8):
+    """Source for NavigationStage: the fleet in slices of at most drones_per_batch drones."""
+    for start in range(0, len(drones), drones_per_batch):
+        yield drones[start:start + drones_per_batch]
+
+
+class NavigationStage:
+    """
+    Navigation stage: flies a slice of the fleet to the end of its routes, yielding its position
+    reports tick by tick in batches of at most batch_size (see navigation_batches). Each drone's
+    state lives in the slice that carries it, so slices can be flown by parallel workers; reports
+    of different slices interleave, but each drone's stay in time order, which is what the
+    detector checks.
+    """
+    def __init__(self, delta_time=1, batch_size=256, start_time=None):
+        """:param start_time: Simulated start time shared by every slice (now when None)."""
+        self.delta_time = delta_time
+        self.batch_size = batch_size
+        self.start_time = time.time() if start_time is None else start_time
+
+    def __call__(self, drones):
+        """:return: Generator of lists of message dicts."""
+        yield from navigation_batches(drones, self.delta_time, self.batch_size, self.start_time)
+
+
+class ChannelStage:
+    """Channel stage: runs each report through ADSBChannel.transmit with optional jammer and spoofer."""
+    def __init__(self, channel, gcs_position, jammer=None, spoofer=None):
+        self.channel = channel
+        self.gcs_position = gcs_position
+        self.jammer = jammer
+        self.spoofer = spoofer
+
+    def __call__(self, messages):
+        """:return: List of (received message or None, delay_ns, corrupted, snr_db) tuples."""
+        return [self.channel.transmit(message, self.gcs_position, jammer=self.jammer, spoofer=self.spoofer)
+                for message in messages]
+
+
+class KinematicDetector:
+    """
+    Detector stage: flags reports that would require a drone to have moved faster than
+    max_speed since its last accepted report, and reports dated further ahead of the newest
+    accepted report than max_clock_skew. Keeps per-drone state, so run it with one worker.
+    """
+    def __init__(self, max_speed=100.0, max_clock_skew=60.0, reseed_after=3):
+        """
+        :param max_speed: Highest plausible ground speed in m/s.
+        :param max_clock_skew: Seconds a report may be dated ahead of the newest accepted one; leave
+            room for reports reordered by parallel workers and queues.
+        :param reseed_after: Consecutive rejections after which a drone's reference position is
+            replaced, so one bad first report cannot lock a track out indefinitely.
+        """
+        self.max_speed = max_speed
+        self.max_clock_skew = max_clock_skew
+        self.reseed_after = reseed_after
+        self.channel = ADSBChannel()  # Only for haversine_distance
+        self.last_report = {}
+        self.latest_time = None
+
+    def __call__(self, results):
+        """:return: The results with a 'suspicious' flag appended to each tuple."""
+        flagged = []
+        for received, delay_ns, corrupted, snr_db in results:
+            suspicious = False
+            if received is not None:
+                drone_id = received['drone_id']
+                timestamp = received['timestamp']
+                previous = self.last_report.get(drone_id)
+                if self.latest_time is not None and timestamp > self.latest_time + self.max_clock_skew:
+                    suspicious = True
+                elif previous is not None:
+                    # Parallel channel workers can reorder reports, so the gap may be negative
+                    elapsed = max(abs(timestamp - previous[2]), 1e-3)
+                    distance = self.channel.haversine_distance(previous[0], previous[1],
+                                                               received['latitude'], received['longitude'])
+                    suspicious = distance / elapsed > self.max_speed
+                if not suspicious:
+                    if previous is None or timestamp > previous[2]:
+                        self.last_report[drone_id] = (received['latitude'], received['longitude'], timestamp, 0)
+                    if self.latest_time is None or timestamp > self.latest_time:
+                        self.latest_time = timestamp
+                elif previous is not None:
+                    rejects = previous[3] + 1
+                    if rejects >= self.reseed_after and timestamp <= self.latest_time + self.max_clock_skew:
+                        self.last_report[drone_id] = (received['latitude'], received['longitude'], timestamp, 0)
+                    else:
+                        self.last_report[drone_id] = previous[:3] + (rejects,)
+            flagged.append((received, delay_ns, corrupted, snr_db, suspicious))
+        return flagged
+
+
+class GCSSink:
+    """Sink stage: updates the GCS with reports the detector accepted and fills ScenarioMetrics."""
+    def __init__(self, gcs, stats=None):
+        self.gcs = gcs
+        self.stats = stats if stats is not None else ScenarioMetrics()
+        self.rejected = 0
+
+    def __call__(self, results):
+        stats = self.stats
+        for received, delay_ns, corrupted, snr_db, suspicious in results:
+            now = time.time()
+            stats.record_sent(now)
+            if received is None:
+                stats.record_drop()
+                continue
+            if suspicious:
+                self.rejected += 1
+            else:
+                self.gcs.receive_update(received['drone_id'],
+                                        (received['latitude'], received['longitude'], received['altitude']))
+            stats.record_delivery(now, snr_db, delay_ns / 1e6, corrupted)
+
+
+def run_pipeline_simulation(jamming=False, spoofing=False, spoof_probability=0.5, num_drones=100,
+                            mode='thread', navigation_workers=1, channel_workers=2, queue_size=8,
+                            drones_per_batch=8, batch_size=256, stats=None):
+    """
+    Pipelined counterpart of n_scen_stat.run_simulation: navigation -> channel -> detector -> GCS.
+    The channel skips the real-time propagation sleep so stages are limited by computation only.
+    :param navigation_workers: Parallel workers flying slices of the fleet.
+    :param channel_workers: Parallel workers for the channel stage, usually the bottleneck.
+    :param drones_per_batch: Drones per navigation slice.
+    :param batch_size: Reports per batch passed on from navigation.
+    :return: (GCSSink, pipeline report).
+    """
+    drones = make_fleet(num_drones)
+    gcs = GCS(center_lat, center_lon)
+    jammer = PulsedNoiseJammer(pulse_duration=0.5, pulse_interval=2.0, noise_level=1.0) if jamming else None
+    spoofer = Spoofer(spoof_probability=spoof_probability, fake_drone_id="FAKE-DRONE") if spoofing else None
+
+    pipeline = Pipeline([
+        Stage('navigation', NavigationStage(batch_size=batch_size), workers=navigation_workers),
+        Stage('channel', ChannelStage(ADSBChannel(realtime_delay=False), gcs.position[:2], jammer, spoofer),
+              workers=channel_workers),
+        Stage('detector', KinematicDetector()),
+    ], queue_size=queue_size, mode=mode)
+    sink = GCSSink(gcs, stats)
+    report = pipeline.run(fleet_slices(drones, drones_per_batch), sink)
+    return sink, report
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run a scenario through the staged pipeline.")
+    parser.add_argument('--drones', type=int, default=200)
+    parser.add_argument('--mode', choices=['thread', 'process'], default='process')
+    parser.add_argument('--navigation-workers', type=int, default=1)
+    parser.add_argument('--channel-workers', type=int, default=2)
+    parser.add_argument('--queue-size', type=int, default=8)
+    parser.add_argument('--drones-per-batch', type=int, default=8)
+    parser.add_argument('--batch-size', type=int, default=256)
+    parser.add_argument('--jamming', action='store_true')
+    parser.add_argument('--spoofing', action='store_true')
+    args = parser.parse_args()
+
+    start = time.time()
+    sink, report = run_pipeline_simulation(args.jamming, args.spoofing, num_drones=args.drones, mode=args.mode,
+                                           navigation_workers=args.navigation_workers,
+                                           channel_workers=args.channel_workers, queue_size=args.queue_size,
+                                           drones_per_batch=args.drones_per_batch, batch_size=args.batch_size)
+    elapsed = time.time() - start
+    summary = sink.stats.summary()
+    print(f"[Pipeline] {summary['messages']} reports in {elapsed:.2f} s ({summary['messages'] / elapsed:,.0f} reports/s), "
+          f"{sink.rejected} rejected by the detector, {len(sink.gcs.drone_positions)} tracks")
+    for name, stats in report.items():
+        print(f"[Pipeline] {name:>8}: " + ", ".join(
+            f"{key}={value:.2f}" if isinstance(value, float) else f"{key}={value}" for key, value in stats.items()))
@@ -0,0 +1,208 @@
+import cProfile
+import collections
+import os
+import sys
+import threading
+import time
+from contextlib import nullcontext
+
+
+class _StageTimer:
+    """Reusable context manager that adds the time spent inside it to one stage, for one thread."""
+    __slots__ = ('ns', 'calls', 'start')
+
+    def __init__(self):
+        self.ns = 0
+        self.calls = 0
+        self.start = 0
+
+    def __enter__(self):
+        self.start = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.ns += time.perf_counter_ns() - self.start
+        self.calls += 1
+        return False
+
+
+class StageMetrics:
+    """
+    Per-stage wall-time and event counters for a simulation run.
+    Stages are timed with `with metrics.stage("navigation"):`, events with `metrics.count("drops")`.
+    Each thread times and counts into its own timers and counters, merged when read, so one
+    StageMetrics can be shared by the worker threads of a thread-mode pipeline stage.
+    """
+    def __init__(self):
+        self._merged_ns = collections.defaultdict(int)
+        self._merged_calls = collections.defaultdict(int)
+        self._merged_counters = collections.defaultdict(int)
+        self._local = threading.local()
+        self._threads = []  # (timers, counters) of every thread that recorded anything
+        self._lock = threading.Lock()
+
+    def _thread_state(self):
+        try:
+            return self._local.state
+        except AttributeError:
+            state = self._local.state = ({}, collections.defaultdict(int))
+            with self._lock:
+                self._threads.append(state)
+            return state
+
+    def stage(self, name):
+        """Context manager timing one execution of a stage."""
+        timers = self._thread_state()[0]
+        timer = timers.get(name)
+        if timer is None:
+            timer = timers[name] = _StageTimer()
+        return timer
+
+    def count(self, name, n=1):
+        """Increment an event counter."""
+        self._thread_state()[1][name] += n
+
+    @property
+    def stage_ns(self):
+        """Stage name -> total nanoseconds over every thread."""
+        totals = collections.defaultdict(int, self._merged_ns)
+        for timers, _ in list(self._threads):
+            for name, timer in list(timers.items()):
+                totals[name] += timer.ns
+        return totals
+
+    @property
+    def stage_calls(self):
+        """Stage name -> number of timed executions over every thread."""
+        totals = collections.defaultdict(int, self._merged_calls)
+        for timers, _ in list(self._threads):
+            for name, timer in list(timers.items()):
+                totals[name] += timer.calls
+        return totals
+
+    @property
+    def counters(self):
+        """Counter name -> value over every thread."""
+        totals = collections.defaultdict(int, self._merged_counters)
+        for _, counters in list(self._threads):
+            for name, value in list(counters.items()):
+                totals[name] += value
+        return totals
+
+    def merge(self, other):
+        """Add another StageMetrics into this one (e.g. one per scenario into a total)."""
+        other_calls = other.stage_calls
+        for name, ns in other.stage_ns.items():
+            self._merged_ns[name] += ns
+            self._merged_calls[name] += other_calls[name]
+        for name, value in other.counters.items():
+            self._merged_counters[name] += value
+        return self
+
+    def as_dict(self):
+        """Plain dictionary snapshot, suitable for JSON."""
+        stage_calls = self.stage_calls
+        return {
+            'stages': {name: {'ns': ns, 'calls': stage_calls[name],
+                              'ns_per_call': ns / stage_calls[name] if stage_calls[name] else 0.0}
+                       for name, ns in self.stage_ns.items()},
+            'counters': dict(self.counters),
+        }
+
+    def report(self, title="Stage timings"):
+        """Print stages sorted by total time, followed by the counters."""
+        stage_ns, stage_calls = self.stage_ns, self.stage_calls
+        total_ns = sum(stage_ns.values()) or 1
+        print(f"--- {title} ---")
+        print(f"{'stage':20s} {'total ms':>10s} {'share':>7s} {'calls':>9s} {'ns/call':>10s}")
+        for name, ns in sorted(stage_ns.items(), key=lambda item: -item[1]):
+            calls = stage_calls[name]
+            print(f"{name:20s} {ns / 1e6:10.2f} {ns / total_ns:7.1%} {calls:9d} {ns / max(calls, 1):10.0f}")
+        for name, value in sorted(self.counters.items()):
+            print(f"{name:20s} {value:10d}")
+
+
+class NullStageMetrics:
+    """Stand-in used when instrumentation is off; every operation is a no-op."""
+    _null = nullcontext()
+
+    def stage(self, name):
+        return self._null
+
+    def count(self, name, n=1):
+        pass
+
+
+NULL_METRICS = NullStageMetrics()
+
+
+class SamplingProfiler:
+    """
+    Statistical profiler: a background thread samples the target thread's stack at a fixed
+    interval and writes collapsed stacks ("a;b;c count"), the input format of flamegraph tools.
+    Unlike cProfile it adds no per-call overhead, so stage proportions stay realistic.
+    """
+    def __init__(self, interval=0.001, thread_id=None):
+        """
+        :param interval: Seconds between samples.
+        :param thread_id: Thread to sample; defaults to the thread calling start().
+        """
+        self.interval = interval
+        self.thread_id = thread_id
+        self.samples = collections.Counter()
+        self._running = False
+        self._thread = None
+
+    def _sample(self):
+        while self._running:
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                frame = frame.f_back
+            if stack:
+                self.samples[';'.join(reversed(stack))] += 1
+            time.sleep(self.interval)
+
+    def start(self):
+        if self.thread_id is None:
+            self.thread_id = threading.get_ident()
+        self._running = True
+        self._thread = threading.Thread(target=self._sample, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._running = False
+        if self._thread is not None:
+            self._thread.join()
+
+    def dump(self, path):
+        with open(path, 'w') as f:
+            for stack, count in self.samples.most_common():
+                f.write(f"{stack} {count}\n")
+
+
+def profile_scenario(fn, profile_path, *args, mode='cprofile', **kwargs):
+    """
+    Run fn(*args, **kwargs) under a profiler and write the profile to disk.
+    :param profile_path: Output file (pstats format for cProfile, collapsed stacks for sampling).
+    :param mode: 'cprofile' for deterministic profiling or 'sampling' for the low-overhead sampler.
+    :return: Whatever fn returns.
+    """
+    os.makedirs(os.path.dirname(profile_path) or '.', exist_ok=True)
+    if mode == 'cprofile':
+        profiler = cProfile.Profile()
+        try:
+            return profiler.runcall(fn, *args, **kwargs)
+        finally:
+            profiler.dump_stats(profile_path)
+    elif mode == 'sampling':
+        profiler = SamplingProfiler()
+        profiler.start()
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            profiler.stop()
+            profiler.dump(profile_path)
+    raise ValueError(f"Unknown profiling mode: {mode}")
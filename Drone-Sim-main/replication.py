@@ -0,0 +1,127 @@
+import os
+import time
+from concurrent.futures import Future, ProcessPoolExecutor, FIRST_COMPLETED, wait
+
+from streaming_metrics import RunningStats
+from sweep import run_scenario
+
+
+class AdaptiveReplications:
+    """
+    Runs seeded replications of several scenarios in parallel until every tracked metric's 95%
+    confidence interval is narrower than its target, or a budget runs out. Free workers always go
+    to the open scenario with the fewest replications, so scenarios that converge quickly stop
+    early and the noisy ones get the rest of the budget. Results are absorbed in seed order, which
+    makes the stopping point, and so the report, independent of worker timing.
+    """
+    def __init__(self, targets, min_replications=3, max_replications=50, max_seconds=None, max_workers=None,
+                 seed=0, run_fn=run_scenario):
+        """
+        :param targets: Dictionary of summary metric -> largest acceptable confidence half-width.
+        :param min_replications: Replications before a scenario may stop (small samples give unstable widths).
+        :param max_replications: Replication budget per scenario.
+        :param max_seconds: Optional wall-clock budget for the whole run.
+        :param max_workers: Worker processes (None uses every core, 1 runs in-process).
+        :param seed: Replication r of every scenario runs with seed + r.
+        :param run_fn: Top-level (picklable) function mapping a config dict to a summary dictionary.
+        """
+        if min_replications < 2:
+            raise ValueError("A confidence interval needs at least two replications")
+        self.targets = targets
+        self.min_replications = min_replications
+        self.max_replications = max_replications
+        self.max_seconds = max_seconds
+        self.max_workers = max_workers
+        self.seed = seed
+        self.run_fn = run_fn
+
+    def _absorb(self, run):
+        # Fold in the replications that are next in seed order, then apply the stopping rule
+        while not run['reason'] and run['absorbed'] in run['results']:
+            summary = run['results'].pop(run['absorbed'])
+            run['absorbed'] += 1
+            for metric, stats in run['stats'].items():
+                if summary.get(metric) is not None:
+                    stats.push(summary[metric])
+            if run['absorbed'] >= self.min_replications and all(
+                    stats.half_width <= self.targets[metric] for metric, stats in run['stats'].items()):
+                run['reason'] = 'converged'
+            elif run['absorbed'] >= self.max_replications:
+                run['reason'] = 'replication budget'
+
+    def run(self, scenarios, **shared):
+        """
+        :param scenarios: Dictionary of name -> run_fn parameters (e.g. n_scen_stat.scenarios).
+        :param shared: Parameters common to every scenario (num_drones, error_rate, ...).
+        :return: Dictionary of name -> {'replications', 'reason', 'metrics': metric -> {'mean',
+            'half_width', 'target'}}; reason is 'converged', 'replication budget' or 'time budget'.
+        """
+        runs = {name: {'launched': 0, 'absorbed': 0, 'results': {}, 'reason': None,
+                       'stats': {metric: RunningStats() for metric in self.targets}} for name in scenarios}
+        executor = ProcessPoolExecutor(max_workers=self.max_workers) if self.max_workers != 1 else None
+        slots = 1 if executor is None else (self.max_workers or os.cpu_count())
+        in_flight = {}
+        start = time.monotonic()
+        try:
+            while True:
+                while len(in_flight) < slots:
+                    open_runs = [name for name, run in runs.items()
+                                 if not run['reason'] and run['launched'] < self.max_replications]
+                    if not open_runs:
+                        break
+                    name = min(open_runs, key=lambda n: runs[n]['launched'])
+                    replication = runs[name]['launched']
+                    runs[name]['launched'] += 1
+                    config = dict(shared, **scenarios[name], seed=self.seed + replication)
+                    if executor is None:
+                        future = Future()
+                        future.set_result(self.run_fn(config))
+                    else:
+                        future = executor.submit(self.run_fn, config)
+                    in_flight[future] = (name, replication)
+                if not in_flight:
+                    break
+
+                done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in done:
+                    name, replication = in_flight.pop(future)
+                    runs[name]['results'][replication] = future.result()
+                    self._absorb(runs[name])
+
+                if self.max_seconds is not None and time.monotonic() - start > self.max_seconds:
+                    for run in runs.values():
+                        run['reason'] = run['reason'] or 'time budget'
+                    break
+        finally:
+            if executor is not None:
+                executor.shutdown(cancel_futures=True)
+
+        return {name: {'replications': run['absorbed'], 'reason': run['reason'],
+                       'metrics': {metric: {'mean': stats.mean, 'half_width': stats.half_width,
+                                            'target': self.targets[metric]}
+                                   for metric, stats in run['stats'].items()}}
+                for name, run in runs.items()}
+
+
+def print_report(report):
+    """One line per scenario and metric: estimate, achieved precision and why replication stopped."""
+    for name, result in report.items():
+        print(f"[Replications] {name}: {result['replications']} replications ({result['reason']})")
+        for metric, value in result['metrics'].items():
+            print(f"[Replications]   {metric:12s} {value['mean']:10.3f} +/- {value['half_width']:.3f} "
+                  f"(target {value['target']})")
+
+
+if __name__ == "__main__":
+    import contextlib
+    import io
+    from n_scen_stat import scenarios
+
+    controller = AdaptiveReplications({'packet_loss': 1.0, 'mean_snr': 0.5}, max_replications=40, max_seconds=600)
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()):  # The spoofer logs every message it alters
+        report = controller.run(scenarios, num_drones=4)
+    print_report(report)
+    total = sum(result['replications'] for result in report.values())
+    print(f"[Replications] {total} replications in {time.perf_counter() - start:.1f} s "
+          f"(a fixed design would run {controller.max_replications * len(scenarios)})")
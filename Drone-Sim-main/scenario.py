@@ -0,0 +1,27 @@
+# Operating area shared by the scenario scripts and the tools built on them
+center_lat, center_lon = 38.8977, -77.0365  # White House location
+
+
+def make_fleet(num_drones, max_offset=0.02):
+    """Drones with the scenario scripts' parameters; speeds cycle through 10-30 m/s."""
+    # Imported here so modules that only need the operating area do not pull in matplotlib via drone
+    from drone import Drone
+    from route import RouteGenerator
+
+    routes = RouteGenerator(center_lat, center_lon, num_routes=num_drones, waypoints_per_route=5,
+                            max_offset=max_offset).generate_routes()
+    return [
+        Drone(
+            id=f"{i+1}",
+            drone_type=f"type{i % 5 + 1}",
+            acceleration_rate=2.0,
+            climb_rate=3.0,
+            speed=10.0 + (i % 5) * 5,
+            position_error=2.0,
+            altitude_error=1.0,
+            battery_consume_rate=0.05,
+            battery_capacity=10.0 + (i % 5) * 5,
+            route=route
+        )
+        for i, route in enumerate(routes)
+    ]
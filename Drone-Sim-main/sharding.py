@@ -0,0 +1,320 @@
+import multiprocessing as mp
+import time
+
+import numpy as np
+
+from adsbchannel import ADSBChannel
+from fleet import FleetState, random_routes
+from garbling import GarblingModel, squitter_start_times
+from shm_transport import SharedArrays
+
+# Per-tile counters accumulated over the run (rows of the 'stats' shared array)
+STAT_FIELDS = ('squitters', 'decoded', 'overlapped', 'foreign_squitters', 'migrations_out')
+
+# Cross-tile interference models: 'summary' uses the neighbours' boundary summaries, 'none' ignores
+# other tiles, 'exact' uses every foreign drone's true position (single process only; the reference)
+BOUNDARY_MODES = ('summary', 'none', 'exact')
+
+
+class TileGrid:
+    """
+    Partition of the operating area (in the fleet's local east/north meters) into rows x cols tiles,
+    each subdivided into cells_per_tile x cells_per_tile summary cells. Each tile has a receiver at
+    its centre that hears its own drones and, through interference, everything within range.
+    """
+    def __init__(self, bounds, shape=(2, 2), cells_per_tile=8):
+        """
+        :param bounds: (east_min, east_max, north_min, north_max) in meters.
+        :param shape: (rows, cols) of tiles.
+        :param cells_per_tile: Summary cells along each side of a tile.
+        """
+        self.bounds = bounds
+        self.rows, self.cols = shape
+        self.cells_per_tile = cells_per_tile
+        east_min, east_max, north_min, north_max = bounds
+        self.cell_width = (east_max - east_min) / (self.cols * cells_per_tile)
+        self.cell_height = (north_max - north_min) / (self.rows * cells_per_tile)
+        cell_east = east_min + (np.arange(self.cols * cells_per_tile) + 0.5) * self.cell_width
+        cell_north = north_min + (np.arange(self.rows * cells_per_tile) + 0.5) * self.cell_height
+        self.cell_north, self.cell_east = np.meshgrid(cell_north, cell_east, indexing='ij')
+        tile_row, tile_col = np.divmod(np.arange(len(self)), self.cols)
+        self.receivers = np.column_stack([east_min + (tile_col + 0.5) * cells_per_tile * self.cell_width,
+                                          north_min + (tile_row + 0.5) * cells_per_tile * self.cell_height])
+
+    @classmethod
+    def around(cls, fleet, shape=(2, 2), cells_per_tile=8):
+        """Grid covering every waypoint of a fleet."""
+        east, north = fleet.waypoints[:, :, 0], fleet.waypoints[:, :, 1]
+        bounds = (float(east.min()) - 1.0, float(east.max()) + 1.0, float(north.min()) - 1.0, float(north.max()) + 1.0)
+        return cls(bounds, shape, cells_per_tile)
+
+    def __len__(self):
+        return self.rows * self.cols
+
+    @property
+    def cell_shape(self):
+        return self.rows * self.cells_per_tile, self.cols * self.cells_per_tile
+
+    def cells(self, east, north):
+        """(row, col) summary cell of each position; positions outside the area go to the edge cells."""
+        rows, cols = self.cell_shape
+        col = np.clip(((east - self.bounds[0]) / self.cell_width).astype(np.int64), 0, cols - 1)
+        row = np.clip(((north - self.bounds[2]) / self.cell_height).astype(np.int64), 0, rows - 1)
+        return row, col
+
+    def tile_of(self, row, col):
+        """Tile index of summary cells."""
+        return (row // self.cells_per_tile) * self.cols + col // self.cells_per_tile
+
+    def tile_cells(self, tile):
+        """Row and column slices of a tile's block of summary cells."""
+        tile_row, tile_col = divmod(tile, self.cols)
+        c = self.cells_per_tile
+        return slice(tile_row * c, (tile_row + 1) * c), slice(tile_col * c, (tile_col + 1) * c)
+
+    def boundary_mask(self, tile, halo):
+        """Cells of the tile whose centre lies within halo meters of its edge: what its neighbours hear."""
+        rows, cols = self.tile_cells(tile)
+        east, north = self.cell_east[rows, cols], self.cell_north[rows, cols]
+        edge = np.minimum.reduce([east - east.min() + self.cell_width / 2, east.max() + self.cell_width / 2 - east,
+                                  north - north.min() + self.cell_height / 2,
+                                  north.max() + self.cell_height / 2 - north])
+        return edge <= halo
+
+
+class TileWorker:
+    """
+    Simulates the drones currently inside one tile. A step has two phases separated by a barrier
+    across all tiles:
+      1. navigate: step the tile's drones, hand drones that crossed a boundary to their new tile
+         and publish the boundary summary (emitter counts per edge cell);
+      2. receive: garble the tile's squitters at its receiver against its own traffic plus the
+         neighbours' summarized traffic.
+    Ownership, summaries and flying counts are double-buffered by step parity, so a tile may start
+    the next step while slower tiles still read this one's.
+    """
+    def __init__(self, tile, grid, fleet, shared, config, channel=None):
+        """
+        :param fleet: FleetState over the shared per-drone arrays.
+        :param shared: SharedArrays with 'owner', 'summary', 'flying' and 'stats'.
+        :param config: Run parameters (see run_sharded).
+        """
+        self.tile = tile
+        self.grid = grid
+        self.fleet = fleet
+        self.shared = shared
+        self.config = config
+        self.channel = channel if channel is not None else ADSBChannel(precision=fleet.dtype.name)
+        self.garbling = GarblingModel()
+        self.cell_rows, self.cell_cols = grid.tile_cells(tile)
+        self.boundary = grid.boundary_mask(tile, config['interference_range'])
+        # Foreign summary cells close enough to this receiver to interfere
+        reach = np.hypot(grid.cell_east - grid.receivers[tile, 0], grid.cell_north - grid.receivers[tile, 1])
+        foreign = np.ones(grid.cell_shape, dtype=bool)
+        foreign[self.cell_rows, self.cell_cols] = False
+        self.interfering_cells = foreign & (reach <= config['interference_range'])
+        self.transmitters = None
+        self.peers = []  # Other tiles' workers in this process, for boundary='exact'
+
+    def navigate(self, step):
+        """Phase 1 of a step. :return: Number of the tile's drones still flying."""
+        parity = step % 2
+        owned = np.flatnonzero(self.shared['owner'][parity] == self.tile)
+        airborne = self.fleet.active(owned)
+        self.fleet.step(self.config['delta_time'], owned)
+        # Positions are copied now: once the barrier is passed, a drone leaving this tile belongs to
+        # a neighbour that may already be moving it
+        self.transmitters = (self.fleet.east[airborne].astype(np.float64),
+                             self.fleet.north[airborne].astype(np.float64), airborne)
+
+        row, col = self.grid.cells(self.fleet.east[owned].astype(np.float64),
+                                   self.fleet.north[owned].astype(np.float64))
+        new_tile = self.grid.tile_of(row, col)
+        self.shared['owner'][1 - parity][owned] = new_tile
+        self.shared['stats'][self.tile, STAT_FIELDS.index('migrations_out')] += np.count_nonzero(new_tile != self.tile)
+
+        # Boundary summary: squittering drones per edge cell of this tile
+        east, north, _ = self.transmitters
+        row, col = self.grid.cells(east, north)
+        counts = np.zeros(self.grid.cell_shape, dtype=np.int32)
+        np.add.at(counts, (row, col), 1)
+        block = counts[self.cell_rows, self.cell_cols]
+        self.shared['summary'][parity][self.cell_rows, self.cell_cols] = np.where(self.boundary, block, 0)
+        flying = int(np.count_nonzero(self.fleet.status[owned] == 1))
+        self.shared['flying'][parity, self.tile] = flying
+        return flying
+
+    def receive(self, step):
+        """Phase 2 of a step: garbling of this tile's squitters at its receiver."""
+        east, north, airborne = self.transmitters
+        receiver = self.grid.receivers[self.tile]
+        mode = self.config['boundary']
+        if mode == 'summary':
+            counts = self.shared['summary'][step % 2][self.interfering_cells]
+            foreign_east = np.repeat(self.grid.cell_east[self.interfering_cells], counts)
+            foreign_north = np.repeat(self.grid.cell_north[self.interfering_cells], counts)
+        elif mode == 'exact':
+            foreign_east = np.concatenate([np.zeros(0)] + [peer.transmitters[0] for peer in self.peers])
+            foreign_north = np.concatenate([np.zeros(0)] + [peer.transmitters[1] for peer in self.peers])
+            near = np.hypot(foreign_east - receiver[0], foreign_north - receiver[1]) <= self.config['interference_range']
+            foreign_east, foreign_north = foreign_east[near], foreign_north[near]
+        else:
+            foreign_east = foreign_north = np.zeros(0)
+
+        all_east = np.concatenate([east, foreign_east])
+        all_north = np.concatenate([north, foreign_north])
+        _, rx_power_dbm, _ = self.channel.link_budget_distances(np.hypot(all_east - receiver[0],
+                                                                         all_north - receiver[1]))
+        rng = np.random.default_rng((self.config['seed'], self.tile, step))
+        starts, emitters = squitter_start_times(len(all_east), window=self.config['delta_time'], rng=rng)
+        result = self.garbling.apply(starts, rx_power_dbm[emitters])
+        own = emitters < len(east)
+        stats = self.shared['stats'][self.tile]
+        stats[STAT_FIELDS.index('squitters')] += np.count_nonzero(own)
+        stats[STAT_FIELDS.index('decoded')] += np.count_nonzero(result['decoded'][own])
+        stats[STAT_FIELDS.index('overlapped')] += np.count_nonzero(result['overlaps'][own] > 0)
+        stats[STAT_FIELDS.index('foreign_squitters')] += np.count_nonzero(~own)
+
+
+def _attach(fleet_layout, fleet_name, shared_layout, shared_name, origin):
+    fleet_arrays = SharedArrays(fleet_layout, fleet_name)
+    shared = SharedArrays(shared_layout, shared_name)
+    return fleet_arrays, shared, FleetState.from_arrays(fleet_arrays.arrays, origin)
+
+
+def _run_tiles(tiles, grid, fleet, shared, config, barrier=None):
+    # Every worker runs the same number of steps: the stop test reads counts all tiles wrote before the barrier
+    workers = [TileWorker(tile, grid, fleet, shared, config) for tile in tiles]
+    for worker in workers:
+        worker.peers = [peer for peer in workers if peer is not worker]
+    for step in range(config['max_steps']):
+        for worker in workers:
+            worker.navigate(step)
+        if barrier is not None:
+            barrier.wait()
+        for worker in workers:
+            worker.receive(step)
+        if 0 in tiles:
+            shared['steps'][0] = step + 1
+        if not shared['flying'][step % 2].any():
+            break
+
+
+def _worker_main(tiles, grid, layouts, config, barrier):
+    fleet_arrays, shared, fleet = _attach(*layouts, config['origin'])
+    try:
+        _run_tiles(tiles, grid, fleet, shared, config, barrier)
+    except BaseException:
+        barrier.abort()  # Release the other tiles instead of leaving them waiting forever
+        raise
+    finally:
+        del fleet
+        fleet_arrays.close()
+        shared.close()
+
+
+def run_sharded(fleet, shape=(2, 2), processes=None, boundary='summary', interference_range=3000.0,
+                cells_per_tile=8, delta_time=1.0, max_steps=10000, seed=0):
+    """
+    Fly one fleet with the operating area split into spatial tiles, each tile simulated by a worker
+    process over the fleet's arrays in shared memory. Drones migrate to the tile they fly into at
+    the end of every step, and tiles exchange boundary summaries (emitter counts per edge cell) so
+    each receiver's garbling includes the traffic just across its borders.
+    Results are independent of the number of processes: navigation is deterministic and every tile
+    draws its squitter times from (seed, tile, step).
+    :param fleet: fleet.FleetState; its arrays are copied into shared memory and the final state is copied back.
+    :param shape: (rows, cols) of tiles.
+    :param processes: Worker processes (None gives every tile its own, 1 runs in-process); tiles are
+        dealt out round-robin.
+    :param boundary: Cross-tile interference model, one of BOUNDARY_MODES.
+    :param interference_range: Meters within which a squitter interferes at a receiver; also the width
+        of the boundary band each tile summarizes.
+    :param cells_per_tile: Summary resolution along each side of a tile.
+    :return: Dictionary with 'tiles' (per-tile STAT_FIELDS), 'total', 'decode_rate', 'steps' and 'seconds'.
+    """
+    if boundary not in BOUNDARY_MODES:
+        raise ValueError(f"Unknown boundary mode {boundary!r}; expected one of {BOUNDARY_MODES}")
+    grid = TileGrid.around(fleet, shape, cells_per_tile)
+    processes = len(grid) if processes is None else min(processes, len(grid))
+    if boundary == 'exact' and processes != 1:
+        raise ValueError("boundary='exact' reads every tile's transmitters directly and needs processes=1")
+    config = {'boundary': boundary, 'interference_range': interference_range, 'delta_time': delta_time,
+              'max_steps': max_steps, 'seed': seed, 'origin': fleet.origin}
+
+    fleet_arrays = SharedArrays.from_arrays(fleet.arrays())
+    shared = SharedArrays([('owner', (2, len(fleet)), 'i2'), ('summary', (2,) + grid.cell_shape, 'i4'),
+                           ('flying', (2, len(grid)), 'i8'), ('stats', (len(grid), len(STAT_FIELDS)), 'i8'),
+                           ('steps', (1,), 'i8')])
+    try:
+        shared_fleet = FleetState.from_arrays(fleet_arrays.arrays, fleet.origin)
+        row, col = grid.cells(shared_fleet.east.astype(np.float64), shared_fleet.north.astype(np.float64))
+        shared['owner'][0] = grid.tile_of(row, col)
+        shared['summary'][:] = 0
+        shared['flying'][:] = 0
+        shared['stats'][:] = 0
+        shared['steps'][0] = 0
+
+        start = time.perf_counter()
+        assignments = [list(range(worker, len(grid), processes)) for worker in range(processes)]
+        if processes == 1:
+            _run_tiles(assignments[0], grid, shared_fleet, shared, config)
+        else:
+            # Spawned rather than forked: workers attach to the shared memory by name anyway, and forking
+            # a parent whose Numba thread pool has started can leave it hanging at exit
+            context = mp.get_context('spawn')
+            barrier = context.Barrier(processes)
+            layouts = (fleet_arrays.layout, fleet_arrays.name, shared.layout, shared.name)
+            workers = [context.Process(target=_worker_main, args=(tiles, grid, layouts, config, barrier))
+                       for tiles in assignments]
+            for worker in workers:
+                worker.start()
+            for worker in workers:
+                worker.join()
+            failed = [worker.exitcode for worker in workers if worker.exitcode != 0]
+            if failed:
+                raise RuntimeError(f"Tile workers failed with exit codes {failed}")
+        seconds = time.perf_counter() - start
+
+        for key, value in shared_fleet.arrays().items():
+            getattr(fleet, key)[...] = value
+        del shared_fleet
+        stats = shared['stats'].copy()
+        steps = int(shared['steps'][0])
+    finally:
+        fleet_arrays.close()
+        shared.close()
+
+    tiles = [dict(zip(STAT_FIELDS, row.tolist())) for row in stats]
+    total = dict(zip(STAT_FIELDS, stats.sum(axis=0).tolist()))
+    return {'tiles': tiles, 'total': total, 'steps': steps, 'seconds': seconds,
+            'decode_rate': total['decoded'] / total['squitters'] if total['squitters'] else None}
+
+
+if __name__ == "__main__":
+    import os
+
+    num_drones, shape, max_steps, interference_range = 20_000, (2, 2), 300, 20000.0
+    routes = random_routes(num_drones, max_offset=0.2, seed=0)
+    runs = [('summary', 1), ('summary', None), ('none', None), ('exact', 1)]
+    results = {}
+    for boundary, processes in runs:
+        fleet = FleetState(routes, precision='float32')
+        result = run_sharded(fleet, shape, processes=processes, boundary=boundary, max_steps=max_steps,
+                             interference_range=interference_range)
+        results[boundary, processes] = (result, fleet)
+        total = result['total']
+        print(f"[Shard] {boundary:7s} processes={processes or len(result['tiles'])}: {result['steps']} steps in "
+              f"{result['seconds']:.1f} s, decoded {result['decode_rate']:.2%} of {total['squitters']} squitters, "
+              f"{total['migrations_out']} migrations, {total['foreign_squitters']} foreign squitters heard")
+
+    serial, serial_fleet = results['summary', 1]
+    parallel, parallel_fleet = results['summary', None]
+    same = (serial['total'] == parallel['total'] and np.array_equal(serial_fleet.east, parallel_fleet.east)
+            and np.array_equal(serial_fleet.status, parallel_fleet.status))
+    print(f"[Shard] Serial and {len(parallel['tiles'])}-process runs identical: {same}; speedup "
+          f"{serial['seconds'] / parallel['seconds']:.2f}x on {os.cpu_count()} cores")
+    exact = results['exact', 1][0]['decode_rate']
+    for boundary in ('summary', 'none'):
+        rate = results[boundary, None][0]['decode_rate']
+        print(f"[Shard] Decode rate with {boundary!r} boundaries: {rate:.3%} vs exact {exact:.3%} "
+              f"(error {rate - exact:+.3%})")
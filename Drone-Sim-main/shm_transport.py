@@ -0,0 +1,374 @@
+import queue
+import time
+from multiprocessing import shared_memory
+
+import numpy as np
+
+from message_log import RECORD_DTYPE
+from streaming_metrics import RunningStats
+
+# Message batches travel as message_log records, so a batch can go straight into a log or a replay
+MESSAGE_DTYPE = RECORD_DTYPE
+
+# Fleet snapshot: one record per drone, positions as float32 offsets from the fleet origin (see fleet.FleetState)
+SNAPSHOT_DTYPE = np.dtype([
+    ('drone', '<u4'),
+    ('east', '<f4'),
+    ('north', '<f4'),
+    ('alt', '<f4'),
+    ('battery', '<f4'),
+    ('status', 'i1'),
+    ('_pad', 'u1', (3,)),
+])
+
+# Partial ScenarioMetrics from one worker: counters plus mergeable SNR/latency moments
+METRICS_DTYPE = np.dtype([
+    ('sent', '<i8'), ('delivered', '<i8'), ('lost', '<i8'), ('dropped', '<i8'), ('corrupted', '<i8'),
+    ('snr_count', '<i8'), ('snr_mean', '<f8'), ('snr_m2', '<f8'), ('snr_min', '<f8'), ('snr_max', '<f8'),
+    ('latency_count', '<i8'), ('latency_mean', '<f8'), ('latency_m2', '<f8'), ('latency_min', '<f8'),
+    ('latency_max', '<f8'),
+])
+
+
+class SharedArrays:
+    """
+    Named NumPy arrays packed into one shared-memory block. The creator passes `layout` and `name`
+    to other processes, which attach to the same memory; only the creator unlinks it in close().
+    """
+    def __init__(self, layout, name=None):
+        """
+        :param layout: List of (array name, shape, dtype); structured dtypes are fine.
+        :param name: Attach to an existing block by name instead of creating one.
+        """
+        self.layout = [(key, tuple(shape), np.dtype(dtype)) for key, shape, dtype in layout]
+        offsets, size = [], 0
+        for _, shape, dtype in self.layout:
+            offsets.append(size)
+            size += -(-int(np.prod(shape)) * dtype.itemsize // 8) * 8  # 8-byte aligned
+        if name is None:
+            self.shm = shared_memory.SharedMemory(create=True, size=max(size, 1))
+            self.owner = True
+        else:
+            self.shm = shared_memory.SharedMemory(name=name)
+            self.owner = False
+        self.arrays = {key: np.ndarray(shape, dtype=dtype, buffer=self.shm.buf, offset=offset)
+                       for (key, shape, dtype), offset in zip(self.layout, offsets)}
+
+    @classmethod
+    def from_arrays(cls, arrays):
+        """New block holding copies of a dictionary of arrays."""
+        shared = cls([(key, value.shape, value.dtype) for key, value in arrays.items()])
+        for key, value in arrays.items():
+            shared.arrays[key][...] = value
+        return shared
+
+    @property
+    def name(self):
+        return self.shm.name
+
+    def __getitem__(self, key):
+        return self.arrays[key]
+
+    def close(self):
+        # Drop the numpy views first; SharedMemory refuses to close while they export its buffer
+        self.arrays.clear()
+        self.shm.close()
+        if self.owner:
+            self.shm.unlink()
+
+
+class SharedRing:
+    """
+    Single-producer, single-consumer queue of record batches in shared memory. put() copies a
+    batch of structured records into the ring and get() hands it back as a record array: nothing
+    is pickled, and with get(copy=False) the consumer reads the batch in place. Batches never wrap
+    around the end of the ring (the producer skips to the start instead), so each one is a single
+    contiguous slice. Like SnapshotBuffer in live_view, the ring relies on the producer's record
+    writes becoming visible before its counter update.
+    A ring pickles as a reference to its shared memory, so it can be passed to a worker process,
+    which attaches to the same ring. Use one ring per producer/consumer pair.
+    """
+    # Counter slots: records written, records released, batches written, batches released, done flag
+    _HEAD, _TAIL, _BATCH_HEAD, _BATCH_TAIL, _DONE = range(5)
+
+    def __init__(self, dtype, capacity=65536, max_batches=1024, name=None):
+        """
+        :param dtype: Record dtype (e.g. MESSAGE_DTYPE).
+        :param capacity: Records the ring holds; the largest batch that can be put.
+        :param max_batches: Batches in flight before put() blocks.
+        :param name: Attach to an existing ring by name instead of creating one.
+        """
+        self.dtype = np.dtype(dtype)
+        self.capacity = capacity
+        self.max_batches = max_batches
+        self.shared = SharedArrays([('counters', (5,), 'i8'), ('batches', (max_batches, 3), 'i8'),
+                                    ('records', (capacity,), self.dtype)], name)
+        self._counters = self.shared['counters']
+        self._batches = self.shared['batches']
+        self._records = self.shared['records']
+        self._pending = None  # End counter of a batch handed out with copy=False and not yet released
+        if self.shared.owner:
+            self._counters[:] = 0
+
+    def __reduce__(self):
+        return SharedRing, (self.dtype, self.capacity, self.max_batches, self.name)
+
+    @property
+    def name(self):
+        return self.shared.name
+
+    @property
+    def done(self):
+        return bool(self._counters[self._DONE])
+
+    def qsize(self):
+        """Batches waiting to be read."""
+        return int(self._counters[self._BATCH_HEAD] - self._counters[self._BATCH_TAIL])
+
+    @staticmethod
+    def _wait(ready, timeout, error):
+        # Spin briefly, then back off to short sleeps so an idle peer does not burn a core
+        deadline = None if timeout is None else time.monotonic() + timeout
+        pause = 0.0
+        while not ready():
+            if deadline is not None and time.monotonic() > deadline:
+                raise error
+            time.sleep(pause)
+            pause = min(pause * 2 or 1e-5, 1e-3)
+
+    def put(self, records, timeout=None):
+        """
+        Producer side: copy one batch of records into the ring, waiting for room if needed.
+        :raise queue.Full: No room within timeout seconds.
+        """
+        records = np.asarray(records)
+        if records.dtype != self.dtype:
+            raise ValueError(f"Batch dtype {records.dtype} does not match the ring's {self.dtype}")
+        n = len(records)
+        if n > self.capacity:
+            raise ValueError(f"Batch of {n} records does not fit in a ring of {self.capacity}")
+        counters = self._counters
+        written = int(counters[self._HEAD])
+        head, offset = written, written % self.capacity
+        if offset + n > self.capacity:
+            head += self.capacity - offset  # Skip the tail end so the batch stays contiguous
+            offset = 0
+        end = head + n
+        # The slots are free once the consumer has released what was written there one lap ago
+        # (skipped slots were never written, so an empty ring is always free)
+        released = min(end - self.capacity, written)
+        self._wait(lambda: counters[self._TAIL] >= released and
+                   counters[self._BATCH_HEAD] - counters[self._BATCH_TAIL] < self.max_batches,
+                   timeout, queue.Full())
+        self._records[offset:offset + n] = records
+        self._batches[counters[self._BATCH_HEAD] % self.max_batches] = (offset, n, end)
+        counters[self._HEAD] = end
+        counters[self._BATCH_HEAD] += 1  # Publishes the batch
+
+    def get(self, timeout=None, copy=True):
+        """
+        Consumer side: the next batch, in put() order.
+        :param copy: With False, return a view into the ring, valid until release() is called;
+            release() must come before the next get().
+        :return: Record array, or None once the producer has called mark_done() and the ring is empty.
+        :raise queue.Empty: Nothing arrived within timeout seconds.
+        """
+        if self._pending is not None:
+            raise RuntimeError("release() the previous batch before getting the next one")
+        counters = self._counters
+        self._wait(lambda: counters[self._BATCH_HEAD] > counters[self._BATCH_TAIL] or counters[self._DONE],
+                   timeout, queue.Empty())
+        if counters[self._BATCH_HEAD] == counters[self._BATCH_TAIL]:
+            return None
+        offset, n, end = self._batches[counters[self._BATCH_TAIL] % self.max_batches].tolist()
+        batch = self._records[offset:offset + n]
+        self._pending = end
+        if copy:
+            batch = batch.copy()
+            self.release()
+        return batch
+
+    def release(self):
+        """Hand the space of the batch returned by get(copy=False) back to the producer."""
+        if self._pending is None:
+            return
+        self._counters[self._TAIL] = self._pending
+        self._counters[self._BATCH_TAIL] += 1
+        self._pending = None
+
+    def mark_done(self):
+        """Producer side: no more batches; get() returns None once the ring is drained."""
+        self._counters[self._DONE] = 1
+
+    def close(self):
+        del self._counters, self._batches, self._records
+        self.shared.close()
+
+
+def encode_messages(messages, intern):
+    """
+    Position reports (dicts as built by the scenario scripts and pipeline.navigation_batches) as
+    MESSAGE_DTYPE records; only the transmit side of each record is filled in.
+    :param intern: Maps a drone id to an integer (e.g. MessageLogWriter.intern).
+    """
+    records = np.zeros(len(messages), dtype=MESSAGE_DTYPE)
+    records['timestamp'] = [message['timestamp'] for message in messages]
+    records['tx_id'] = [intern(message['drone_id']) for message in messages]
+    records['tx_lat'] = [message['latitude'] for message in messages]
+    records['tx_lon'] = [message['longitude'] for message in messages]
+    records['tx_alt'] = [message['altitude'] for message in messages]
+    return records
+
+
+def decode_messages(records, ids):
+    """Inverse of encode_messages. :param ids: Sequence mapping interned integers back to drone ids."""
+    return [{'drone_id': ids[tx_id], 'latitude': lat, 'longitude': lon, 'altitude': alt, 'timestamp': timestamp}
+            for timestamp, tx_id, lat, lon, alt in zip(records['timestamp'].tolist(), records['tx_id'].tolist(),
+                                                       records['tx_lat'].tolist(), records['tx_lon'].tolist(),
+                                                       records['tx_alt'].tolist())]
+
+
+def fleet_snapshot(fleet, indices=None):
+    """SNAPSHOT_DTYPE records of a fleet.FleetState's drones (all of them when indices is None)."""
+    if indices is None:
+        indices = np.arange(len(fleet))
+    records = np.zeros(len(indices), dtype=SNAPSHOT_DTYPE)
+    records['drone'] = indices
+    for field in ('east', 'north', 'alt', 'status'):
+        records[field] = getattr(fleet, field)[indices]
+    records['battery'] = fleet.battery_remaining[indices]
+    return records
+
+
+def metrics_record(metrics):
+    """One METRICS_DTYPE record of a ScenarioMetrics' counters and SNR/latency moments."""
+    record = np.zeros((), dtype=METRICS_DTYPE)
+    for field in ('sent', 'delivered', 'lost', 'dropped', 'corrupted'):
+        record[field] = getattr(metrics, field)
+    for name in ('snr', 'latency'):
+        stats = getattr(metrics, name)
+        record[f'{name}_count'], record[f'{name}_mean'], record[f'{name}_m2'] = stats.count, stats.mean, stats._m2
+        record[f'{name}_min'], record[f'{name}_max'] = stats.min, stats.max
+    return record
+
+
+def merge_metrics_record(metrics, record):
+    """
+    Fold a metrics_record from another process into a ScenarioMetrics. Counters and moments merge
+    exactly; quantiles, throughput and plotting series stay those of `metrics`.
+    """
+    for field in ('sent', 'delivered', 'lost', 'dropped', 'corrupted'):
+        setattr(metrics, field, getattr(metrics, field) + int(record[field]))
+    for name in ('snr', 'latency'):
+        other = RunningStats()
+        other.count, other.mean, other._m2 = int(record[f'{name}_count']), float(record[f'{name}_mean']), \
+            float(record[f'{name}_m2'])
+        other.min, other.max = float(record[f'{name}_min']), float(record[f'{name}_max'])
+        getattr(metrics, name).merge(other)
+    return metrics
+
+
+# ----------- Transport benchmark ----------- #
+
+def _consume_queue(inbox, results):
+    # Reference consumer: batches of message dicts (or record arrays) pickled through a multiprocessing queue
+    messages, checksum = 0, 0.0
+    while True:
+        batch = inbox.get()
+        if batch is None:
+            break
+        messages += len(batch)
+        if isinstance(batch, np.ndarray):
+            checksum += float(batch['tx_alt'].sum(dtype=np.float64))
+        else:
+            checksum += sum(message['altitude'] for message in batch)
+    results.put((messages, checksum))
+
+
+def _consume_ring(ring, results):
+    messages, checksum = 0, 0.0
+    while True:
+        batch = ring.get(copy=False)
+        if batch is None:
+            break
+        messages += len(batch)
+        checksum += float(batch['tx_alt'].sum(dtype=np.float64))
+        ring.release()
+    results.put((messages, checksum))
+    ring.close()
+
+
+def benchmark_transports(num_messages=200_000, batch_size=1024, queue_size=8):
+    """
+    Seconds per message to move position reports from this process to a consumer process:
+    'pickled_dicts' sends lists of message dicts through a multiprocessing queue (what a parallel
+    design on top of the dict-based scenario code would do), 'pickled_records' sends record arrays
+    through the same queue, and 'shared_ring' puts the records into a SharedRing.
+    :return: Dictionary of transport -> seconds per message (the consumer's checksum is verified).
+    """
+    import multiprocessing as mp
+    from scenario import center_lat, center_lon
+
+    rng = np.random.default_rng(0)
+    ids = [f"{i + 1}" for i in range(1000)]
+    interned = {drone_id: i for i, drone_id in enumerate(ids)}
+    messages = [{'drone_id': ids[i % len(ids)], 'latitude': center_lat + rng.uniform(-0.02, 0.02),
+                 'longitude': center_lon + rng.uniform(-0.02, 0.02), 'altitude': float(rng.integers(80, 200)),
+                 'timestamp': 1.7e9 + i} for i in range(num_messages)]
+    dict_batches = [messages[i:i + batch_size] for i in range(0, num_messages, batch_size)]
+    record_batches = [encode_messages(batch, interned.__getitem__) for batch in dict_batches]
+    expected = sum(message['altitude'] for message in messages)
+
+    # Spawned consumers: a forked child of a parent running Numba's thread pool can hang it at exit
+    context = mp.get_context('spawn')
+    timings = {}
+    for transport, batches in (('pickled_dicts', dict_batches), ('pickled_records', record_batches),
+                               ('shared_ring', record_batches)):
+        results = context.Queue()
+        if transport == 'shared_ring':
+            channel = SharedRing(MESSAGE_DTYPE, capacity=batch_size * queue_size, max_batches=queue_size)
+            consumer = context.Process(target=_consume_ring, args=(channel, results))
+        else:
+            channel = context.Queue(maxsize=queue_size)
+            consumer = context.Process(target=_consume_queue, args=(channel, results))
+        consumer.start()
+        # Warm-up batch so process start-up is not timed
+        channel.put(batches[0])
+        while (channel.qsize() if transport == 'shared_ring' else not channel.empty()):
+            time.sleep(1e-3)
+        start = time.perf_counter()
+        for batch in batches[1:]:
+            channel.put(batch)
+        if transport == 'shared_ring':
+            channel.mark_done()
+        else:
+            channel.put(None)
+        received, checksum = results.get()
+        timings[transport] = (time.perf_counter() - start) / (num_messages - len(batches[0]))
+        consumer.join()
+        if transport == 'shared_ring':
+            channel.close()
+        if received != num_messages or abs(checksum - expected) > 1e-6 * expected:
+            raise AssertionError(f"{transport} delivered {received} messages with checksum {checksum}, "
+                                 f"expected {num_messages} and {expected}")
+    return timings
+
+
+if __name__ == "__main__":
+    from adsbchannel import ADSBChannel
+    from scenario import center_lat, center_lon
+
+    # The simulation work the transport has to keep up with: one transmit per message
+    channel = ADSBChannel(realtime_delay=False)
+    message = {'drone_id': "1", 'latitude': center_lat + 0.01, 'longitude': center_lon - 0.01, 'altitude': 120.0,
+               'timestamp': time.time()}
+    start = time.perf_counter()
+    for _ in range(20000):
+        channel.transmit(dict(message), (center_lat, center_lon))
+    transmit = (time.perf_counter() - start) / 20000
+
+    print(f"[Transport] adsbchannel.transmit: {transmit * 1e6:.2f} us/message")
+    for batch_size in (64, 1024):
+        for transport, seconds in benchmark_transports(batch_size=batch_size).items():
+            print(f"[Transport] {transport:16s} batch {batch_size:5d}: {seconds * 1e6:6.3f} us/message "
+                  f"({seconds / transmit:.1%} of a transmit)")
@@ -0,0 +1,286 @@
+import math
+
+# Two-sided 95% Student t critical values by degrees of freedom (normal value beyond the table)
+_T_95 = ((1, 12.706), (2, 4.303), (3, 3.182), (4, 2.776), (5, 2.571), (6, 2.447), (7, 2.365), (8, 2.306),
+         (9, 2.262), (10, 2.228), (12, 2.179), (15, 2.131), (20, 2.086), (25, 2.060), (30, 2.042),
+         (40, 2.021), (60, 2.000), (120, 1.980))
+
+
+def t_critical_95(dof):
+    """Student t value for a two-sided 95% interval; rounds dof down to the table, so never too narrow."""
+    if dof < 1:
+        return math.inf
+    if dof > 120:
+        return 1.960
+    return next(value for table_dof, value in reversed(_T_95) if dof >= table_dof)
+
+
+class RunningStats:
+    """Welford's online mean/variance with min/max, in constant memory."""
+    def __init__(self):
+        self.count = 0
+        self.mean = 0.0
+        self._m2 = 0.0
+        self.min = math.inf
+        self.max = -math.inf
+
+    def push(self, x):
+        x = float(x)
+        self.count += 1
+        delta = x - self.mean
+        self.mean += delta / self.count
+        self._m2 += delta * (x - self.mean)
+        if x < self.min:
+            self.min = x
+        if x > self.max:
+            self.max = x
+
+    def merge(self, other):
+        """Combine with another RunningStats (Chan et al. parallel update)."""
+        if other.count == 0:
+            return self
+        total = self.count + other.count
+        delta = other.mean - self.mean
+        self._m2 += other._m2 + delta * delta * self.count * other.count / total
+        self.mean += delta * other.count / total
+        self.count = total
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        return self
+
+    @property
+    def variance(self):
+        """Sample variance (0 until two values have been seen)."""
+        return self._m2 / (self.count - 1) if self.count > 1 else 0.0
+
+    @property
+    def std(self):
+        return math.sqrt(self.variance)
+
+    @property
+    def half_width(self):
+        """Half-width of the 95% confidence interval of the mean (inf until two values)."""
+        if self.count < 2:
+            return math.inf
+        return t_critical_95(self.count - 1) * self.std / math.sqrt(self.count)
+
+
+class P2Quantile:
+    """
+    Streaming quantile estimate using the P-squared algorithm (Jain & Chlamtac, 1985):
+    five markers are adjusted with piecewise-parabolic interpolation, so memory is constant.
+    """
+    def __init__(self, p):
+        """
+        :param p: Quantile to track, between 0 and 1 (0.5 is the median).
+        """
+        self.p = p
+        self.count = 0
+        self._heights = []
+        self._positions = [1, 2, 3, 4, 5]
+        self._desired = [1, 1 + 2 * p, 1 + 4 * p, 3 + 2 * p, 5]
+        self._increments = [0, p / 2, p, (1 + p) / 2, 1]
+
+    def push(self, x):
+        x = float(x)
+        self.count += 1
+        h = self._heights
+        if self.count <= 5:
+            h.append(x)
+            h.sort()
+            return
+
+        n = self._positions
+        if x < h[0]:
+            h[0] = x
+            k = 0
+        elif x >= h[4]:
+            h[4] = x
+            k = 3
+        else:
+            k = 0
+            while x >= h[k + 1]:
+                k += 1
+        for i in range(k + 1, 5):
+            n[i] += 1
+        for i in range(5):
+            self._desired[i] += self._increments[i]
+
+        for i in (1, 2, 3):
+            d = self._desired[i] - n[i]
+            if (d >= 1 and n[i + 1] - n[i] > 1) or (d <= -1 and n[i - 1] - n[i] < -1):
+                d = 1 if d > 0 else -1
+                # Piecewise-parabolic prediction, falling back to linear if it breaks marker order
+                candidate = h[i] + d / (n[i + 1] - n[i - 1]) * (
+                    (n[i] - n[i - 1] + d) * (h[i + 1] - h[i]) / (n[i + 1] - n[i])
+                    + (n[i + 1] - n[i] - d) * (h[i] - h[i - 1]) / (n[i] - n[i - 1]))
+                if not h[i - 1] < candidate < h[i + 1]:
+                    candidate = h[i] + d * (h[i + d] - h[i]) / (n[i + d] - n[i])
+                h[i] = candidate
+                n[i] += d
+
+    def value(self):
+        """Current estimate (exact while fewer than five values have been seen)."""
+        if self.count == 0:
+            return None
+        if self.count <= 5:
+            return self._heights[min(int(self.p * self.count), self.count - 1)]
+        return self._heights[2]
+
+
+class WindowedRate:
+    """Events per second over a sliding time window, kept as a ring of fixed-width buckets."""
+    def __init__(self, window=1.0, buckets=10):
+        """
+        :param window: Window length in seconds.
+        :param buckets: Resolution of the window (more buckets = smoother, same O(1) update).
+        """
+        self.window = window
+        self.bucket_width = window / buckets
+        self._buckets = [0] * buckets
+        self._current = None
+        self._total = 0
+
+    def _advance(self, t):
+        index = int(t // self.bucket_width)
+        if self._current is None:
+            self._current = index
+        steps = index - self._current
+        if steps <= 0:
+            return
+        if steps >= len(self._buckets):
+            self._buckets = [0] * len(self._buckets)
+            self._total = 0
+        else:
+            for step in range(1, steps + 1):
+                slot = (self._current + step) % len(self._buckets)
+                self._total -= self._buckets[slot]
+                self._buckets[slot] = 0
+        self._current = index
+
+    def push(self, t, n=1):
+        self._advance(t)
+        self._buckets[self._current % len(self._buckets)] += n
+        self._total += n
+
+    def rate(self, t):
+        self._advance(t)
+        return self._total / self.window
+
+
+class DecimatedSeries:
+    """
+    (x, y) series for plotting with a hard size cap: when full, every other point is
+    dropped and the sampling stride doubles, so long runs keep an evenly spaced history.
+    """
+    def __init__(self, max_points=2000):
+        self.max_points = max_points
+        self.points = []
+        self._stride = 1
+        self._seen = 0
+
+    def append(self, x, y):
+        if self.max_points <= 0:
+            return
+        if self._seen % self._stride == 0:
+            self.points.append((x, y))
+            if len(self.points) >= self.max_points:
+                self.points = self.points[::2]
+                self._stride *= 2
+        self._seen += 1
+
+
+class ScenarioMetrics:
+    """
+    Streaming packet-loss, SNR, latency and throughput metrics for one scenario run.
+    Everything is O(1) per message; only the capped plotting series hold history.
+    """
+    def __init__(self, quantiles=(0.5, 0.95), rate_window=1.0, max_series_points=2000):
+        """
+        :param quantiles: SNR/latency quantiles to estimate with P-squared.
+        :param rate_window: Window in seconds for the throughput rate.
+        :param max_series_points: Cap on each plotting series (0 disables the series).
+        """
+        self.sent = 0
+        self.lost = 0
+        self.dropped = 0
+        self.corrupted = 0
+        self.delivered = 0
+        self.snr = RunningStats()
+        self.latency = RunningStats()
+        self.snr_quantiles = {q: P2Quantile(q) for q in quantiles}
+        self.latency_quantiles = {q: P2Quantile(q) for q in quantiles}
+        self.throughput = WindowedRate(rate_window)
+        self.start_time = None
+        self.last_time = None
+
+        self.packet_loss_series = DecimatedSeries(max_series_points)
+        self.snr_series = DecimatedSeries(max_series_points)
+        self.latency_series = DecimatedSeries(max_series_points)
+        self.throughput_series = DecimatedSeries(max_series_points)
+
+    @property
+    def packet_loss(self):
+        """Lost messages as a percentage of messages sent."""
+        return self.lost / self.sent * 100 if self.sent else 0.0
+
+    def record_sent(self, now):
+        """A message left a drone."""
+        if self.start_time is None:
+            self.start_time = now
+        self.last_time = now
+        self.sent += 1
+
+    def record_drop(self):
+        """A message never reached the GCS (e.g. blocked by a jammer)."""
+        self.lost += 1
+        self.dropped += 1
+        self.packet_loss_series.append(self.sent, self.packet_loss)
+
+    def record_delivery(self, now, snr_db, latency_ms, corrupted=False):
+        """
+        A message reached the GCS.
+        :param latency_ms: Modeled over-the-air delay in milliseconds.
+        :param corrupted: Corrupted messages arrive but still count as lost.
+        """
+        self.last_time = now
+        self.delivered += 1
+        if corrupted:
+            self.corrupted += 1
+            self.lost += 1
+        self.snr.push(snr_db)
+        self.latency.push(latency_ms)
+        for estimator in self.snr_quantiles.values():
+            estimator.push(snr_db)
+        for estimator in self.latency_quantiles.values():
+            estimator.push(latency_ms)
+        self.throughput.push(now)
+
+        elapsed = now - self.start_time
+        self.packet_loss_series.append(self.sent, self.packet_loss)
+        self.snr_series.append(self.sent, float(snr_db))
+        self.latency_series.append(self.sent, latency_ms)
+        self.throughput_series.append(elapsed, self.throughput.rate(now))
+
+    def series(self):
+        """Plotting series in the (packet_loss, snr, latency, throughput) order the scripts expect."""
+        return (self.packet_loss_series.points, self.snr_series.points,
+                self.latency_series.points, self.throughput_series.points)
+
+    def summary(self):
+        """Scalar results, suitable for JSON."""
+        elapsed = (self.last_time - self.start_time) if self.start_time is not None else 0.0
+        return {
+            'messages': self.sent,
+            'delivered': self.delivered,
+            'lost': self.lost,
+            'dropped': self.dropped,
+            'corrupted': self.corrupted,
+            'packet_loss': self.packet_loss,
+            'mean_snr': self.snr.mean if self.snr.count else None,
+            'std_snr': self.snr.std,
+            'snr_quantiles': {str(q): e.value() for q, e in self.snr_quantiles.items()},
+            'mean_latency': self.latency.mean if self.latency.count else None,
+            'latency_quantiles': {str(q): e.value() for q, e in self.latency_quantiles.items()},
+            'throughput': self.delivered / elapsed if elapsed > 0 else 0.0,
+        }
@@ -0,0 +1,152 @@
+import hashlib
+import itertools
+import json
+import os
+import random
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+
+# Part of every cache key; bump when simulator semantics change so stale results are recomputed
+CACHE_VERSION = 3
+
+
+def run_scenario(config):
+    """
+    Default sweep worker: runs one n_scen_stat scenario and reduces it to scalars.
+    :param config: Keyword arguments for n_scen_stat.run_simulation.
+    :return: Dictionary of summary metrics for the configuration.
+    """
+    from n_scen_stat import run_simulation  # Imported here so worker processes load it lazily
+    from streaming_metrics import ScenarioMetrics
+
+    stats = ScenarioMetrics(max_series_points=0)
+    run_simulation(stats=stats, **config)
+    return stats.summary()
+
+
+class ParameterSweep:
+    """
+    Expands a parameter grid, skips configurations whose results are already cached
+    on disk and runs the remaining ones in parallel worker processes.
+    """
+    def __init__(self, run_fn=run_scenario, cache_dir='results/sweep_cache', max_workers=None):
+        """
+        :param run_fn: Top-level (picklable) function mapping a config dict to a JSON-serializable result.
+        :param cache_dir: Directory holding one JSON result file per configuration hash.
+        :param max_workers: Number of worker processes (None uses every core, 1 runs in-process).
+        """
+        self.run_fn = run_fn
+        self.cache_dir = cache_dir
+        self.max_workers = max_workers
+
+    @staticmethod
+    def expand_grid(grid):
+        """
+        Cartesian product of a parameter grid.
+        :param grid: Dictionary mapping parameter name to a list of values.
+        :return: List of configuration dictionaries.
+        """
+        names = sorted(grid)
+        return [dict(zip(names, values)) for values in itertools.product(*(grid[name] for name in names))]
+
+    @staticmethod
+    def latin_hypercube(bounds, samples, seed=None):
+        """
+        Latin hypercube sample of a continuous parameter space.
+        :param bounds: Dictionary mapping parameter name to (low, high); integer bounds give integer samples.
+        :param samples: Number of configurations to draw.
+        :param seed: Seed for reproducible designs (a reproducible design is also a cacheable one).
+        :return: List of configuration dictionaries.
+        """
+        rng = random.Random(seed)
+        configs = [{} for _ in range(samples)]
+        for name in sorted(bounds):
+            low, high = bounds[name]
+            strata = list(range(samples))
+            rng.shuffle(strata)
+            for config, stratum in zip(configs, strata):
+                value = low + (stratum + rng.random()) / samples * (high - low)
+                if isinstance(low, int) and isinstance(high, int):
+                    value = int(round(value))
+                config[name] = value
+        return configs
+
+    def config_hash(self, config):
+        """Stable hash of a configuration together with the worker that evaluates it."""
+        key = {
+            'version': CACHE_VERSION,
+            'run_fn': f"{self.run_fn.__module__}.{self.run_fn.__qualname__}",
+            'config': config,
+        }
+        encoded = json.dumps(key, sort_keys=True, separators=(',', ':'), default=repr)
+        return hashlib.sha256(encoded.encode('utf-8')).hexdigest()[:32]
+
+    def _cache_path(self, key):
+        return os.path.join(self.cache_dir, f"{key}.json")
+
+    def load_cached(self, config):
+        """Return the cached result for a configuration, or None if it has not been computed."""
+        path = self._cache_path(self.config_hash(config))
+        if not os.path.exists(path):
+            return None
+        with open(path) as f:
+            return json.load(f)['result']
+
+    def _store(self, config, result):
+        # Write to a temporary file first so an interrupted sweep never leaves a truncated entry
+        path = self._cache_path(self.config_hash(config))
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump({'config': config, 'result': result}, f, sort_keys=True, default=repr)
+        os.replace(tmp_path, path)
+
+    def run(self, configs):
+        """
+        Evaluate every configuration, computing only the ones missing from the cache.
+        :param configs: List of configuration dictionaries (e.g. from expand_grid).
+        :return: List of (config, result) pairs in the order of configs.
+        """
+        os.makedirs(self.cache_dir, exist_ok=True)
+        results = [self.load_cached(config) for config in configs]
+        pending = {}
+        for index, (config, result) in enumerate(zip(configs, results)):
+            if result is None:
+                # Duplicate configurations share a single evaluation
+                pending.setdefault(self.config_hash(config), []).append(index)
+
+        print(f"[Sweep] {len(configs)} points, {len(configs) - sum(map(len, pending.values()))} cached, "
+              f"{len(pending)} to run")
+
+        if self.max_workers == 1:
+            for indices in pending.values():
+                config = configs[indices[0]]
+                result = self.run_fn(config)
+                self._store(config, result)
+                for index in indices:
+                    results[index] = result
+        elif pending:
+            with ProcessPoolExecutor(max_workers=self.max_workers) as executor:
+                futures = {executor.submit(self.run_fn, configs[indices[0]]): indices
+                           for indices in pending.values()}
+                for future in as_completed(futures):
+                    indices = futures[future]
+                    result = future.result()
+                    # Store as soon as a point finishes so a crash only loses in-flight work
+                    self._store(configs[indices[0]], result)
+                    for index in indices:
+                        results[index] = result
+
+        return list(zip(configs, results))
+
+
+if __name__ == "__main__":
+    grid = {
+        'jamming': [False, True],
+        'spoofing': [True],
+        'spoof_probability': [0.3, 0.5, 0.7],
+        'noise_level': [1.0],
+        'error_rate': [0.01, 0.05],
+    }
+    sweep = ParameterSweep()
+    for config, result in sweep.run(sweep.expand_grid(grid)):
+        print(config, '->', result)
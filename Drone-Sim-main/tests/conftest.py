@@ -0,0 +1,6 @@
+import os
+import sys
+
+# The simulator is a flat set of modules; make them importable however pytest is started
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('MPLBACKEND', 'Agg')
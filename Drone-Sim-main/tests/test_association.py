@@ -0,0 +1,28 @@
+import numpy as np
+
+from association import ASSOC_CONFLICT, ASSOC_DUPLICATE, ASSOC_NEW, ASSOC_OK, TrackAssociator
+from scenario import center_lat, center_lon
+
+
+def report(drone_id, lat, lon=center_lon, alt=100.0):
+    return {'drone_id': drone_id, 'latitude': lat, 'longitude': lon, 'altitude': alt}
+
+
+def test_far_report_for_a_track_updated_this_scan_is_a_duplicate():
+    associator = TrackAssociator()
+    assert associator.associate([report("1", center_lat)], 1.0).tolist() == [ASSOC_NEW]
+    x, y = associator.state[0, :2]
+    # The track is still unconfirmed, so the far report would otherwise re-acquire it
+    status = associator.associate([report("1", center_lat), report("1", center_lat + 0.05)], 2.0)
+    assert status.tolist() == [ASSOC_OK, ASSOC_DUPLICATE]
+    assert np.hypot(associator.state[0, 0] - x, associator.state[0, 1] - y) < 1.0
+    assert associator.state[0, 6] == 2
+
+
+def test_far_report_alone_still_reacquires_an_unconfirmed_track():
+    associator = TrackAssociator()
+    associator.associate([report("1", center_lat)], 1.0)
+    assert associator.associate([report("1", center_lat + 0.05)], 2.0).tolist() == [ASSOC_NEW]
+    # Once confirmed, a far report is a conflict and leaves the track alone
+    associator.associate([report("1", center_lat + 0.05)], 3.0)
+    assert associator.associate([report("1", center_lat)], 4.0).tolist() == [ASSOC_CONFLICT]
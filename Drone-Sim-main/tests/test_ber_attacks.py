@@ -0,0 +1,46 @@
+import contextlib
+import io
+
+from adsb_codec import FRAME_OK, FRAME_REJECTED, parity_ok
+from adsbchannel import ADSBChannel
+from gcs import GCS
+from spoofer import Spoofer
+
+GCS_POSITION = (38.8977, -77.0365)
+MESSAGE = {'drone_id': "1", 'latitude': 38.90, 'longitude': -77.03, 'altitude': 120.0, 'timestamp': 0.0}
+
+
+def receive(snr_db, seed=0):
+    channel = ADSBChannel(corruption_model='ber', realtime_delay=False, seed=seed)
+    received, _ = channel.corrupt_message_bits(dict(MESSAGE), GCS_POSITION, snr_db)
+    return channel, received
+
+
+def gcs_status(channel, message):
+    return GCS(*GCS_POSITION).receive_frames(message['frame'][None, :], channel.codec)[0]
+
+
+def test_jammed_frame_that_failed_crc_stays_rejected():
+    channel, received = receive(snr_db=-10)
+    assert not parity_ok(received['frame'][None, :])[0]
+    received['latitude'] += 0.01  # A post-channel jammer's noise
+    channel.reencode_frame(received)
+    assert gcs_status(channel, received) == FRAME_REJECTED
+
+
+def test_spoofed_frame_that_failed_crc_stays_rejected():
+    channel, received = receive(snr_db=-10)
+    with contextlib.redirect_stdout(io.StringIO()):
+        spoofed, was_spoofed = Spoofer(spoof_probability=1.0).spoof_message(received)
+    assert was_spoofed
+    channel.reencode_frame(spoofed)
+    assert gcs_status(channel, spoofed) == FRAME_REJECTED
+
+
+def test_clean_frame_carries_the_edit_to_the_gcs():
+    channel, received = receive(snr_db=40)
+    received['latitude'] += 0.01
+    channel.reencode_frame(received)
+    assert gcs_status(channel, received) == FRAME_OK
+    decoded = channel.codec.decode_messages(received['frame'][None, :])[0]
+    assert abs(decoded['latitude'] - received['latitude']) < 1e-4
@@ -0,0 +1,38 @@
+import contextlib
+import io
+import json
+import os
+import subprocess
+import sys
+
+from crn import paired_comparison
+from sweep import run_scenario
+
+SIM_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def run_in_fresh_process(config):
+    """run_scenario in a new interpreter, like a sweep worker that did not inherit our routes."""
+    script = ("import contextlib, io, json\nfrom sweep import run_scenario\n"
+              "with contextlib.redirect_stdout(io.StringIO()):\n"
+              f"    result = run_scenario({config!r})\nprint(json.dumps(result))\n")
+    env = dict(os.environ, PYTHONPATH=SIM_DIR, MPLBACKEND='Agg')
+    output = subprocess.run([sys.executable, '-c', script], cwd=SIM_DIR, env=env, capture_output=True, text=True,
+                            check=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def test_paired_scenarios_fly_the_same_mission_in_different_processes():
+    # Navigation does not depend on the attacks, so paired runs must send exactly as many reports
+    with contextlib.redirect_stdout(io.StringIO()):
+        baseline = run_scenario({'seed': 11, 'common_random': True})
+    variant = run_in_fresh_process({'seed': 11, 'common_random': True, 'jamming': True, 'spoofing': True})
+    assert variant['messages'] == baseline['messages']
+
+
+def test_paired_comparison_of_identical_scenarios_has_no_difference(tmp_path):
+    with contextlib.redirect_stdout(io.StringIO()):
+        report = paired_comparison({}, {'same': {}}, replications=3, max_workers=1, cache_dir=str(tmp_path))
+    for metric in report['same'].values():
+        assert metric['difference'] == 0
+        assert metric['replications'] == 3
@@ -0,0 +1,46 @@
+import asyncio
+
+import pytest
+
+from adsb_codec import FrameCodec
+from gcs import GCS
+from gcs_server import DATAGRAM_HEADER, GCSServer, check_consumer
+
+GCS_POSITION = (38.8977, -77.0365)
+
+
+def datagram(messages):
+    frames = FrameCodec(*GCS_POSITION).encode_messages(messages)
+    return DATAGRAM_HEADER.pack(0.0) + frames.tobytes()
+
+
+def test_malformed_datagrams_are_counted_and_do_not_stop_the_decoder():
+    async def scenario():
+        server = GCSServer(GCS(*GCS_POSITION))
+        consumer = asyncio.create_task(server.consume())
+        good = datagram([{'drone_id': "7", 'latitude': 38.9, 'longitude': -77.03, 'altitude': 120.0}])
+        for data in (b'\x00' * 3, DATAGRAM_HEADER.pack(0.0), good[:-1], good):
+            server.datagram_received(data, None)
+        while not server.queue.empty():
+            await asyncio.sleep(0.01)
+        await asyncio.sleep(0.01)
+        check_consumer(consumer)
+        consumer.cancel()
+        return server.report()
+
+    report = asyncio.run(scenario())
+    assert report['malformed_datagrams'] == 3
+    assert report['frames'] == 1
+    assert report['tracks'] == 1
+
+
+def test_a_stopped_decoder_is_reported():
+    async def scenario():
+        async def failing():
+            raise ValueError("decoder failed")
+        consumer = asyncio.create_task(failing())
+        await asyncio.sleep(0)
+        check_consumer(consumer)
+
+    with pytest.raises(RuntimeError):
+        asyncio.run(scenario())
@@ -0,0 +1,24 @@
+import pytest
+
+import kernels
+
+KERNELS = ('haversine', 'navigation_step', 'navigation_step_local', 'link_budget', 'combine_dbm', 'haversine_batch',
+           'navigation_step_batch', 'navigation_step_local_batch', 'link_budget_batch')
+
+
+@pytest.fixture(scope='module')
+def agreement():
+    # check_agreement raises AssertionError itself when any kernel drifts beyond its tolerance
+    return kernels.check_agreement(n=20000)
+
+
+def test_numpy_scalar_and_batch_kernels_agree(agreement):
+    for kernel in KERNELS:
+        assert agreement[f'numpy.{kernel}'] <= 1e-9
+
+
+def test_numba_kernels_agree_with_numpy(agreement):
+    if kernels.NUMBA is None:
+        pytest.skip("numba is not installed")
+    for kernel in KERNELS:
+        assert agreement[f'numba.{kernel}'] <= 1e-9
@@ -0,0 +1,38 @@
+import contextlib
+import io
+
+import numpy as np
+
+from gcs import GCS
+from message_log import MessageLog, MessageLogWriter, replay_log
+from n_scen_stat import advance_simulation, initial_state
+
+
+def test_batches_follow_time_order_for_out_of_order_logs(tmp_path):
+    path = str(tmp_path / 'run.log')
+    writer = MessageLogWriter(path)
+    # The first batch in time order is rows 0, 5, 2: first-to-last span matches a contiguous block, yet it is not one
+    for timestamp in (0.0, 3.0, 2.0, 4.0, 5.0, 1.0):
+        writer.record(timestamp, "1", (38.9, -77.0, 100.0), None, 0.0, 0.0, 0)
+    writer.close()
+    times = np.concatenate([batch['timestamp'] for batch in MessageLog(path).batches(batch_size=3)])
+    assert times.tolist() == sorted(times.tolist())
+
+
+def test_replay_feeds_the_gcs_what_the_live_run_delivered(tmp_path):
+    path = str(tmp_path / 'run.log')
+    writer = MessageLogWriter(path)
+    state = initial_state(jamming=True, noise_level=-80.0, spoofing=True, corruption_model='ber', seed=4)
+    state['gcs'] = GCS(38.8977, -77.0365)
+    state['channel'].realtime_delay = False
+    state['channel'].recorder = writer
+    with contextlib.redirect_stdout(io.StringIO()):
+        advance_simulation(state)
+    writer.close()
+
+    replayed = GCS(38.8977, -77.0365)
+    replay_log(path, gcs=replayed)
+    live = state['gcs'].drone_positions
+    assert set(replayed.drone_positions) == set(live)
+    for drone_id, position in live.items():
+        np.testing.assert_allclose(replayed.drone_positions[drone_id], position, atol=1e-3)
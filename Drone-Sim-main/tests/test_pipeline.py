@@ -0,0 +1,55 @@
+import threading
+import time
+
+import pytest
+
+from pipeline import Pipeline, Stage
+from profiling import StageMetrics
+
+
+def test_generator_stage_is_held_back_by_a_slow_sink():
+    produced = []
+    consumed = []
+    ahead = []
+
+    def expand(batch):
+        for i in range(50):
+            produced.append(i)
+            yield [i]
+
+    def slow_sink(batch):
+        consumed.append(batch)
+        ahead.append(len(produced) - len(consumed))
+        time.sleep(0.001)
+
+    Pipeline([Stage('expand', expand)], queue_size=2).run([[0]], slow_sink)
+    assert len(consumed) == 50
+    # Bounded by the queue between the stage and the sink, plus the batch in the stage's hands
+    assert max(ahead) <= 2 + 1
+
+
+def test_a_failing_source_is_reported_instead_of_hanging():
+    def source():
+        yield [1]
+        raise ValueError("source failed")
+
+    with pytest.raises(RuntimeError, match="source failed"):
+        Pipeline([Stage('identity', lambda batch: batch)]).run(source(), lambda batch: None)
+
+
+def test_stage_metrics_shared_by_threads_keeps_every_timing_and_count():
+    metrics = StageMetrics()
+
+    def work():
+        for _ in range(2000):
+            with metrics.stage('channel'):
+                metrics.count('messages')
+
+    threads = [threading.Thread(target=work) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert metrics.stage_calls['channel'] == 8000
+    assert metrics.counters['messages'] == 8000
+    assert metrics.stage_ns['channel'] > 0
@@ -0,0 +1,53 @@
+import contextlib
+import io
+import json
+import os
+import subprocess
+import sys
+
+import pytest
+
+import cw_scen_stat
+import n_scen_stat
+from streaming_metrics import ScenarioMetrics
+
+SIM_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Same run as seeded_summary, in a fresh interpreter whose module-level routes differ from ours
+FRESH_RUN = """
+import contextlib, io, json
+from {module} import run_simulation
+from streaming_metrics import ScenarioMetrics
+stats = ScenarioMetrics()
+with contextlib.redirect_stdout(io.StringIO()):
+    run_simulation(seed={seed}, stats=stats, **{params!r})
+print(json.dumps(stats.summary()))
+"""
+
+
+def seeded_summary(seed, module=n_scen_stat, **params):
+    stats = ScenarioMetrics()
+    with contextlib.redirect_stdout(io.StringIO()):
+        module.run_simulation(seed=seed, stats=stats, **params)
+    # Through JSON, like the sweep cache and the fresh process
+    return json.loads(json.dumps(stats.summary()))
+
+
+def fresh_process_summary(seed, module=n_scen_stat, **params):
+    env = dict(os.environ, PYTHONPATH=SIM_DIR, MPLBACKEND='Agg')
+    script = FRESH_RUN.format(module=module.__name__, seed=seed, params=params)
+    output = subprocess.run([sys.executable, '-c', script], cwd=SIM_DIR,
+                            env=env, capture_output=True, text=True, check=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def test_seeded_runs_are_identical_in_process():
+    params = {'jamming': True, 'spoofing': True}
+    assert seeded_summary(5, **params) == seeded_summary(5, **params)
+
+
+@pytest.mark.parametrize('module', [n_scen_stat, cw_scen_stat], ids=lambda module: module.__name__)
+def test_seeded_default_fleet_is_identical_in_a_fresh_process(module):
+    # The default mission's routes used to come from the unseeded import-time draw
+    params = {'jamming': True, 'spoofing': True}
+    assert seeded_summary(5, module, **params) == fresh_process_summary(5, module, **params)